@@ -0,0 +1,34 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+asv (airspeed velocity) benchmarks for the `piecewisefns` package.
+
+Run from the repository root with::
+
+    asv run
+    asv continuous master HEAD
+
+The benchmark modules are:
+    - traces                    synthetic load histories used as inputs
+    - bench_piecewise_linear_1d time and peak memory of the 
+                                piecewise_linear_1d functions
+                                
+Sizes run from 10 to 10**8 points.  Sizes above the environment variable 
+PIECEWISEFNS_BENCH_MAXSIZE (default 10**7) are skipped as the largest 
+traces need several GB of memory.
+    
+"""
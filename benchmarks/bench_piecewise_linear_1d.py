@@ -0,0 +1,223 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+time and peak memory benchmarks for piecewise_linear_1d
+
+Every public function is timed on each synthetic trace in 
+`benchmarks.traces` over a range of sizes.  Functions that build Python 
+lists or loop in Python, and the O(len(x) * len(t)) `superpose`, use 
+smaller sizes.
+
+"""
+from __future__ import print_function, division
+
+import numpy as np
+
+from piecewisefns import piecewise_linear_1d as pwl
+
+from .traces import SIZES, TRACES, check_size
+
+
+def _unit_step(tau):
+    return 1 - np.exp(-tau)
+    
+def _unit_ramp(tau):
+    return tau - 1 + np.exp(-tau)
+    
+    
+class _Trace(object):
+    """common setup: x, y trace and query points spanning it"""
+    params = (sorted(TRACES), SIZES)
+    param_names = ['trace', 'n']
+    timeout = 600
+    
+    def setup(self, trace, n):
+        check_size(n)
+        self.x, self.y = TRACES[trace](n)
+        self.xi = np.linspace(self.x[0] - 1, self.x[-1] + 1, n)
+        
+        
+class Classification(_Trace):
+    """functions of x alone"""
+    
+    def time_segment_profile(self, trace, n):
+        pwl.segment_profile(self.x, self.y)
+        
+    def time_has_steps(self, trace, n):
+        pwl.has_steps(self.x)
+        
+    def time_is_initially_increasing(self, trace, n):
+        pwl.is_initially_increasing(self.x)
+        
+    def time_strictly_increasing(self, trace, n):
+        pwl.strictly_increasing(self.x)
+        
+    def time_strictly_decreasing(self, trace, n):
+        pwl.strictly_decreasing(self.x)
+        
+    def time_non_increasing(self, trace, n):
+        pwl.non_increasing(self.x)
+        
+    def time_non_decreasing(self, trace, n):
+        pwl.non_decreasing(self.x)
+        
+    def time_non_increasing_and_non_decreasing_runs(self, trace, n):
+        pwl.non_increasing_and_non_decreasing_runs(self.y)
+        
+    def peakmem_segment_profile(self, trace, n):
+        pwl.segment_profile(self.x, self.y)
+        
+    def peakmem_non_decreasing(self, trace, n):
+        pwl.non_decreasing(self.x)
+        
+        
+class Segments(_Trace):
+    """ramp, constant and step analysis and the force_* functions"""
+    
+    def time_ramps_constants_steps(self, trace, n):
+        pwl.ramps_constants_steps(self.x, self.y)
+        
+    def time_start_index_of_ramps(self, trace, n):
+        pwl.start_index_of_ramps(self.x, self.y)
+        
+    def time_start_index_of_constants(self, trace, n):
+        pwl.start_index_of_constants(self.x, self.y)
+        
+    def time_start_index_of_steps(self, trace, n):
+        pwl.start_index_of_steps(self.x, self.y)
+        
+    def time_ramps_constants_steps_after(self, trace, n):
+        pwl.ramps_constants_steps_after(self.x, self.y, self.xi[:100])
+        
+    def time_force_strictly_increasing(self, trace, n):
+        pwl.force_strictly_increasing(self.x, self.y)
+        
+    def time_force_non_decreasing(self, trace, n):
+        pwl.force_non_decreasing(self.x, self.y)
+        
+    def time_PiecewiseLinear1D(self, trace, n):
+        pwl.PiecewiseLinear1D(self.x, self.y)
+        
+    def peakmem_ramps_constants_steps(self, trace, n):
+        pwl.ramps_constants_steps(self.x, self.y)
+        
+    def peakmem_force_strictly_increasing(self, trace, n):
+        pwl.force_strictly_increasing(self.x, self.y)
+        
+    def peakmem_force_strictly_increasing_inplace(self, trace, n):
+        pwl.force_strictly_increasing(self.x, self.y, inplace=True)
+        
+        
+class Evaluation(_Trace):
+    """evaluation, inverse lookup and integration at n query points"""
+    
+    def setup(self, trace, n):
+        _Trace.setup(self, trace, n)
+        self.a = self.xi[:-1]
+        self.b = self.xi[1:]
+        self.levels = np.linspace(self.y.min(), self.y.max(), 100)
+        
+    def time_evaluate(self, trace, n):
+        pwl.evaluate(self.x, self.y, self.xi)
+        
+    def time_evaluate_mean(self, trace, n):
+        pwl.evaluate(self.x, self.y, self.xi, at_step='mean')
+        
+    def time_first_crossing(self, trace, n):
+        pwl.first_crossing(self.x, self.y, self.levels)
+        
+    def time_all_crossings(self, trace, n):
+        pwl.all_crossings(self.x, self.y, self.levels)
+        
+    def time_cumulative_integral(self, trace, n):
+        pwl.cumulative_integral(self.x, self.y)
+        
+    def time_integrate(self, trace, n):
+        pwl.integrate(self.x, self.y, self.a, self.b)
+        
+    def time_average(self, trace, n):
+        pwl.average(self.x, self.y, self.a, self.b)
+        
+    def peakmem_evaluate(self, trace, n):
+        pwl.evaluate(self.x, self.y, self.xi)
+        
+    def peakmem_integrate(self, trace, n):
+        pwl.integrate(self.x, self.y, self.a, self.b)
+        
+        
+class Arithmetic(_Trace):
+    """combining a trace with a shifted copy of itself"""
+    
+    def setup(self, trace, n):
+        _Trace.setup(self, trace, n)
+        self.x2 = self.x + 0.5 * (self.x[-1] - self.x[0]) / max(n, 1)
+        self.y2 = self.y[::-1].copy()
+        
+    def time_add(self, trace, n):
+        pwl.add(self.x, self.y, self.x2, self.y2)
+        
+    def time_subtract(self, trace, n):
+        pwl.subtract(self.x, self.y, self.x2, self.y2)
+        
+    def time_scale(self, trace, n):
+        pwl.scale(self.x, self.y, 2.5)
+        
+    def time_minimum(self, trace, n):
+        pwl.minimum(self.x, self.y, self.x2, self.y2)
+        
+    def time_maximum(self, trace, n):
+        pwl.maximum(self.x, self.y, self.x2, self.y2)
+        
+    def peakmem_add(self, trace, n):
+        pwl.add(self.x, self.y, self.x2, self.y2)
+        
+    def peakmem_maximum(self, trace, n):
+        pwl.maximum(self.x, self.y, self.x2, self.y2)
+        
+        
+class PythonLevel(_Trace):
+    """functions with Python level loops or list results"""
+    params = (sorted(TRACES), [10, 10**3, 10**5, 10**6])
+    
+    def time_non_increasing_and_non_decreasing_parts(self, trace, n):
+        pwl.non_increasing_and_non_decreasing_parts(self.y)
+        
+    def time_simplify(self, trace, n):
+        pwl.simplify(self.x, self.y, atol=1e-3)
+        
+    def peakmem_non_increasing_and_non_decreasing_parts(self, trace, n):
+        pwl.non_increasing_and_non_decreasing_parts(self.y)
+        
+        
+class Superpose(_Trace):
+    """superposition of n segments at 1000 times"""
+    params = (sorted(TRACES), [10, 10**3, 10**4])
+    
+    def setup(self, trace, n):
+        _Trace.setup(self, trace, n)
+        self.t = np.linspace(self.x[0], self.x[-1] * 1.5, 1000)
+        
+    def time_superpose(self, trace, n):
+        pwl.superpose(self.x, self.y, self.t, _unit_step, _unit_ramp)
+        
+    def time_superpose_chunked(self, trace, n):
+        pwl.superpose(self.x, self.y, self.t, _unit_step, _unit_ramp, 
+                      chunksize=100)
+                      
+    def peakmem_superpose_chunked(self, trace, n):
+        pwl.superpose(self.x, self.y, self.t, _unit_step, _unit_ramp, 
+                      chunksize=100)
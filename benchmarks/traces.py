@@ -0,0 +1,79 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+synthetic load histories for benchmarking
+
+Each generator takes the number of points n and returns float64 x, y 
+arrays with x non-decreasing.  They are deterministic (fixed seeds) so 
+benchmark results are comparable between runs.
+
+"""
+from __future__ import print_function, division
+
+import os
+import numpy as np
+
+
+SIZES = [10, 10**3, 10**5, 10**6, 10**7, 10**8]
+MAXSIZE = int(float(os.environ.get('PIECEWISEFNS_BENCH_MAXSIZE', 10**7)))
+
+
+def check_size(n, maxsize=MAXSIZE):
+    """raise NotImplementedError (asv's skip signal) if n > maxsize"""
+    if n > maxsize:
+        raise NotImplementedError("n=%d is above the benchmark size limit %d" 
+                                  % (n, maxsize))
+                                  
+def many_steps(n):
+    """staircase: alternating steps and constants, x=[0,0,1,1,...]"""
+    rng = np.random.RandomState(0)
+    x = np.arange(n) // 2
+    y = np.cumsum(rng.rand(n // 2 + 1))
+    return x.astype(np.float64), np.repeat(y, 2)[1:n + 1]
+    
+def many_ramps(n):
+    """random walk with a ramp between every pair of points"""
+    rng = np.random.RandomState(1)
+    x = np.cumsum(rng.rand(n) + 0.1)
+    y = np.cumsum(rng.randn(n))
+    return x, y
+    
+def oscillating(n):
+    """noisy sine wave; many short non-increasing/non-decreasing runs"""
+    rng = np.random.RandomState(2)
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x * 0.3) + 0.01 * rng.randn(n)
+    return x, y
+    
+def monotone(n):
+    """smooth strictly increasing curve"""
+    x = np.linspace(0, 1, n)
+    return x, x * x
+    
+def load_history(n):
+    """repeating ramp, hold, step pattern like a staged load test"""
+    pattern_x = np.array([0, 1, 2, 2], dtype=np.float64)
+    pattern_y = np.array([0, 1, 1, 0.5])
+    reps = -(-n // len(pattern_x))
+    x = (pattern_x + 3 * np.arange(reps)[:, None]).ravel()[:n]
+    y = (pattern_y + 0.5 * np.arange(reps)[:, None]).ravel()[:n]
+    return x, y
+    
+    
+TRACES = dict(many_steps=many_steps, many_ramps=many_ramps, 
+              oscillating=oscillating, monotone=monotone, 
+              load_history=load_history)
@@ -19,7 +19,18 @@ This is the `piecewisefns` package level docstring.
 
 
 The package contains the following modules:
-    - don't know yet      maybe a short description
-    - don't know yet      maybe a short description
+    - piecewise_linear_1d   piecewise 1d linear relationships
+    - streaming             chunked (out of core) versions of the 
+                            piecewise_linear_1d analysis functions
+    - ragged                batch versions of the piecewise_linear_1d 
+                            functions for many functions at once
+    - packed                packed, memory-mappable storage for large 
+                            collections of piecewise functions
+    - cache                 content keyed LRU cache of segment analysis 
+                            results
+    - instrument            optional call count, timing and memory 
+                            instrumentation of the hot paths
+    - parallel              process pool, shared memory versions of the 
+                            ragged batch functions
     
 """
\ No newline at end of file
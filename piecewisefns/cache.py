@@ -0,0 +1,257 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+opt-in memoisation of the piecewise_linear_1d segment analysis functions
+
+Results are keyed by a hash of the bytes, dtype and shape of the input 
+arrays so equal data from different sources shares one entry and repeated 
+analysis costs only the hash.  `AnalysisCache` is a bounded least recently 
+used (LRU) store that can be capped by number of entries and by the bytes 
+held in cached results.  The module level functions use a shared 
+`default_cache`.
+
+Cached results are read-only arrays shared between callers; copy them 
+before modifying.
+
+"""
+from __future__ import print_function, division
+
+import collections
+import hashlib
+import threading
+import numpy as np
+
+from piecewisefns import piecewise_linear_1d as pwl
+
+#blake2b is considerably faster than sha1 but is not available in python 2
+_hash = getattr(hashlib, 'blake2b', hashlib.sha1)
+
+
+def array_digest(*arrays):
+    """hash of the dtype, shape and bytes of one or more arrays
+    
+    Parameters
+    ----------
+    arrays : array_like
+        data to hash.  Non-contiguous arrays are copied before hashing.
+        
+    Returns
+    -------
+    digest : bytes
+        equal for arrays with equal dtype, shape and contents
+        
+    """
+    
+    h = _hash()
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(repr((a.dtype.str, a.shape)).encode('ascii'))
+        h.update(a.view(np.uint8).ravel())
+    return h.digest()
+    
+def _nbytes(result):
+    """bytes held in the arrays of a result"""
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, tuple):
+        return sum(_nbytes(r) for r in result)
+    return 0
+    
+def _read_only(result):
+    """result with its arrays flagged read-only"""
+    if isinstance(result, np.ndarray):
+        result.flags.writeable = False
+    elif isinstance(result, tuple):
+        for r in result:
+            _read_only(r)
+    return result
+    
+
+class AnalysisCache(object):
+    """bounded LRU cache of analysis results keyed by array content
+    
+    Parameters
+    ----------
+    maxsize : int or None, optional
+        maximum number of cached results (default=256).  None for no limit.
+    maxbytes : int or None, optional
+        maximum total bytes of the arrays in the cached results 
+        (default=None, no limit).  A result larger than this is returned 
+        but not cached.
+        
+    Attributes
+    ----------
+    hits, misses : int
+        number of lookups that were and were not found in the cache
+        
+    Examples
+    --------
+    >>> cache = AnalysisCache(maxsize=100)
+    >>> x = np.array([0, 1, 1, 2]); y = np.array([0, 0, 1, 1])
+    >>> cache.start_index_of_steps(x, y)
+    array([1])
+    >>> cache.start_index_of_steps(x, y)
+    array([1])
+    >>> cache.stats()['hits']
+    1
+    
+    """
+    
+    def __init__(self, maxsize=256, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self._entries = collections.OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+    def __len__(self):
+        return len(self._entries)
+        
+    def clear(self):
+        """remove all entries and reset the statistics"""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            
+    def stats(self):
+        """hit and miss counts and current size
+        
+        Returns
+        -------
+        stats : dict
+            keys 'hits', 'misses', 'size' (number of entries), 'nbytes' 
+            (bytes held), 'maxsize' and 'maxbytes'
+            
+        """
+        
+        return dict(hits=self.hits, misses=self.misses, 
+                    size=len(self._entries), nbytes=self._nbytes, 
+                    maxsize=self.maxsize, maxbytes=self.maxbytes)
+                    
+    def _evict(self):
+        """drop least recently used entries until within the limits"""
+        while self._entries and (
+                (self.maxsize is not None and len(self._entries) > self.maxsize) or 
+                (self.maxbytes is not None and self._nbytes > self.maxbytes)):
+            key, (result, nbytes) = self._entries.popitem(last=False)
+            self._nbytes -= nbytes
+            
+    def call(self, func, *arrays, **kwargs):
+        """call func(*arrays, **kwargs) or return its cached result
+        
+        Parameters
+        ----------
+        func : callable
+            function of one or more arrays.  Its result should be an array 
+            or tuple of arrays which must not depend on anything but the 
+            arguments.  `func` is part of the key, so the cache keeps a 
+            reference to it until its entries are evicted.
+        arrays : array_like
+            array arguments to `func`; their content is hashed
+        kwargs : hashable
+            extra keyword arguments to `func`; part of the key
+            
+        Returns
+        -------
+        result :
+            result of `func` with its arrays read-only
+            
+        """
+        
+        #keyed on the function object itself (not its name) so that 
+        #different functions with the same name never share entries
+        key = (func, array_digest(*arrays), tuple(sorted(kwargs.items())))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                #re-insert as most recently used
+                self._entries[key] = self._entries.pop(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            
+        result = _read_only(func(*arrays, **kwargs))
+        nbytes = _nbytes(result)
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return result
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (result, nbytes)
+                self._nbytes += nbytes
+                self._evict()
+        return result
+        
+    def memoize(self, func):
+        """wrap a function of arrays so that its results are cached here
+        
+        Parameters
+        ----------
+        func : callable
+            see `call`
+            
+        Returns
+        -------
+        wrapper : callable
+            ``wrapper(*arrays, **kwargs)`` is ``self.call(func, *arrays, **kwargs)``
+            
+        """
+        
+        def wrapper(*arrays, **kwargs):
+            return self.call(func, *arrays, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+        
+    def ramps_constants_steps(self, x, y):
+        """cached `piecewise_linear_1d.ramps_constants_steps`"""
+        return self.call(pwl.ramps_constants_steps, x, y)
+        
+    def start_index_of_ramps(self, x, y):
+        """cached `piecewise_linear_1d.start_index_of_ramps`"""
+        return self.call(pwl.start_index_of_ramps, x, y)
+        
+    def start_index_of_constants(self, x, y):
+        """cached `piecewise_linear_1d.start_index_of_constants`"""
+        return self.call(pwl.start_index_of_constants, x, y)
+        
+    def start_index_of_steps(self, x, y):
+        """cached `piecewise_linear_1d.start_index_of_steps`"""
+        return self.call(pwl.start_index_of_steps, x, y)
+        
+        
+default_cache = AnalysisCache()
+
+
+def ramps_constants_steps(x, y):
+    """`piecewise_linear_1d.ramps_constants_steps` cached in `default_cache`"""
+    return default_cache.ramps_constants_steps(x, y)
+    
+def start_index_of_ramps(x, y):
+    """`piecewise_linear_1d.start_index_of_ramps` cached in `default_cache`"""
+    return default_cache.start_index_of_ramps(x, y)
+    
+def start_index_of_constants(x, y):
+    """`piecewise_linear_1d.start_index_of_constants` cached in `default_cache`"""
+    return default_cache.start_index_of_constants(x, y)
+    
+def start_index_of_steps(x, y):
+    """`piecewise_linear_1d.start_index_of_steps` cached in `default_cache`"""
+    return default_cache.start_index_of_steps(x, y)
@@ -0,0 +1,203 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+optional instrumentation of the piecewisefns hot paths
+
+Functions decorated with `instrumented` keep per-function call counts, 
+cumulative wall time, input sizes and (optionally) bytes allocated once 
+`enable` has been called.  Instrumentation is off by default; a disabled 
+wrapper costs one flag check.  Results are read with `snapshot` or pushed 
+to a user callback after every call, e.g. to export to a metrics system.
+
+Examples
+--------
+>>> from piecewisefns import instrument
+>>> from piecewisefns import piecewise_linear_1d as pwl
+>>> instrument.enable()
+>>> pwl.has_steps([0, 1, 1, 2])
+True
+>>> instrument.snapshot()['has_steps']['calls']
+1
+>>> instrument.disable()
+
+"""
+from __future__ import print_function, division
+
+import functools
+import itertools
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    #python < 3.4
+    tracemalloc = None
+    
+if hasattr(time, 'perf_counter'):
+    _clock = time.perf_counter
+else:
+    _clock = time.time
+    
+    
+class _State(object):
+    """module wide instrumentation state"""
+    __slots__ = ('enabled', 'track_memory', 'callback', 'stats', 'lock', 
+                 'local', 'started_tracemalloc')
+    
+    def __init__(self):
+        self.enabled = False
+        self.track_memory = False
+        self.callback = None
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started_tracemalloc = False
+        
+_state = _State()
+
+
+def enable(track_memory=False, callback=None):
+    """start recording calls to instrumented functions
+    
+    Parameters
+    ----------
+    track_memory : bool, optional
+        if True record the peak bytes allocated during each call using 
+        `tracemalloc` (default=False).  This slows numpy allocations 
+        considerably so only use it when investigating memory use.  Only 
+        the outermost of nested instrumented calls records bytes.
+    callback : callable, optional
+        called as ``callback(name, record)`` after every instrumented call 
+        where record is a dict with keys 'seconds', 'items' and 'nbytes' for 
+        that call
+        
+    """
+    
+    if track_memory:
+        if tracemalloc is None:
+            raise ValueError("track_memory needs the tracemalloc module "
+                             "(python 3.4 or later)")
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _state.started_tracemalloc = True
+    _state.track_memory = track_memory
+    _state.callback = callback
+    _state.enabled = True
+    
+def disable():
+    """stop recording; the statistics so far are kept"""
+    _state.enabled = False
+    if _state.started_tracemalloc:
+        tracemalloc.stop()
+        _state.started_tracemalloc = False
+    _state.track_memory = False
+    _state.callback = None
+    
+def is_enabled():
+    """True if instrumentation is on"""
+    return _state.enabled
+    
+def reset():
+    """discard all recorded statistics"""
+    with _state.lock:
+        _state.stats = {}
+        
+def snapshot():
+    """copy of the statistics recorded so far
+    
+    Returns
+    -------
+    stats : dict
+        function name -> dict with keys 'calls', 'seconds' (cumulative wall 
+        time, including time in nested instrumented calls), 'items' (total 
+        number of values in the array arguments) and 'nbytes' (total of 
+        the peak bytes allocated per call, 0 unless track_memory)
+        
+    """
+    
+    with _state.lock:
+        return dict((name, dict(s)) for name, s in _state.stats.items())
+        
+def _items(args, kwargs):
+    """number of values in the array-like positional and keyword arguments"""
+    n = 0
+    for a in itertools.chain(args, kwargs.values()):
+        if hasattr(a, 'size') and hasattr(a, 'shape'):
+            n += a.size
+        elif isinstance(a, (list, tuple)):
+            n += len(a)
+    return n
+    
+def _record(func, name, args, kwargs):
+    """call func, timing it and updating the statistics"""
+    
+    local = _state.local
+    depth = getattr(local, 'depth', 0)
+    measure_memory = _state.track_memory and depth == 0
+    if measure_memory:
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+            
+    local.depth = depth + 1
+    start = _clock()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        seconds = _clock() - start
+        local.depth = depth
+        nbytes = 0
+        if measure_memory and tracemalloc.is_tracing():
+            nbytes = max(tracemalloc.get_traced_memory()[1] - start_bytes, 0)
+        items = _items(args, kwargs)
+        with _state.lock:
+            s = _state.stats.get(name)
+            if s is None:
+                s = _state.stats[name] = dict(calls=0, seconds=0.0, 
+                                              items=0, nbytes=0)
+            s['calls'] += 1
+            s['seconds'] += seconds
+            s['items'] += items
+            s['nbytes'] += nbytes
+        callback = _state.callback
+        if callback is not None:
+            callback(name, dict(seconds=seconds, items=items, nbytes=nbytes))
+            
+def instrumented(func):
+    """decorator recording calls to func while instrumentation is enabled
+    
+    Parameters
+    ----------
+    func : callable
+        function to wrap.  Statistics are recorded under its __name__.
+        
+    Returns
+    -------
+    wrapper : callable
+        calls func directly when instrumentation is disabled
+        
+    """
+    
+    name = func.__name__
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _state.enabled:
+            return func(*args, **kwargs)
+        return _record(func, name, args, kwargs)
+    return wrapper
@@ -0,0 +1,235 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+packed, memory-mappable storage for large collections of piecewise functions
+
+A collection of n x, y functions is stored as one ``(2, N)`` array holding 
+all the x values (row 0) and all the y values (row 1) end to end, plus an 
+``offsets`` array of length n + 1 such that function i is 
+``xy[:, offsets[i]:offsets[i + 1]]``.  On disk a packed library is a 
+directory containing ``xy.npy`` and ``offsets.npy`` which is opened with 
+``np.load(mmap_mode=...)`` so that each function is a zero-copy slice of 
+the memory map.
+
+The bulk classification methods of `PackedLibrary` work on the whole 
+concatenated buffer at once, without making per-function arrays.
+
+"""
+from __future__ import print_function, division
+
+import os
+import numpy as np
+
+from piecewisefns.piecewise_linear_1d import PiecewiseLinear1D
+from piecewisefns import ragged
+
+
+def pack(xs, ys, dtype=None):
+    """pack a sequence of x, y functions into one buffer and offsets
+    
+    Parameters
+    ----------
+    xs, ys : sequence of 1d array_like
+        x and y coords of each function
+    dtype : numpy dtype, optional
+        dtype of the packed buffer (default is the common type of all the 
+        data)
+        
+    Returns
+    -------
+    xy : ndarray, shape (2, N)
+        all x values (row 0) and y values (row 1) end to end
+    offsets : ndarray of int64, shape (n + 1,)
+        function i is ``xy[:, offsets[i]:offsets[i + 1]]``
+        
+    """
+    
+    xs = [np.asarray(x) for x in xs]
+    ys = [np.asarray(y) for y in ys]
+    if len(xs) != len(ys):
+        raise ValueError("xs and ys must have the same number of functions")
+    for x, y in zip(xs, ys):
+        if x.ndim != 1 or x.shape != y.shape:
+            raise ValueError("each x and y must be 1d and of the same length")
+            
+    offsets = np.zeros(len(xs) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in xs], out=offsets[1:])
+    if dtype is None:
+        #unique dtypes only; result_type takes a limited number of args
+        dtypes = set(a.dtype for a in xs + ys)
+        dtype = np.result_type(*dtypes) if dtypes else np.float64
+    xy = np.empty((2, offsets[-1]), dtype=dtype)
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        xy[0, offsets[i]:offsets[i + 1]] = x
+        xy[1, offsets[i]:offsets[i + 1]] = y
+    return xy, offsets
+    
+def save_packed(path, xs, ys, dtype=None):
+    """write a sequence of x, y functions as a packed library directory
+    
+    Parameters
+    ----------
+    path : str
+        directory to write ``xy.npy`` and ``offsets.npy`` to.  Created if 
+        it does not exist.
+    xs, ys : sequence of 1d array_like
+        x and y coords of each function
+    dtype : numpy dtype, optional
+        dtype of the packed buffer, see `pack`
+        
+    """
+    
+    xy, offsets = pack(xs, ys, dtype)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    np.save(os.path.join(path, 'xy.npy'), xy)
+    np.save(os.path.join(path, 'offsets.npy'), offsets)
+    
+class PackedLibrary(object):
+    """a collection of piecewise functions in one concatenated buffer
+    
+    Parameters
+    ----------
+    xy : ndarray, shape (2, N)
+        all x values (row 0) and y values (row 1) end to end
+    offsets : 1d ndarray of int
+        function i is ``xy[:, offsets[i]:offsets[i + 1]]``
+        
+    See also
+    --------
+    pack, save_packed, PackedLibrary.open
+    
+    """
+    
+    __slots__ = ('xy', 'offsets')
+    
+    def __init__(self, xy, offsets):
+        offsets = np.asarray(offsets)
+        if xy.ndim != 2 or xy.shape[0] != 2:
+            raise ValueError("xy must have shape (2, N)")
+        if offsets.ndim != 1 or len(offsets) < 1 or offsets[0] != 0 or \
+                offsets[-1] != xy.shape[1] or np.any(np.diff(offsets) < 0):
+            raise ValueError("offsets must be non-decreasing from 0 to the length of xy")
+        self.xy = xy
+        self.offsets = offsets
+        
+    @classmethod
+    def open(cls, path, mmap_mode='r'):
+        """open a packed library directory written by `save_packed`
+        
+        Parameters
+        ----------
+        path : str
+            library directory
+        mmap_mode : str, optional
+            memory map mode of the xy buffer, see `np.load` (default 'r')
+            
+        """
+        return cls(np.load(os.path.join(path, 'xy.npy'), mmap_mode=mmap_mode), 
+                   np.load(os.path.join(path, 'offsets.npy')))
+                   
+    @property
+    def x(self):
+        """all x values end to end"""
+        return self.xy[0]
+        
+    @property
+    def y(self):
+        """all y values end to end"""
+        return self.xy[1]
+        
+    def __len__(self):
+        return len(self.offsets) - 1
+        
+    def __getitem__(self, i):
+        """x, y of function i as zero-copy slices of the buffer"""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("function index out of range")
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return self.xy[0, a:b], self.xy[1, a:b]
+        
+    def function(self, i):
+        """function i as a PiecewiseLinear1D (x and y are views of the buffer)"""
+        return PiecewiseLinear1D(*self[i])
+        
+    def has_steps(self):
+        """has_steps for every function, as a bool array"""
+        return ragged.has_steps(self.x, self.offsets)
+        
+    def strictly_increasing(self):
+        """strictly_increasing for every function, as a bool array"""
+        return ragged.strictly_increasing(self.x, self.offsets)
+        
+    def strictly_decreasing(self):
+        """strictly_decreasing for every function, as a bool array"""
+        return ragged.strictly_decreasing(self.x, self.offsets)
+        
+    def non_increasing(self):
+        """non_increasing for every function, as a bool array"""
+        return ragged.non_increasing(self.x, self.offsets)
+        
+    def non_decreasing(self):
+        """non_decreasing for every function, as a bool array"""
+        return ragged.non_decreasing(self.x, self.offsets)
+        
+    def ramps_constants_steps(self):
+        """start indecies of the ramps, constants and steps of every function
+        
+        See `ragged.ramps_constants_steps` for the layout of the results.
+        
+        """
+        return ragged.ramps_constants_steps(self.x, self.y, self.offsets)
+        
+    def start_index_of_ramps(self):
+        """start_index_of_ramps for every function
+        
+        Returns
+        -------
+        index : 1d ndarray of int
+            start indecies (local to each function) of all ramps
+        index_offsets : 1d ndarray of int
+            the ramps of function i are ``index[index_offsets[i]:index_offsets[i + 1]]``
+            
+        """
+        return ragged.start_index_of_ramps(self.x, self.y, self.offsets)
+        
+    def start_index_of_constants(self):
+        """start_index_of_constants for every function, laid out as for `start_index_of_ramps`"""
+        return ragged.start_index_of_constants(self.x, self.y, self.offsets)
+        
+    def start_index_of_steps(self):
+        """start_index_of_steps for every function, laid out as for `start_index_of_ramps`"""
+        return ragged.start_index_of_steps(self.x, self.y, self.offsets)
+        
+    def evaluate(self, xi, xi_offsets, at_step='right'):
+        """evaluate every function at its own query points
+        
+        See `ragged.evaluate`.
+        
+        """
+        return ragged.evaluate(self.x, self.y, self.offsets, xi, xi_offsets, at_step)
+        
+    def resample(self, grid=None, dtype=np.float64, out=None, at_step='right'):
+        """every function on a common grid as a dense matrix
+        
+        See `ragged.resample`.
+        
+        """
+        return ragged.resample(self.x, self.y, self.offsets, grid, dtype, 
+                               out, at_step)
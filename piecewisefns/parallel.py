@@ -0,0 +1,243 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+process pool versions of the ragged batch functions
+
+Inputs and outputs are placed in `multiprocessing.shared_memory` blocks so 
+that workers read the ragged x, y data and write their results without 
+any arrays being pickled; only block names and function index ranges are 
+sent to the workers.  Each task handles `chunksize` whole functions using 
+the serial `piecewisefns.ragged` kernels, so results are identical to the 
+serial path.
+
+Shared memory needs python 3.8 or later.  Without it, or with 
+``workers=1``, the serial `ragged` functions are used directly.
+
+"""
+from __future__ import print_function, division
+
+import multiprocessing
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    #python < 3.8
+    shared_memory = None
+    
+from piecewisefns import ragged
+
+
+#shared memory blocks attached in a worker process, by name
+_attached = {}
+
+
+def _share(a):
+    """copy an array into a new shared memory block
+    
+    Returns
+    -------
+    shm : SharedMemory
+        the block; the caller must close and unlink it
+    spec : tuple
+        (name, shape, dtype str) to attach to it with `_view`
+        
+    """
+    
+    a = np.asarray(a)
+    shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+    view = np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)
+    view[...] = a
+    del view
+    return shm, (shm.name, a.shape, a.dtype.str)
+    
+def _view(spec):
+    """array view of a shared memory block, attaching to it if needed"""
+    name, shape, dtype = spec
+    shm = _attached.get(name)
+    if shm is None:
+        shm = _attached[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    
+def _copy(block):
+    """copy of a block's array, read through the creating handle
+    
+    Used in the parent process so that it never attaches (with `_view`) to 
+    blocks it created.
+    
+    """
+    shm, (name, shape, dtype) = block
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    
+def _release(blocks):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+        
+def _tasks(n, workers, chunksize):
+    """(lo, hi) function index ranges"""
+    if chunksize is None:
+        chunksize = max(-(-n // (4 * workers)), 1)
+    return [(lo, min(lo + chunksize, n)) for lo in range(0, n, chunksize)]
+    
+def _use_serial(n, workers):
+    return shared_memory is None or workers == 1 or n <= 1
+    
+def _default_workers(workers):
+    if workers is None:
+        return multiprocessing.cpu_count()
+    if workers < 1:
+        raise ValueError("workers must be at least 1, not %r" % (workers,))
+    return workers
+    
+def _run(task, args, workers):
+    pool = multiprocessing.Pool(workers)
+    try:
+        pool.map(task, args, chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
+        
+def _classify_task(args):
+    name, x_spec, offsets_spec, out_spec, lo, hi = args
+    x = _view(x_spec)
+    offsets = _view(offsets_spec)
+    out = _view(out_spec)
+    a = offsets[lo]
+    out[lo:hi] = getattr(ragged, name)(x[a:offsets[hi]], offsets[lo:hi + 1] - a)
+    
+def _classify(name, x, offsets, workers, chunksize):
+    """run the ragged bool-per-function check `name` over a process pool"""
+    
+    x, offsets = ragged._check(x, offsets)
+    n = len(offsets) - 1
+    workers = _default_workers(workers)
+    if _use_serial(n, workers):
+        return getattr(ragged, name)(x, offsets)
+        
+    blocks = []
+    try:
+        for a in (x, offsets, np.zeros(n, dtype=bool)):
+            blocks.append(_share(a))
+        specs = [spec for shm, spec in blocks]
+        _run(_classify_task, 
+             [(name,) + tuple(specs) + (lo, hi) 
+              for lo, hi in _tasks(n, workers, chunksize)], workers)
+        return _copy(blocks[2])
+    finally:
+        _release([shm for shm, spec in blocks])
+        
+def has_steps(x, offsets, workers=None, chunksize=None):
+    """parallel `ragged.has_steps`
+    
+    Parameters
+    ----------
+    x : 1d array_like
+        ragged x values
+    offsets : 1d array_like of int
+        function i is ``x[offsets[i]:offsets[i + 1]]``
+    workers : int, optional
+        number of worker processes (default is the number of cpus)
+    chunksize : int, optional
+        number of functions per task (default gives about four tasks per 
+        worker)
+        
+    Returns
+    -------
+    out : 1d ndarray of bool
+        result for each function
+        
+    """
+    return _classify('has_steps', x, offsets, workers, chunksize)
+    
+def strictly_increasing(x, offsets, workers=None, chunksize=None):
+    """parallel `ragged.strictly_increasing`, see `has_steps` for parameters"""
+    return _classify('strictly_increasing', x, offsets, workers, chunksize)
+    
+def strictly_decreasing(x, offsets, workers=None, chunksize=None):
+    """parallel `ragged.strictly_decreasing`, see `has_steps` for parameters"""
+    return _classify('strictly_decreasing', x, offsets, workers, chunksize)
+    
+def non_increasing(x, offsets, workers=None, chunksize=None):
+    """parallel `ragged.non_increasing`, see `has_steps` for parameters"""
+    return _classify('non_increasing', x, offsets, workers, chunksize)
+    
+def non_decreasing(x, offsets, workers=None, chunksize=None):
+    """parallel `ragged.non_decreasing`, see `has_steps` for parameters"""
+    return _classify('non_decreasing', x, offsets, workers, chunksize)
+    
+def _evaluate_task(args):
+    specs, at_step, lo, hi = args
+    x, y, offsets, xi, xi_offsets, out = [_view(spec) for spec in specs]
+    a, b = offsets[lo], offsets[hi]
+    qa, qb = xi_offsets[lo], xi_offsets[hi]
+    out[qa:qb] = ragged.evaluate(x[a:b], y[a:b], offsets[lo:hi + 1] - a, 
+                                 xi[qa:qb], xi_offsets[lo:hi + 1] - qa, 
+                                 at_step)
+                                 
+def evaluate(x, y, offsets, xi, xi_offsets, at_step='right', workers=None, 
+             chunksize=None):
+    """parallel `ragged.evaluate`
+    
+    Parameters
+    ----------
+    x, y : 1d array_like
+        ragged x and y values
+    offsets : 1d array_like of int
+        function i is ``x[offsets[i]:offsets[i + 1]]``
+    xi : 1d array_like
+        ragged query points
+    xi_offsets : 1d array_like of int
+        the query points of function i are ``xi[xi_offsets[i]:xi_offsets[i + 1]]``
+    at_step : ['right', 'left', 'mean'], optional
+        value to return when xi coincides with a step (default='right')
+    workers : int, optional
+        number of worker processes (default is the number of cpus)
+    chunksize : int, optional
+        number of functions per task (default gives about four tasks per 
+        worker)
+        
+    Returns
+    -------
+    yi : 1d ndarray
+        values at xi, in the same ragged layout as xi
+        
+    """
+    
+    x, offsets = ragged._check(x, offsets)
+    y, offsets = ragged._check(y, offsets)
+    xi, xi_offsets = ragged._check(xi, xi_offsets)
+    if len(xi_offsets) != len(offsets):
+        raise ValueError("xi_offsets and offsets must have the same length")
+    n = len(offsets) - 1
+    workers = _default_workers(workers)
+    if _use_serial(n, workers):
+        return ragged.evaluate(x, y, offsets, xi, xi_offsets, at_step)
+        
+    #dtype of the serial result
+    dtype = ragged.evaluate(x[:0], y[:0], [0], xi[:0], [0], at_step).dtype
+    blocks = []
+    try:
+        for a in (x, y, offsets, xi, xi_offsets, np.empty(len(xi), dtype=dtype)):
+            blocks.append(_share(a))
+        specs = tuple(spec for shm, spec in blocks)
+        _run(_evaluate_task, 
+             [(specs, at_step, lo, hi) 
+              for lo, hi in _tasks(n, workers, chunksize)], workers)
+        return _copy(blocks[-1])
+    finally:
+        _release([shm for shm, spec in blocks])
@@ -17,23 +17,193 @@
 """
 module for piecewise 1d linear relationships
 
+Floating point data keeps its dtype throughout, so float32 x, y data gives 
+float32 slopes, integrals and results, and query points (xi, levels, 
+integration limits) are converted to the dtype of the function.  Integer 
+data is promoted to float64.  The running total behind `integrate` and 
+`average` is always accumulated in at least float64, and only the results 
+are cast back.
+
 """
 from __future__ import print_function, division
 
 import numpy as np
 
+from piecewisefns.instrument import instrumented
+
+
+#number of segments classified at a time by SegmentProfile, so that its 
+#bool scratch stays small next to dx
+_PROFILE_BLOCKSIZE = 2**16
+
+
+class SegmentProfile(object):
+    """monotonicity and segment classification of x, y data
+    
+    Produced by `segment_profile`, which computes ``np.diff`` once; the 
+    module level classification functions are all answered from one of 
+    these.
+    
+    Attributes
+    ----------
+    dx, dy : ndarray
+        difference between consecutive x and y values.  `dy` is None if 
+        the profile was made from x alone.
+    n_increasing, n_decreasing : int
+        number of segments with dx>0 and dx<0
+    n_steps : int
+        number of segments with dx==0, i.e. consecutive equal x values 
+        (whatever the change in y)
+    first_change : int
+        index of the first segment with dx!=0, -1 if there is none
+    repeats : ndarray of int
+        start indecies of all segments with dx==0
+    ramps, constants, steps : ndarray of int
+        start indecies of the ramp (dx!=0, dy!=0), constant (dx!=0, 
+        dy==0) and step (dx==0, dy!=0) segments.  None if the profile was 
+        made from x alone.
+    degenerate : ndarray of int
+        start indecies of zero length segments (dx==0, dy==0).  None if 
+        the profile was made from x alone.
+        
+    """
+    
+    __slots__ = ('dx', 'dy', 'n_increasing', 'n_decreasing', 'n_steps', 
+                 'first_change', 'repeats', 
+                 'ramps', 'constants', 'steps', 'degenerate')
+                 
+    def __init__(self, dx, dy=None):
+        n = len(dx)
+        self.dx = dx
+        self.dy = dy
+        n_increasing = n_decreasing = 0
+        repeats = [np.zeros(0, dtype=np.intp)]
+        for start in range(0, n, _PROFILE_BLOCKSIZE):
+            block = dx[start:start + _PROFILE_BLOCKSIZE]
+            n_increasing += np.count_nonzero(block > 0)
+            n_decreasing += np.count_nonzero(block < 0)
+            repeats.append(np.flatnonzero(block == 0) + start)
+        self.n_increasing = int(n_increasing)
+        self.n_decreasing = int(n_decreasing)
+        self.repeats = np.concatenate(repeats)
+        self.n_steps = len(self.repeats)
+        
+        #repeats are sorted so the first change is the first gap in them
+        gaps = np.flatnonzero(self.repeats != np.arange(self.n_steps))
+        if len(gaps):
+            self.first_change = int(gaps[0])
+        elif self.n_steps < n:
+            self.first_change = self.n_steps
+        else:
+            self.first_change = -1
+            
+        if dy is None:
+            self.ramps = self.constants = self.steps = self.degenerate = None
+            return
+        zero_dy = dy == 0
+        nonzero_dx = dx != 0
+        self.ramps = np.flatnonzero(nonzero_dx & ~zero_dy)
+        self.constants = np.flatnonzero(nonzero_dx & zero_dy)
+        zero_length = zero_dy[self.repeats]
+        self.steps = self.repeats[~zero_length]
+        self.degenerate = self.repeats[zero_length]
+        
+    @property
+    def strictly_increasing(self):
+        """all x[i+1] > x[i]"""
+        return self.n_increasing == len(self.dx)
+        
+    @property
+    def strictly_decreasing(self):
+        """all x[i+1] < x[i]"""
+        return self.n_decreasing == len(self.dx)
+        
+    @property
+    def non_increasing(self):
+        """all x[i+1] <= x[i]"""
+        return self.n_decreasing + self.n_steps == len(self.dx)
+        
+    @property
+    def non_decreasing(self):
+        """all x[i+1] >= x[i]"""
+        return self.n_increasing + self.n_steps == len(self.dx)
+        
+    @property
+    def monotonicity(self):
+        """monotonicity class of x
+        
+        One of 'strictly_increasing', 'strictly_decreasing', 
+        'non_decreasing', 'non_increasing' or 'neither'; the first that 
+        applies in that order.
+        
+        """
+        for name in ('strictly_increasing', 'strictly_decreasing', 
+                     'non_decreasing', 'non_increasing'):
+            if getattr(self, name):
+                return name
+        return 'neither'
+        
+        
+@instrumented
+def segment_profile(x, y=None):
+    """monotonicity and segment classification of x, y data in one pass
+    
+    ``np.diff`` of x (and y) is computed once and everything the 
+    classification functions in this module need is derived from it.  Use 
+    this instead of calling several of those functions on the same data.
+    
+    Parameters
+    ----------
+    x : array_like
+        x coordinates
+    y : array_like, optional
+        y coordinates.  If not given only the x based parts of the 
+        profile (monotonicity, steps, first change) are computed.
+        
+    Returns
+    -------
+    profile : SegmentProfile
+        see `SegmentProfile` for the attributes
+        
+    """
+    
+    x = np.asarray(x)
+    if y is None:
+        return SegmentProfile(np.diff(x))
+    y = np.asarray(y)
+    return SegmentProfile(np.diff(x), np.diff(y))
+    
+    
+#number of consecutive pairs compared at a time by the predicates below; 
+#small enough that the scratch stays in cache
+_BLOCKSIZE = 8192
+
 
+def _pairs(x, blocksize=_BLOCKSIZE):
+    """yield (x[i:j], x[i+1:j+1]) views block by block
+    
+    The predicates compare the two views of each block, so scratch memory 
+    is bounded by the block size and a scan can stop at the first block 
+    that decides the answer.
+    
+    """
+    
+    x = np.asarray(x)
+    for start in range(0, len(x) - 1, blocksize):
+        block = x[start:start + blocksize + 1]
+        yield block[:-1], block[1:]
+        
+@instrumented
 def has_steps(x):
     """check if data points have any step changes
     
-    True if any two consecutive x values are equal
+    True if any two consecutive x values are equal.  x is scanned in 
+    blocks and the scan stops at the first step.
     
     Parameters
     ----------
     x : array_like
         x-coordinates
-    y : array_like
-        y-coordinates 
         
     Returns
     -------
@@ -41,15 +211,15 @@ def has_steps(x):
         returns true if any two consecutive x values are equal
         
     """
-    x = np.asarray(x)
-    #y = np.asarray(y)
-    return np.any(np.diff(x)==0)
+    return any(np.any(a == b) for a, b in _pairs(x))
     
 
+@instrumented
 def is_initially_increasing(x):
     """Are first two values increasing?
     
-    finds 1st instance where x[i+1] != x[i] and checks if x[i+1] > x[i]
+    finds 1st instance where x[i+1] != x[i] and checks if x[i+1] > x[i].  
+    x is scanned in blocks so only the start of the data is looked at.
     
     Parameters
     ----------
@@ -62,43 +232,103 @@ def is_initially_increasing(x):
         returns True is if 2nd value is greater than the 1st value
         returns False if 2nd value is less than the 1st value
         
+    Raises
+    ------
+    ValueError
+        if all values of x are equal
+        
     """
     
-    #this might be slow for long lists, perhaps just loop through until x[i+1]!=x[i]
-    if x[1]!=x[0]:
-        return x[1]>x[0]
-    x = np.asarray(x)
-    return np.where(np.diff(x)!=0)[0][0]>0
+    for a, b in _pairs(x):
+        change = a != b
+        if np.any(change):
+            i = np.argmax(change)
+            return bool(b[i] > a[i])
+    raise ValueError("all x values are equal, x is neither increasing nor decreasing")
     
         
 
 
 #used info from http://stackoverflow.com/questions/4983258/python-how-to-check-list-monotonicity
+#these scan x in blocks and stop at the first block that fails
+@instrumented
 def strictly_increasing(x):
     """Checks all x[i+1] > x[i]"""
-    x = np.asarray(x)
-    return np.all(np.diff(x)>0)
+    return all(np.all(b > a) for a, b in _pairs(x))
 
+@instrumented
 def strictly_decreasing(x):
     """Checks all x[i+1] < x[i]"""
-    x = np.asarray(x)
-    return np.all(np.diff(x)<0)
+    return all(np.all(b < a) for a, b in _pairs(x))
 
+@instrumented
 def non_increasing(x):
     """Checks all x[i+1] <= x[i]"""
-    x = np.asarray(x)
-    return np.all(np.diff(x)<=0)
+    return all(np.all(b <= a) for a, b in _pairs(x))
 
+@instrumented
 def non_decreasing(x):
     """Checks all x[i+1] >= x[i]"""
-    x = np.asarray(x)
-    return np.all(np.diff(x)>=0)
+    return all(np.all(b >= a) for a, b in _pairs(x))
 
 
 
+@instrumented
+def non_increasing_and_non_decreasing_runs(x):
+    """find the boundaries of the non-increasing and non-decreasing runs in x
+    
+    A new run starts wherever the direction of x changes.  Zero changes 
+    (repeated values) never start a new run; they belong to the run they 
+    are in, or to the first run if they are at the start of the data.  
+    Consecutive runs share their boundary point.  The split is done with a 
+    run-length encoding of ``np.sign(np.diff(x))`` so there is no Python 
+    level loop.
+    
+    Parameters
+    ----------
+    x : array_like
+        1 dimensional data to split
+        
+    Returns
+    -------
+    start, stop : 1d ndarray of int
+        ``x[start[i]:stop[i]]`` is the i-th run including its end point.  
+        The line segments in the run are ``range(start[i], stop[i] - 1)``. 
+        If x has less than two values both are empty.  If all values of x 
+        are equal there is a single run.
+        
+    Examples
+    --------
+    >>> start, stop = non_increasing_and_non_decreasing_runs([0, 0.5, 1, 0.75, 1.5, 2])
+    >>> start, stop
+    (array([0, 2, 3]), array([3, 4, 6]))
+    
+    """
+    
+    x = np.asarray(x)
+    n = len(x)
+    if n < 2:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        
+    sign_changes = np.sign(np.diff(x))
+    nonzero = np.flatnonzero(sign_changes)
+    signs = sign_changes[nonzero]
+    
+    start = np.empty(1, dtype=np.intp)
+    start[0] = 0
+    start = np.concatenate((start, nonzero[1:][signs[1:] != signs[:-1]]))
+    stop = np.empty_like(start)
+    stop[:-1] = start[1:] + 1
+    stop[-1] = n
+    return start, stop
+    
+@instrumented
 def non_increasing_and_non_decreasing_parts(x, include_end_point = False):
     """split up a list into sections that are non-increasing and non-decreasing
     
+    This is a list of lists view of `non_increasing_and_non_decreasing_runs` 
+    which should be preferred for long data.
+    
     Returns
     -------
     
@@ -115,31 +345,43 @@ def non_increasing_and_non_decreasing_parts(x, include_end_point = False):
     x[A[0].append[A[0][-1]+1]].
     """
     
-    x = np.asarray(x)
-    sign_changes = np.sign(np.diff(x))
-    A = [[0]]
-    
-    current_sign = sign_changes[np.where(sign_changes!=0)[0][0]]
-    
-    for i, sgn in enumerate(sign_changes.tolist()):
-        if i == 0: 
-            continue
-        if sgn != 0 and sgn != current_sign:
-            if include_end_point:
-                A[-1].append(i)
-            A.append([])
-            current_sign = sgn
-        A[-1].append(i)
-    if include_end_point: #append final end point
-        A[-1].append(A[-1][-1] + 1)    
-    return A
-    
-def force_strictly_increasing(x, y = None, keep_end_points = True, eps = 1e-15):
+    start, stop = non_increasing_and_non_decreasing_runs(x)
+    if not include_end_point:
+        stop = stop - 1
+    return [list(range(i, j)) for i, j in zip(start.tolist(), stop.tolist())]
+    
+def _reverse(a):
+    """reversed view of a, None if a is None"""
+    if a is None:
+        return None
+    return a[::-1]
+    
+def _reverse_inplace(a, blocksize=8192):
+    """reverse a 1d array in place, swapping blocks of at most `blocksize` 
+    values so that scratch memory is bounded"""
+    n = len(a)
+    half = n // 2
+    for i in range(0, half, blocksize):
+        j = min(i + blocksize, half)
+        tmp = a[i:j].copy()
+        a[i:j] = a[n - j:n - i][::-1]
+        a[n - j:n - i] = tmp[::-1]
+    return a
+    
+def _check_inplace(inplace, *arrays):
+    """raise if inplace modification of array_like inputs is requested"""
+    if inplace:
+        for a in arrays:
+            if not a is None and not isinstance(a, np.ndarray):
+                raise TypeError("inplace=True requires ndarray inputs, not %s" % type(a).__name__)
+                
+@instrumented
+def force_strictly_increasing(x, y = None, keep_end_points = True, eps = None, inplace = False):
     """force a non-decreasing or non-increasing list into a strictly increasing
     
-    Adds or subtracts tiny amounts (multiples of `eps`) from the x values in 
-    step changes to ensure no two consecutive x values are equal (i.e. make x 
-    strictly increasing).  The adjustments are small enough that for all 
+    Adds or subtracts tiny amounts (by default a few units in the last 
+    place of x's dtype) from the x values in step changes to ensure no two 
+    consecutive x values are equal (i.e. make x strictly increasing).  The adjustments are small enough that for all 
     intents and purposes the data behaves as before; it can now however be 
     easily used in straightforward interpolation functions that require 
     strictly increasing x data.
@@ -159,32 +401,81 @@ def force_strictly_increasing(x, y = None, keep_end_points = True, eps = 1e-15):
         data will be x=[0.9999,1], y=[20,40].  If keep_end_points==False then 
         data will be x=[1, 0.9999], y=[20,40]
     eps : float, optional
-        amount to add/subtract from x (default is 1e-15).  To ensure 
-        consecutive step changes are handled correctly multipes of `eps` 
-        will be added and subtracted. e.g. if there are a total of five 
-        steps in the data then the first step would get 5*`eps` adjustment, 
-        the second step 4*`eps` adjustment and so on.
+        amount to add/subtract from x.  To ensure consecutive step changes 
+        are handled correctly multipes of `eps` will be added and 
+        subtracted. e.g. if there are a total of five steps in the data 
+        then the first step would get 5*`eps` adjustment, the second step 
+        4*`eps` adjustment and so on.  The default, None, adjusts each 
+        step by the spacing between adjacent values of x's dtype 
+        (``np.spacing``) at that x, with multiples only for steps in the 
+        same run of equal x values, so that the separation works whatever 
+        the magnitude and precision of x (a fixed eps of 1e-15 does nothing 
+        to float32 data or to float64 values greater than about 10).
+    inplace : ``boolean``, optional
+        if True the step adjustments are written directly into `x`, which 
+        must then be a writeable floating point ndarray (default = False).
+        
+    Returns
+    -------
+    x, y : ndarray
+        strictly increasing x and the corresponding y (None if `y` was not 
+        given).  Floating point x keeps its dtype; integer x is converted 
+        to float64.
+        
+    Notes
+    -----
+    Copy semantics: `y` is never copied; it is returned as is or as a 
+    reversed view.  `x` is only copied when it has steps to adjust and 
+    `inplace` is False, so a caller's array is never modified unless 
+    ``inplace=True``.  Data that is already strictly monotonic is returned 
+    as is or as reversed views.  With ``inplace=True`` and non-increasing 
+    data the returned x is a reversed view of the input array, i.e. the 
+    adjustments are visible through the input in its original order.
         
     """
     
+    _check_inplace(inplace, x)
     x = np.asarray(x)
-    y = np.asarray(y)    
+    if x.dtype.kind != 'f':
+        if inplace:
+            raise TypeError("inplace=True requires floating point x, not %s" % x.dtype)
+        x = x.astype(np.float64)
+    if not y is None:
+        y = np.asarray(y)    
+    
+    profile = segment_profile(x)
     
-    if strictly_increasing(x):
+    if profile.strictly_increasing:
         return x, y
         
-    if strictly_decreasing(x):
-        return x[::-1], y[::-1]
+    if profile.strictly_decreasing:
+        return x[::-1], _reverse(y)
     
-    if non_increasing(x):
+    steps = profile.repeats
+    if not profile.non_decreasing:
+        if not profile.non_increasing:
+            raise ValueError("x data is neither non-increasing, nor non-decreasing, therefore cannot force to strictly increasing")
         x = x[::-1]
-        y = y[::-1]
-        
-    if not non_decreasing(x):
-        raise ValueError, "x data is neither non-increasing, nor non-decreasing, therefore cannot force to strictly increasing"
+        y = _reverse(y)
+        steps = len(x) - 2 - steps[::-1]
         
+    if not inplace:
+        x = x.copy()
             
-    steps = np.where(np.diff(x) == 0)[0]    
+    if eps is None:
+        #k units in the last place where k is the position of the step in 
+        #its run of equal x values (np.spacing is negative for negative x)
+        new_run = np.ones(len(steps), dtype=bool)
+        new_run[1:] = np.diff(steps) != 1
+        run = np.cumsum(new_run) - 1
+        position = np.arange(len(steps)) - np.flatnonzero(new_run)[run]
+        if keep_end_points:
+            k = np.bincount(run)[run] - position
+            x[steps] -= k * np.abs(np.spacing(x[steps]))
+        else:
+            k = position + 1
+            x[steps + 1] += k * np.abs(np.spacing(x[steps + 1]))
+        return x, y
     
     if keep_end_points:
         f = -1 * eps
@@ -195,10 +486,11 @@ def force_strictly_increasing(x, y = None, keep_end_points = True, eps = 1e-15):
         d = 1
         dx = np.arange(1,len(steps)+1) * f
             
-    x[steps + d] = x[steps + d] + dx
+    x[steps + d] += dx
     return x, y
 
-def force_non_decreasing(x, y=None):
+@instrumented
+def force_non_decreasing(x, y=None, inplace=False):
     """force non-increasing x, y data to non_decreasing by reversing the data
     
     Leaves already non-decreasing data alone.
@@ -207,23 +499,44 @@ def force_non_decreasing(x, y=None):
     ----------
     x, y: array_like
         x and y coordinates
+    inplace : ``boolean``, optional
+        if True non-increasing data is reversed in place in memory (x and 
+        y must then be writeable ndarrays), otherwise reversed views are 
+        returned (default = False).
         
     Returns
     -------
     x,y : ndarray, ndarray
-        non-decreasing version of x, y
+        non-decreasing version of x, y (y is None if not given)
+        
+    Notes
+    -----
+    Copy semantics: ndarray inputs are never copied.  The returned arrays 
+    are the inputs, reversed views of the inputs or, with 
+    ``inplace=True``, the inputs after being reversed in place using 
+    bounded scratch memory.
         
     """
+    
+    _check_inplace(inplace, x, y)
     x = np.asarray(x)
-    y = np.asarray(y)    
+    if not y is None:
+        y = np.asarray(y)    
+    
+    profile = segment_profile(x)
     
-    if non_decreasing(x):
+    if profile.non_decreasing:
         return x, y
     
-    if not non_increasing(x):
-        raise ValueError, "x data is neither non-increasing, nor non-decreasing, therefore cannot force to non-decreasing"        
+    if not profile.non_increasing:
+        raise ValueError("x data is neither non-increasing, nor non-decreasing, therefore cannot force to non-decreasing")        
                     
-    return x[::-1], y[::-1]    
+    if inplace:
+        _reverse_inplace(x)
+        if not y is None:
+            _reverse_inplace(y)
+        return x, y
+    return x[::-1], _reverse(y)    
     
         
     
@@ -231,6 +544,7 @@ def force_non_decreasing(x, y=None):
     
     
     
+@instrumented
 def ramps_constants_steps(x, y):
     """find the ramp segments, constant segments and step segments in x, y data
     
@@ -257,20 +571,18 @@ def ramps_constants_steps(x, y):
         
     """
     
-    x = np.asarray(x)
-    y = np.asarray(y)
-    
-    #find start index of instantaneous loads
-    steps = np.where(np.diff(x)==0)[0]    
+    profile = segment_profile(x, y)
     
-    #find start index of constant loads
-    constants = np.where(np.diff(y)==0)[0]
-    
-    #find start index of ramp loads    
-    ramps = np.delete(np.arange(len(x)-1),np.concatenate((steps, constants)))                
-
-    return ramps, constants, steps
+    #zero length segments (dx==0, dy==0) are reported as both a step and 
+    #a constant
+    steps = profile.repeats
+    constants = profile.constants
+    if len(profile.degenerate):
+        constants = np.sort(np.concatenate((constants, profile.degenerate)))
+        
+    return profile.ramps, constants, steps
 
+@instrumented
 def start_index_of_ramps(x, y):
     """find the start indecies of the ramp segments in x, y data.
     
@@ -291,13 +603,9 @@ def start_index_of_ramps(x, y):
         
     """
     
-    x = np.asarray(x)
-    y = np.asarray(y)
-    
-    
-    #return np.where(np.diff(x)!=0 & np.diff(y)!=0)[0]    
-    return  np.where((np.diff(x)!=0) & (np.diff(y)!=0))[0]
+    return segment_profile(x, y).ramps
     
+@instrumented
 def start_index_of_constants(x, y):
     """find the start indecies of the constant segments in x, y data.
     
@@ -319,12 +627,9 @@ def start_index_of_constants(x, y):
         
     """
     
-    x = np.asarray(x)
-    y = np.asarray(y)
-    
-    
-    return np.delete(np.where(np.diff(y)==0)[0], np.where((np.diff(x)==0) & (np.diff(y)==0))[0])   
+    return segment_profile(x, y).constants
 
+@instrumented
 def start_index_of_steps(x, y):
     """find the start indecies of the step segments in x, y data.
     
@@ -346,18 +651,414 @@ def start_index_of_steps(x, y):
         
     """
     
+    return segment_profile(x, y).steps
+
+@instrumented
+def ramps_constants_steps_after(x, y, xi):
+    """find the ramp segments, constant segments and step segments in x, y data that start after certain x values
+    
+    For each kind of segment the start indecies from 
+    `ramps_constants_steps` are returned once, along with, for each value 
+    in `xi`, a pointer to the first of those segments that starts strictly 
+    after xi.  Because x is non-decreasing the segments that start after 
+    xi are always a tail of the start index array, so the result is a 
+    compact (CSR-like) offset array rather than one list per xi.  Each 
+    pointer is found with a binary search against the segment start 
+    positions, so memory is O(len(x) + len(xi)).
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords (must be non-decreasing)
+    xi : array_like
+        x values of interest.  Any shape.
+        
+    Returns
+    -------
+    ramps : tuple of two ndarray
+        ``(start, ptr)`` where `start` is the start indecies of all ramps 
+        and ``start[ptr[j]:]`` are the ramps that start after ``xi[j]``. 
+        e.g. of a ramp is x=[0,2], y=[10,15]
+    constants : tuple of two ndarray
+        as for `ramps` but for constant sections. e.g. of a constant 
+        section is x=[0,2], y=[15,15]
+    steps : tuple of two ndarray
+        as for `ramps` but for steps. e.g. of a step is x=[1,1], y=[5,15]
+        
+    Raises
+    ------
+    ValueError
+        if x is not non-decreasing (the start positions would not be 
+        sorted)
+        
+    Examples
+    --------
+    >>> x = [0, 0, 1, 1, 2]
+    >>> y = [0, 10, 10, 30, 30]
+    >>> ramps, constants, steps = ramps_constants_steps_after(x, y, [-1, 0.5])
+    >>> start, ptr = steps
+    >>> start[ptr[1]:]
+    array([2])
+    
+    """
+    
+    x = np.asarray(x)
+    xi = np.asarray(xi)
+    if not non_decreasing(x):
+        raise ValueError("x data is not non-decreasing, therefore cannot find segments after xi")
+    
+    return tuple((start, np.searchsorted(x[start], xi, side='right')) 
+                 for start in ramps_constants_steps(x, y))
+    
+def _float_dtype(*arrays):
+    """floating point dtype of results computed from arrays
+    
+    float32 and wider floats are kept so float32 data stays float32; 
+    integers and bools are promoted to float64 and float16 to float32.
+    
+    """
+    dtype = np.result_type(*arrays)
+    if dtype.kind == 'f':
+        return np.promote_types(dtype, np.float32)
+    if dtype.kind == 'c':
+        return dtype
+    return np.dtype(np.float64)
+    
+def _segment_slopes(dx, dy):
+    """dy/dx for each segment with step segments (dx==0) given zero slope"""
+    slopes = np.zeros(len(dx), dtype=_float_dtype(dx, dy))
+    np.divide(dy, dx, out=slopes, where=dx != 0)
+    return slopes
+    
+def _evaluate(x, y, slopes, xi, at_step):
+    """evaluate non-decreasing piecewise linear data at xi
+    
+    See `evaluate`.  `slopes` are the precomputed segment slopes.
+    
+    """
+    
+    if at_step == 'mean':
+        out = _evaluate(x, y, slopes, xi, 'left')
+        out += _evaluate(x, y, slopes, xi, 'right')
+        out *= 0.5
+        return out
+    if not at_step in ('left', 'right'):
+        raise ValueError("at_step must be 'left', 'right' or 'mean', "
+                         "not %r" % (at_step,))
+        
+    #queries take the dtype of the function, so float32 data stays float32
+    dtype = _float_dtype(slopes, y)
+    xi = np.asarray(xi, dtype=dtype)
+    shape = xi.shape
+    xi = xi.ravel()
+    n = len(x)
+    if n == 1:
+        return np.full(shape, y[0], dtype=dtype)
+            
+    #side='right': x[k] <= xi < x[k+1], side='left': x[k] < xi <= x[k+1].
+    #Either way segment k has non-zero length so slopes[k] is meaningful. 
+    k = np.searchsorted(x, xi, side=at_step)
+    k -= 1
+    np.clip(k, 0, n - 2, out=k)
+    if at_step == 'right':
+        #measure from the start of the segment so x[k] is exact
+        out = np.subtract(xi, x[k], dtype=dtype)
+        out *= slopes[k]
+        out += y[k]
+        out[xi < x[0]] = y[0]
+        out[xi >= x[-1]] = y[-1]
+    else:
+        #measure from the end of the segment so x[k+1] is exact
+        out = np.subtract(xi, x[k + 1], dtype=dtype)
+        out *= slopes[k]
+        out += y[k + 1]
+        out[xi <= x[0]] = y[0]
+        out[xi > x[-1]] = y[-1]
+    return out.reshape(shape)
+    
+def _as_non_decreasing(x, y, what):
+    """profile and non-decreasing views of x, y; ValueError if not monotonic"""
+    
     x = np.asarray(x)
     y = np.asarray(y)
+    profile = segment_profile(x)
+    if profile.non_decreasing:
+        return x, y, profile.dx
+    if profile.non_increasing:
+        return x[::-1], y[::-1], -profile.dx[::-1]
+    raise ValueError("x data is neither non-increasing, nor non-decreasing, therefore cannot %s" % what)
+    
+@instrumented
+def evaluate(x, y, xi, at_step='right'):
+    """evaluate piecewise linear x, y data at many points, respecting steps
+    
+    Unlike `np.interp`, step changes (consecutive equal x values) are 
+    handled exactly; there is no need to perturb x with 
+    `force_strictly_increasing` first.  Each xi is located with a binary 
+    search (`np.searchsorted`) so the cost is O(len(xi) * log(len(x))).
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords.  x must be non-decreasing or non-increasing 
+        (non-increasing data is handled through reversed views, not 
+        copies).
+    xi : array_like
+        x values at which to evaluate the function.  Any shape.
+    at_step : ['right', 'left', 'mean'], optional
+        value to return when xi coincides with a step. 'right' (default) 
+        gives the value after the step, i.e. the limit from the right, 
+        'left' gives the value before the step and 'mean' the average of 
+        the two.  Consider x=[0,1,1,2], y=[0,0,5,5] at xi=1: 'right' gives 
+        5, 'left' gives 0 and 'mean' gives 2.5.
+        
+    Returns
+    -------
+    yi : ndarray
+        y values at `xi`.  Same shape as `xi`.  Outside the range of `x` 
+        the first and last y values are returned (as in `np.interp`).
+        
+    """
     
+    x, y, dx = _as_non_decreasing(x, y, 'evaluate')
+    return _evaluate(x, y, _segment_slopes(dx, np.diff(y)), xi, at_step)
     
-    return np.delete(np.where(np.diff(x)==0)[0], np.where((np.diff(x)==0) & (np.diff(y)==0))[0])
 
-def ramps_constants_steps_after(x,y,xi):
-    """find the ramp segments, constant segments and step segments in x, y data that start after certina x values
+def _crossing_x(x, y, j, levels):
+    """x where y first reaches each level in segment j-1 -> j
     
-    returns a tuple of lists indicating the start indecies for all ramp, 
-    constant and step segments in `x`, `y` data.  Assumes data is 
-    non_decreasing.
+    y[j-1] and y[j] must bracket the level with y[j] on or beyond it. Steps 
+    (x[j-1] == x[j]) give their x.
+    
+    """
+    
+    out = np.subtract(levels, y[j - 1], dtype=_float_dtype(x, y))
+    out *= x[j] - x[j - 1]
+    out /= y[j] - y[j - 1]
+    out += x[j - 1]
+    return out
+    
+def _bisect_left(v, lo, hi, q, sign):
+    """first index in each v[lo:hi] at which sign*v >= sign*q
+    
+    A vectorised bisection over all the queries at once, as in 
+    `piecewisefns.ragged.searchsorted`; sign*v must be non-decreasing 
+    within each [lo, hi).
+    
+    """
+    
+    lo = lo.astype(np.int64)
+    hi = hi.astype(np.int64)
+    while True:
+        active = lo < hi
+        if not np.any(active):
+            return lo
+        mid = (lo + hi) // 2
+        go_right = sign * v[np.minimum(mid, len(v) - 1)] < sign * q
+        go_right &= active
+        lo = np.where(go_right, mid + 1, lo)
+        hi = np.where(active & ~go_right, mid, hi)
+        
+@instrumented
+def first_crossing(x, y, levels):
+    """first x at which the function reaches each of many y levels
+    
+    For a level above y[0] this is the first x where y >= level, for a 
+    level below y[0] the first x where y <= level.  The running maximum 
+    and minimum of y are non-decreasing and non-increasing respectively, 
+    so each level is found with a single binary search.  A step through a 
+    level is an instantaneous crossing at the x of the step.
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords.  x must be non-decreasing or non-increasing 
+        (non-increasing x is searched from its smallest value).
+    levels : array_like
+        y values to find.  Any shape.
+        
+    Returns
+    -------
+    xc : ndarray of float
+        x at which each level is first reached, nan if it never is.  Same 
+        shape as `levels`.
+        
+    Examples
+    --------
+    >>> first_crossing([0, 1, 1, 3], [0, 1, 3, 1], [0.5, 2, 4])
+    array([0.5, 1. , nan])
+    
+    """
+    
+    x, y, dx = _as_non_decreasing(x, y, 'find crossings')
+    dtype = _float_dtype(x, y)
+    levels = np.asarray(levels, dtype=dtype)
+    shape = levels.shape
+    levels = levels.ravel()
+    out = np.full(len(levels), np.nan, dtype=dtype)
+    if len(x) == 0:
+        return out.reshape(shape)
+        
+    #first index at which the running max (min) reaches a level above 
+    #(below) y[0]; the segment ending there contains the crossing
+    for sign, envelope in [(1, np.maximum.accumulate(y)), 
+                           (-1, -np.minimum.accumulate(y))]:
+        idx = np.flatnonzero(sign * levels > sign * y[0])
+        j = np.searchsorted(envelope, sign * levels[idx], side='left')
+        found = j < len(x)
+        idx = idx[found]
+        out[idx] = _crossing_x(x, y, j[found], levels[idx])
+    out[levels == y[0]] = x[0]
+    return out.reshape(shape)
+    
+@instrumented
+def all_crossings(x, y, levels):
+    """every x at which the function crosses or touches each of many y levels
+    
+    The data is split into its monotone runs with 
+    `non_increasing_and_non_decreasing_runs`; the levels within the y range 
+    of each run are found by binary search of the sorted levels, and all 
+    the (run, level) pairs are then located within their runs by a single 
+    vectorised bisection, so the cost is 
+    O(n_runs * log(len(levels)) + n_crossings * log(run length)) with only 
+    about log2(longest run) passes in python.  A run 
+    reaching a level over a constant section gives a single crossing at 
+    the start of that section.  A step through a level is an instantaneous 
+    crossing at the x of the step.  A level touched at the point shared by 
+    two runs (a peak or trough) is reported once.
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords.  x must be non-decreasing or non-increasing 
+        (non-increasing x is searched from its smallest value).
+    levels : 1d array_like
+        y values to find
+        
+    Returns
+    -------
+    xc : 1d ndarray of float
+        x values of the crossings, grouped by level and non-decreasing 
+        within each level
+    offsets : 1d ndarray of int
+        ``xc[offsets[i]:offsets[i+1]]`` are the crossings of `levels[i]`.  
+        len(levels) + 1 values (the layout used by `piecewisefns.ragged`).
+        
+    Examples
+    --------
+    >>> xc, offsets = all_crossings([0, 1, 2, 2, 3], [0, 2, 0, 3, 3], [1, 3])
+    >>> xc
+    array([0.5, 1.5, 2. , 2. ])
+    >>> offsets
+    array([0, 3, 4])
+    
+    """
+    
+    x, y, dx = _as_non_decreasing(x, y, 'find crossings')
+    dtype = _float_dtype(x, y)
+    levels = np.asarray(levels, dtype=dtype).ravel()
+    order = np.argsort(levels, kind='mergesort')
+    sorted_levels = levels[order]
+    
+    if len(y) == 1:
+        #a single point is a run of its own, as in `first_crossing`
+        start, stop = np.zeros(1, dtype=np.intp), np.ones(1, dtype=np.intp)
+    else:
+        start, stop = non_increasing_and_non_decreasing_runs(y)
+    first = y[start]
+    last = y[stop - 1]
+    sign = np.where(last < first, -1, 1).astype(np.int8)
+    
+    #one (run, level) pair for every level within the y range of each run
+    i0 = np.searchsorted(sorted_levels, np.minimum(first, last), side='left')
+    i1 = np.searchsorted(sorted_levels, np.maximum(first, last), side='right')
+    counts = i1 - i0
+    run = np.repeat(np.arange(len(start)), counts)
+    k = (np.arange(len(run)) - np.repeat(np.cumsum(counts) - counts, counts) + 
+         i0[run])
+    lev = sorted_levels[k]
+    j = _bisect_left(y, start[run], stop[run], lev, sign[run])
+    #reached at the first point of a later run, already found by the 
+    #previous run
+    at_start = j == start[run]
+    keep = ~at_start | (run == 0)
+    j, lev, at_start = j[keep], lev[keep], at_start[keep]
+    found_level = order[k[keep]]
+    found_x = np.empty(len(j), dtype=dtype)
+    found_x[at_start] = x[j[at_start]]
+    found_x[~at_start] = _crossing_x(x, y, j[~at_start], lev[~at_start])
+    
+    #runs are in x order so a stable sort on level keeps x ordered
+    by_level = np.argsort(found_level, kind='mergesort')
+    offsets = np.zeros(len(levels) + 1, dtype=np.intp)
+    np.cumsum(np.bincount(found_level, minlength=len(levels)), out=offsets[1:])
+    return found_x[by_level], offsets
+    
+def _sum_dtype(*arrays):
+    """dtype in which to accumulate prefix sums of arrays
+    
+    At least float64 whatever `_float_dtype` gives; a float32 running total 
+    loses the small differences that `integrate` and `average` take.
+    
+    """
+    return np.promote_types(_float_dtype(*arrays), np.float64)
+    
+def _cumulative_integral(x, y, dx):
+    """cumulative trapezoidal integral at each point of x, see `cumulative_integral`
+    
+    Accumulated in `_sum_dtype`, i.e. at least float64.
+    
+    """
+    c = np.empty(len(x), dtype=_sum_dtype(dx, y))
+    if len(x) == 0:
+        return c
+    c[0] = 0
+    #steps have dx==0 so add nothing
+    np.cumsum(0.5 * (y[:-1] + y[1:]) * dx, out=c[1:])
+    return c
+    
+def _antiderivative(x, y, slopes, cumint, t):
+    """integral of non-decreasing x, y data from x[0] to t
+    
+    Outside the range of x the function is taken as constant at its end 
+    values (as in `evaluate`) so t<x[0] gives a negative area.  Computed in 
+    the dtype of `cumint`.
+    
+    """
+    
+    dtype = cumint.dtype
+    t = np.asarray(t, dtype=dtype)
+    shape = t.shape
+    t = t.ravel()
+    n = len(x)
+    if n == 1:
+        return np.multiply(t - x[0], y[0], dtype=dtype).reshape(shape)
+        
+    #x[k] <= t < x[k+1] so segment k has non-zero length
+    k = np.searchsorted(x, t, side='right')
+    k -= 1
+    np.clip(k, 0, n - 2, out=k)
+    
+    d = np.subtract(t, x[k], dtype=dtype)
+    out = slopes[k] * d
+    out *= 0.5
+    out += y[k]
+    out *= d
+    out += cumint[k]
+    
+    before = t < x[0]
+    out[before] = (t[before] - x[0]) * y[0]
+    after = t >= x[-1]
+    out[after] = cumint[-1] + (t[after] - x[-1]) * y[-1]
+    return out.reshape(shape)
+    
+@instrumented
+def cumulative_integral(x, y):
+    """cumulative integral of piecewise linear x, y data at each x value
+    
+    The running total of trapezoid areas of each segment.  Step segments 
+    have zero width and so add nothing.  This is the prefix-sum index used 
+    by `integrate` and `average`.
     
     Parameters
     ----------
@@ -366,19 +1067,1508 @@ def ramps_constants_steps_after(x,y,xi):
         
     Returns
     -------
-    ramps : array_like
-        start indecies of all ramps. e.g. of a ramp is 
-        x=[0,2], y=[10,15]
-    constants : array_like
-        start indecies of all constant sections. e.g. of a constant section is 
-        x=[0,2], y=[15,15]
-    steps : array_like
-        start indecies of all step. e.g. of a step is 
-        x=[1,1], y=[5,15]
+    out : ndarray
+        integral from x[0] to x[i] for each i.  out[0] is zero.
         
     """
-
     
+    x = np.asarray(x)
+    y = np.asarray(y)
+    return _cumulative_integral(x, y, np.diff(x)).astype(_float_dtype(x, y), 
+                                                         copy=False)
+    
+def _integral(x, y, slopes, cumint, a, b):
+    """definite integrals from the integral index; see `integrate`
+    
+    The difference is taken in the dtype of `cumint` and only then cast to 
+    the result dtype.
+    
+    """
+    
+    out = (_antiderivative(x, y, slopes, cumint, b) - 
+           _antiderivative(x, y, slopes, cumint, a))
+    return out.astype(_float_dtype(x, y), copy=False)
+    
+@instrumented
+def integrate(x, y, a, b):
+    """definite integrals of piecewise linear x, y data over many [a, b] windows
+    
+    The cumulative integral at each x value is built once and the 
+    integral up to each limit is then found with a binary search and the 
+    exact (quadratic) area of the partial segment, so each window costs 
+    O(log(len(x))).  Steps are handled exactly.  Outside the range of x 
+    the function is taken as constant at its end values (as in 
+    `evaluate`).
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords.  x must be non-decreasing or non-increasing.
+    a, b : array_like
+        lower and upper limits of integration.  Broadcast together.  If 
+        b<a the integral is negative.
+        
+    Returns
+    -------
+    out : ndarray
+        integral of y from a to b
+        
+    """
+    
+    x, y, dx = _as_non_decreasing(x, y, 'integrate')
+    slopes = _segment_slopes(dx, np.diff(y))
+    return _integral(x, y, slopes, _cumulative_integral(x, y, dx), a, b)
+    
+def _average(x, y, slopes, cumint, a, b):
+    """interval averages from the integral index; see `average`"""
+    
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=cumint.dtype), 
+                               np.asarray(b, dtype=cumint.dtype))
+    area = (_antiderivative(x, y, slopes, cumint, b) - 
+            _antiderivative(x, y, slopes, cumint, a))
+    width = b - a
+    zero = width == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.asarray(area / width)
+    if np.any(zero):
+        out[zero] = _evaluate(x, y, slopes, a[zero], 'right')
+    return out.astype(_float_dtype(x, y), copy=False)
+    
+@instrumented
+def average(x, y, a, b):
+    """average value of piecewise linear x, y data over many [a, b] windows
+    
+    The integral from `integrate` divided by (b - a).  Where a==b the 
+    value at a (limit from the right at a step) is returned.
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords.  x must be non-decreasing or non-increasing.
+    a, b : array_like
+        ends of the windows.  Broadcast together.
+        
+    Returns
+    -------
+    out : ndarray
+        average of y between a and b
+        
+    """
+    
+    x, y, dx = _as_non_decreasing(x, y, 'average')
+    slopes = _segment_slopes(dx, np.diff(y))
+    return _average(x, y, slopes, _cumulative_integral(x, y, dx), a, b)
+    
+    
+def _remove_collinear(x, y):
+    """remove interior points lying on the line through their neighbours
+    
+    Corners of steps and plateaus are kept.  A small relative tolerance 
+    allows for the rounding in values computed by linear interpolation.  
+    Repeated points are removed first as they would otherwise hide the 
+    corners either side of them.
+    
+    """
+    
+    if len(x) > 1:
+        keep = np.ones(len(x), dtype=bool)
+        keep[1:] = (x[1:] != x[:-1]) | (y[1:] != y[:-1])
+        x = x[keep]
+        y = y[keep]
+    n = len(x)
+    if n < 3:
+        return x, y
+    dx = np.diff(x)
+    dy = np.diff(y)
+    a = dy[:-1] * dx[1:]
+    b = dy[1:] * dx[:-1]
+    tol = 8 * np.finfo(np.result_type(a, b, 1.0)).eps
+    keep = np.ones(n, dtype=bool)
+    keep[1:-1] = np.abs(a - b) > tol * (np.abs(a) + np.abs(b))
+    return x[keep], y[keep]
+    
+def _merge(x1, y1, x2, y2, op, crossings=False):
+    """combine two piecewise linear functions on their merged breakpoints
+    
+    `op` is applied to the left and right limits of each function at every 
+    breakpoint of either function, so steps in either are kept exactly.  
+    If `crossings` is True the points where the two functions cross 
+    between breakpoints are added (needed for min and max).
+    
+    """
+    
+    x1, y1, dx1 = _as_non_decreasing(x1, y1, 'combine')
+    x2, y2, dx2 = _as_non_decreasing(x2, y2, 'combine')
+    s1 = _segment_slopes(dx1, np.diff(y1))
+    s2 = _segment_slopes(dx2, np.diff(y2))
+    
+    #merge the two sorted breakpoint sets; a stable sort of two sorted 
+    #runs is a linear time merge
+    u = np.sort(np.concatenate((x1, x2)), kind='mergesort')
+    u = u[np.concatenate(([True], u[1:] != u[:-1]))]
+    
+    l1 = _evaluate(x1, y1, s1, u, 'left')
+    r1 = _evaluate(x1, y1, s1, u, 'right')
+    l2 = _evaluate(x2, y2, s2, u, 'left')
+    r2 = _evaluate(x2, y2, s2, u, 'right')
+    left = op(l1, l2)
+    right = op(r1, r2)
+    
+    #points ordered by breakpoint, then left limit, right limit and any 
+    #crossing before the next breakpoint
+    m = len(u)
+    is_step = right != left
+    xs = [u, u[is_step]]
+    ys = [left, right[is_step]]
+    keys = [3 * np.arange(m), 3 * np.flatnonzero(is_step) + 1]
+    
+    if crossings and m > 1:
+        #both are linear between breakpoints, so their difference can only 
+        #change sign once in each interval 
+        d0 = (r1 - r2)[:-1]
+        d1 = (l1 - l2)[1:]
+        k = np.flatnonzero(((d0 < 0) & (d1 > 0)) | ((d0 > 0) & (d1 < 0)))
+        t = d0[k] / (d0[k] - d1[k])
+        xs.append(u[k] + t * (u[k + 1] - u[k]))
+        ys.append(r1[k] + t * (l1[k + 1] - r1[k]))
+        keys.append(3 * k + 2)
+        
+    order = np.argsort(np.concatenate(keys), kind='mergesort')
+    return _remove_collinear(np.concatenate(xs)[order], 
+                             np.concatenate(ys)[order])
+    
+@instrumented
+def add(x1, y1, x2, y2):
+    """sum of two piecewise linear functions
+    
+    The sorted breakpoints of the two functions are merged in one pass 
+    and the left and right limits of each function are added at every 
+    breakpoint, so steps in either function are kept exactly.  Redundant 
+    collinear points are removed from the result.  Outside its range of x 
+    each function is taken as constant at its end values (as in 
+    `evaluate`).
+    
+    Parameters
+    ----------
+    x1, y1 : array_like
+        x and y coords of the first function.  x must be non-decreasing 
+        or non-increasing.
+    x2, y2 : array_like
+        x and y coords of the second function
+        
+    Returns
+    -------
+    x, y : ndarray
+        x and y coords of the sum.  x is non-decreasing.
+        
+    See also
+    --------
+    subtract, scale, minimum, maximum
+    
+    """
+    return _merge(x1, y1, x2, y2, np.add)
+    
+@instrumented
+def subtract(x1, y1, x2, y2):
+    """difference of two piecewise linear functions, x1, y1 minus x2, y2
+    
+    See `add` for details.
+    
+    Returns
+    -------
+    x, y : ndarray
+        x and y coords of the difference.  x is non-decreasing.
+        
+    """
+    return _merge(x1, y1, x2, y2, np.subtract)
+    
+@instrumented
+def scale(x, y, factor):
+    """multiply a piecewise linear function by a constant
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords
+    factor : float
+        multiplier for y
+        
+    Returns
+    -------
+    x, y : ndarray
+        x and y coords of the scaled function with redundant collinear 
+        points (e.g. all interior points if factor==0) removed.
+        
+    """
+    return _remove_collinear(np.asarray(x), np.asarray(y) * factor)
+    
+@instrumented
+def minimum(x1, y1, x2, y2):
+    """pointwise minimum of two piecewise linear functions
+    
+    As for `add`, but the points where the two functions cross between 
+    breakpoints are added exactly.
+    
+    Returns
+    -------
+    x, y : ndarray
+        x and y coords of the minimum.  x is non-decreasing.
+        
+    """
+    return _merge(x1, y1, x2, y2, np.minimum, crossings=True)
+    
+@instrumented
+def maximum(x1, y1, x2, y2):
+    """pointwise maximum of two piecewise linear functions
+    
+    As for `add`, but the points where the two functions cross between 
+    breakpoints are added exactly.
+    
+    Returns
+    -------
+    x, y : ndarray
+        x and y coords of the maximum.  x is non-decreasing.
+        
+    """
+    return _merge(x1, y1, x2, y2, np.maximum, crossings=True)
+    
+    
+def _envelope(xs, ys, combine):
+    """reduce many functions with a pairwise `combine` as a balanced tree
+    
+    Each level of the tree handles every breakpoint (and crossing) once, 
+    so k functions with N breakpoints in total cost about 
+    O(N log N log k) rather than the O(N k) of combining them one by one.
+    
+    """
+    
+    funcs = [(np.asarray(x), np.asarray(y)) for x, y in zip(xs, ys)]
+    if not funcs:
+        raise ValueError("need at least one function")
+    if len(funcs) == 1:
+        x, y, dx = _as_non_decreasing(funcs[0][0], funcs[0][1], 'find envelope')
+        return _remove_collinear(x, y)
+    while len(funcs) > 1:
+        paired = [combine(x1, y1, x2, y2) 
+                  for (x1, y1), (x2, y2) in zip(funcs[::2], funcs[1::2])]
+        if len(funcs) % 2:
+            paired.append(funcs[-1])
+        funcs = paired
+    return funcs[0]
+    
+@instrumented
+def upper_envelope(xs, ys):
+    """pointwise maximum of many piecewise linear functions
+    
+    The functions are combined with `maximum` in a balanced tree, so 
+    crossings are added exactly, steps in any function are kept exactly 
+    and redundant collinear points are removed.  Outside its range of x 
+    each function is taken as constant at its end values (as in 
+    `evaluate`).
+    
+    Parameters
+    ----------
+    xs, ys : sequence of 1d array_like
+        x and y coords of each function.  Each x must be non-decreasing or 
+        non-increasing and have at least one value.
+        
+    Returns
+    -------
+    x, y : ndarray
+        x and y coords of the envelope.  x is non-decreasing.
+        
+    Examples
+    --------
+    >>> upper_envelope([[0, 2], [0, 1, 1, 2], [0, 2]], [[0, 2], [1, 1, 0, 0], [0.5, 0.5]])
+    (array([0., 1., 2.]), array([1., 1., 2.]))
+    
+    See also
+    --------
+    lower_envelope, maximum
+    
+    """
+    return _envelope(xs, ys, maximum)
+    
+@instrumented
+def lower_envelope(xs, ys):
+    """pointwise minimum of many piecewise linear functions
+    
+    See `upper_envelope`.
+    
+    Returns
+    -------
+    x, y : ndarray
+        x and y coords of the envelope.  x is non-decreasing.
+        
+    """
+    return _envelope(xs, ys, minimum)
+    
+    
+@instrumented
+def compose(xf, yf, xg, yg):
+    """composition f(g(x)) of two piecewise linear functions
+    
+    The breakpoints of f(g(x)) are the breakpoints of g plus the x values 
+    at which g passes through a breakpoint of f.  The latter are found 
+    with `all_crossings`, i.e. a binary search for f's breakpoints in each 
+    monotone run of g, so the result has only the breakpoints it needs 
+    and no dense sampling is done.  Steps in f and g are kept exactly: the 
+    left and right limits at each breakpoint are found from the direction 
+    in which g approaches it.
+    
+    Parameters
+    ----------
+    xf, yf : array_like
+        x and y coords of the outer function f.  x must be non-decreasing 
+        or non-increasing.
+    xg, yg : array_like
+        x and y coords of the inner function g, e.g. a time shift or time 
+        scaling.  x must be non-decreasing or non-increasing; y may be 
+        anything.
+        
+    Returns
+    -------
+    x, y : ndarray
+        x and y coords of f(g(x)) with redundant collinear points removed. 
+        x is non-decreasing.  Outside the range of xg (and of xf) the 
+        functions are taken as constant at their end values (as in 
+        `evaluate`).
+        
+    Examples
+    --------
+    Delay a load history by 2 and slow it down by a factor of 2:
+    
+    >>> compose([0, 1, 1, 3], [0, 1, 2, 2], [0, 2, 10], [0, 0, 4])
+    (array([ 0.,  2.,  4.,  4., 10.]), array([0., 0., 1., 2., 2.]))
+    
+    """
+    
+    xf, yf, dxf = _as_non_decreasing(xf, yf, 'compose')
+    xg, yg, dxg = _as_non_decreasing(xg, yg, 'compose')
+    sf = _segment_slopes(dxf, np.diff(yf))
+    if len(xg) < 2:
+        return xg, _evaluate(xf, yf, sf, yg, 'right')
+    sg = _segment_slopes(dxg, np.diff(yg))
+    
+    levels = np.unique(xf)
+    xc, offsets = all_crossings(xg, yg, levels)
+    level = np.repeat(levels, np.diff(offsets))
+    order = np.argsort(xc, kind='mergesort')
+    xc = xc[order]
+    level = level[order]
+    
+    t = np.unique(np.concatenate((xg, xc)))
+    gl = _evaluate(xg, yg, sg, t, 'left')
+    gr = _evaluate(xg, yg, sg, t, 'right')
+    #away from g's breakpoints use the exact level rather than the 
+    #interpolated g so the correct side of a step in f is taken
+    n = len(xg)
+    crossing = xg[np.minimum(np.searchsorted(xg, t), n - 1)] != t
+    i = np.searchsorted(xc, t[crossing])
+    gl[crossing] = level[i]
+    gr[crossing] = level[i]
+    
+    #direction g moves in just before and just after each t
+    k = np.clip(np.searchsorted(xg, t, side='left') - 1, 0, n - 2)
+    before = np.sign(sg[k])
+    before[t <= xg[0]] = 0
+    k = np.clip(np.searchsorted(xg, t, side='right') - 1, 0, n - 2)
+    after = np.sign(sg[k])
+    after[t >= xg[-1]] = 0
+    
+    #g approaching from below sees f's left limit, from above its right
+    left = np.where(before > 0, _evaluate(xf, yf, sf, gl, 'left'), 
+                    _evaluate(xf, yf, sf, gl, 'right'))
+    right = np.where(after < 0, _evaluate(xf, yf, sf, gr, 'left'), 
+                     _evaluate(xf, yf, sf, gr, 'right'))
+                     
+    is_step = right != left
+    m = len(t)
+    keys = np.concatenate((2 * np.arange(m), 2 * np.flatnonzero(is_step) + 1))
+    order = np.argsort(keys, kind='mergesort')
+    return _remove_collinear(np.concatenate((t, t[is_step]))[order], 
+                             np.concatenate((left, right[is_step]))[order])
+                             
+                             
+def _unit_responses(response, tau):
+    """response(tau) where tau>=0, zero before the load is applied"""
+    applied = tau >= 0
+    out = np.asarray(response(np.where(applied, tau, 0)))
+    return np.where(applied, out, 0)
+    
+@instrumented
+def superpose(x, y, t, step_response, ramp_response=None, chunksize=None):
+    """superpose unit responses to the ramps and steps of a load history
+    
+    The load history x, y is split into ramps, constants and steps (as in 
+    `ramps_constants_steps`) and the response at times `t` is found by 
+    superposition (Duhamel's integral for piecewise linear loading):
+    
+    .. math:: R(t) = \\sum_{steps} \\Delta y_k U(t - x_k) + 
+              \\sum_{ramps} s_k [V(t - x_k) - V(t - x_{k+1})]
+    
+    where U is the response to a unit step applied at time zero, V is the 
+    response to a ramp of unit slope starting at time zero, and s_k is 
+    the slope of a ramp.  Constant segments contribute nothing.  A non-zero 
+    y[0] is treated as a step from zero at x[0].  The kernels are 
+    evaluated once for all segments and times as 2d (segments by times) 
+    arrays and summed with a matrix product, with no Python loop over 
+    segments.
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords of the load history.  x must be non-decreasing or 
+        non-increasing.
+    t : array_like
+        times at which to find the response.  Any shape.
+    step_response : callable
+        vectorised unit step response U(tau).  Called with a 2d array of 
+        non-negative elapsed times.
+    ramp_response : callable, optional
+        vectorised unit ramp response V(tau), usually the integral of 
+        `step_response` from 0 to tau.  Called with a 2d array of 
+        non-negative elapsed times.  Only needed if the load history has 
+        ramps.
+    chunksize : int, optional
+        if given, `t` is processed in blocks of this many values to limit 
+        the size of the temporary (segments by times) arrays
+        
+    Returns
+    -------
+    out : ndarray
+        response at each `t`
+        
+    Notes
+    -----
+    Loads are applied at the start of the elapsed time, i.e. a step at x 
+    contributes U(0) at t=x.  The responses are zero for tau<0 whatever 
+    the kernels return there.
+    
+    Examples
+    --------
+    With U=1 and V=tau the load history itself is recovered
+    
+    >>> superpose([0, 1, 1, 2], [0, 0, 5, 10], [0.5, 1.5, 3], 
+    ...           lambda tau: np.ones_like(tau), lambda tau: tau)
+    array([ 0. ,  7.5, 10. ])
+    
+    """
+    
+    x, y, dx = _as_non_decreasing(x, y, 'superpose')
+    dy = np.diff(y)
+    steps = np.flatnonzero((dx == 0) & (dy != 0))
+    ramps = np.flatnonzero((dx != 0) & (dy != 0))
+    if len(ramps) and ramp_response is None:
+        raise ValueError("ramp_response is needed for load histories with ramps")
+        
+    step_x = x[steps]
+    step_dy = dy[steps]
+    if len(y) and y[0] != 0:
+        step_x = np.concatenate((x[:1], step_x))
+        step_dy = np.concatenate((y[:1], step_dy))
+    #each ramp is the difference of two unit ramps, from its start and end
+    ramp_x = np.concatenate((x[ramps], x[ramps + 1]))
+    ramp_slope = dy[ramps] / dx[ramps]
+    ramp_slope = np.concatenate((ramp_slope, -ramp_slope))
+    
+    t = np.asarray(t)
+    shape = t.shape
+    t = t.ravel()
+    out = np.zeros(len(t), dtype=np.result_type(y, t, ramp_slope, 1.0))
+    if chunksize is None:
+        chunksize = max(len(t), 1)
+    for i in range(0, len(t), chunksize):
+        ti = t[i:i + chunksize]
+        if len(step_x):
+            tau = ti[np.newaxis, :] - step_x[:, np.newaxis]
+            out[i:i + chunksize] += np.dot(step_dy, _unit_responses(step_response, tau))
+        if len(ramp_x):
+            tau = ti[np.newaxis, :] - ramp_x[:, np.newaxis]
+            out[i:i + chunksize] += np.dot(ramp_slope, _unit_responses(ramp_response, tau))
+    return out.reshape(shape)
+    
+    
+@instrumented
+def simplify(x, y, atol=0, rtol=0):
+    """remove collinear and near collinear points from piecewise linear data
+    
+    Points are removed only where the simplified function stays within 
+    ``atol + rtol * abs(y[i])`` of every original point (x[i], y[i]).  As 
+    both functions are linear between the original x values, this bounds 
+    the error everywhere.  The ends of steps and of constant plateaus are 
+    always kept, so steps and plateaus are reproduced exactly.  Ramp 
+    sections between them are simplified with a greedy one pass "cone" 
+    (feasible slope interval) method that is O(len(x)).  Points that are 
+    exactly collinear are first removed in a vectorised pass.
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords.  x must be non-decreasing or non-increasing.
+    atol : float, optional
+        absolute tolerance in y (default = 0)
+    rtol : float, optional
+        tolerance in y relative to the magnitude of each original y value 
+        (default = 0)
+        
+    Returns
+    -------
+    x, y : ndarray
+        x and y coords of the simplified data, a subset of the original 
+        points.  x is non-decreasing.
+        
+    """
+    
+    x, y, dx = _as_non_decreasing(x, y, 'simplify')
+    
+    if rtol == 0:
+        #removing exactly collinear points changes nothing, and with a 
+        #constant tolerance the error at them is bounded by the error at 
+        #the points either side
+        x, y = _remove_collinear(x, y)
+        if atol == 0:
+            return x, y
+        dx = np.diff(x)
+    elif len(x) > 1:
+        #remove repeated points
+        keep = np.ones(len(x), dtype=bool)
+        keep[1:] = (dx != 0) | (np.diff(y) != 0)
+        x = x[keep]
+        y = y[keep]
+        dx = np.diff(x)
+        
+    n = len(x)
+    if n < 3:
+        return x, y
+        
+    dy = np.diff(y)
+    step = dx == 0
+    constant = (dy == 0) & ~step
+    #points at the ends of steps, the ends of constant runs and the data
+    anchor = np.zeros(n, dtype=bool)
+    anchor[[0, -1]] = True
+    anchor[:-1] |= step
+    anchor[1:] |= step
+    anchor[1:-1] |= constant[:-1] != constant[1:]
+    
+    tol = atol + rtol * np.abs(y)
+    xl = x.tolist()
+    yl = y.tolist()
+    tl = tol.tolist()
+    keep = anchor.copy()
+    anchors = np.flatnonzero(anchor).tolist()
+    for a, b in zip(anchors[:-1], anchors[1:]):
+        i = a
+        while b - i > 1:
+            #extend the segment from i while each new end point lies within 
+            #the slopes that pass within tolerance of all points before it
+            xi, yi = xl[i], yl[i]
+            j = i + 1
+            w = xl[j] - xi
+            lo = (yl[j] - tl[j] - yi) / w
+            hi = (yl[j] + tl[j] - yi) / w
+            j += 1
+            while j <= b:
+                w = xl[j] - xi
+                s = (yl[j] - yi) / w
+                if s < lo or s > hi:
+                    break
+                lo = max(lo, (yl[j] - tl[j] - yi) / w)
+                hi = min(hi, (yl[j] + tl[j] - yi) / w)
+                j += 1
+            i = j - 1
+            keep[i] = True
+            
+    return x[keep], y[keep]
+    
+    
+#segment kind codes used by `SegmentTable`
+RAMP = 0
+CONSTANT = 1
+STEP = 2
+
+
+class SegmentTable(object):
+    """slope and intercept of every segment of piecewise linear data
+    
+    Made by `segment_coefficients`.  On segment k, between x_start[k] and 
+    x_end[k], the function is ``slope[k] * x + intercept[k]``.  All arrays 
+    are contiguous and read-only.
+    
+    Attributes
+    ----------
+    x_start, x_end : ndarray
+        x at the start and end of each segment; x_start <= x_end
+    slope, intercept : ndarray
+        coefficients of each segment.  Steps (x_start==x_end) have zero 
+        slope and the value at their start as intercept.
+    kind : ndarray of int8
+        `RAMP`, `CONSTANT` or `STEP` for each segment, as in 
+        `ramps_constants_steps` (zero length segments count as steps)
+        
+    Notes
+    -----
+    The intercept form loses precision when |x| is much larger than the 
+    width of the segments; `evaluate` clamps x to the segment so the 
+    error is bounded by the rounding of the intercept.
+    
+    """
+    
+    __slots__ = ('x_start', 'x_end', 'slope', 'intercept', 'kind', 
+                 '_starts', '_ends', '_index', '_y_ends')
+                 
+    def __init__(self, x_start, x_end, slope, intercept, kind, y_ends):
+        self.x_start = x_start
+        self.x_end = x_end
+        self.slope = slope
+        self.intercept = intercept
+        self.kind = kind
+        #first and last y; steps at the ends hide them from the coefficients
+        self._y_ends = y_ends
+        #lookups only land on segments of non-zero length
+        self._index = np.flatnonzero(x_end != x_start)
+        self._starts = x_start[self._index]
+        self._ends = x_end[self._index]
+        for a in (x_start, x_end, slope, intercept, kind, self._index, 
+                  self._starts, self._ends):
+            a.flags.writeable = False
+            
+    def __len__(self):
+        return len(self.kind)
+        
+    def lookup(self, xi, side='right'):
+        """index of the segment to use for each xi
+        
+        Parameters
+        ----------
+        xi : array_like
+            x values.  Any shape.
+        side : ['right', 'left'], optional
+            at a breakpoint or step use the segment to the right (default) 
+            or to the left of it
+            
+        Returns
+        -------
+        k : ndarray of int
+            segment index for each xi, always a segment of non-zero 
+            length.  Values beyond the ends give the first or last such 
+            segment.
+            
+        """
+        
+        if side not in ('left', 'right'):
+            raise ValueError("side must be 'left' or 'right', not %r" % (side,))
+        if len(self._index) == 0:
+            raise ValueError("no segments of non-zero length to look up")
+        if side == 'right':
+            j = np.searchsorted(self._starts, xi, side='right') - 1
+        else:
+            j = np.searchsorted(self._ends, xi, side='left')
+        return self._index[np.clip(j, 0, len(self._index) - 1)]
+        
+    def evaluate(self, xi, at_step='right'):
+        """evaluate the function from the coefficients
+        
+        Parameters
+        ----------
+        xi : array_like
+            x values.  Any shape.
+        at_step : ['right', 'left', 'mean'], optional
+            value at steps (default='right'), see the module level 
+            `evaluate`.  Beyond the ends the first and last y values are 
+            returned.
+            
+        Returns
+        -------
+        yi : ndarray
+            values at xi
+            
+        """
+        
+        if at_step == 'mean':
+            return 0.5 * (self.evaluate(xi, 'left') + self.evaluate(xi, 'right'))
+        xi = np.asarray(xi, dtype=self.slope.dtype)
+        k = self.lookup(xi, at_step)
+        out = self.slope[k] * np.clip(xi, self.x_start[k], self.x_end[k])
+        out += self.intercept[k]
+        if at_step == 'right':
+            before = xi < self.x_start[0]
+            after = xi >= self.x_end[-1]
+        else:
+            before = xi <= self.x_start[0]
+            after = xi > self.x_end[-1]
+        out = np.where(before, self._y_ends[0], out)
+        return np.where(after, self._y_ends[1], out)
+                
+                
+@instrumented
+def segment_coefficients(x, y):
+    """slope, intercept and kind of every segment, as a `SegmentTable`
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coords.  x must be non-decreasing or non-increasing 
+        (non-increasing data gives the table of the reversed data).
+        
+    Returns
+    -------
+    table : SegmentTable
+        one row per segment
+        
+    Examples
+    --------
+    >>> t = segment_coefficients([0, 1, 1, 3], [0, 2, 5, 5])
+    >>> t.slope, t.intercept, t.kind
+    (array([2., 0., 0.]), array([0., 2., 5.]), array([0, 2, 1], dtype=int8))
+    >>> t.evaluate([0.5, 1, 4])
+    array([1., 5., 5.])
+    
+    """
+    
+    x, y, dx = _as_non_decreasing(x, y, 'make segment table')
+    dy = np.diff(y)
+    slope = _segment_slopes(dx, dy)
+    intercept = y[:-1] - slope * x[:-1]
+    kind = np.full(len(dx), RAMP, dtype=np.int8)
+    kind[dy == 0] = CONSTANT
+    kind[dx == 0] = STEP
+    return SegmentTable(np.ascontiguousarray(x[:-1]), 
+                        np.ascontiguousarray(x[1:]), 
+                        slope, np.ascontiguousarray(intercept), kind, 
+                        (y[0], y[-1]))
+                        
+                        
+class PiecewiseLinear1D(object):
+    """piecewise linear x, y data with cached segment classification
+    
+    The `segment_profile`, slopes and ramp/constant/step masks of the 
+    segments are computed once, when the object is created, so that the 
+    classification queries below are simple lookups rather than repeated 
+    passes of `np.asarray` and `np.diff` over the data.
+    
+    Parameters
+    ----------
+    x, y : array_like
+        x and y coordinates.  Stored as contiguous arrays (no copy is made 
+        if they already are contiguous ndarrays).
+        
+    Attributes
+    ----------
+    x, y : ndarray
+        x and y coordinates
+    profile : SegmentProfile
+        monotonicity and segment classification of the data
+    dx, dy : ndarray
+        difference between consecutive x and y values; one per segment
+    slopes : ndarray
+        dy/dx for each segment.  Step segments (dx==0) are given a slope 
+        of zero.
+    is_ramp, is_constant, is_step : ndarray of bool
+        segment masks.  A ramp has dx!=0 and dy!=0, a constant has dx!=0 
+        and dy==0, a step has dx==0 and dy!=0.  Zero length segments such 
+        as x=[1,1], y=[2,2] are none of these.
+        
+    Notes
+    -----
+    The cached arrays are read-only.  `x` and `y` may be views of the 
+    arrays passed in, so those should not be modified after creating the 
+    object.
+    
+    """
+    
+    __slots__ = ('x', 'y', 'slopes', 'profile',
+                 'is_ramp', 'is_constant', 'is_step', '_cumint')
+    
+    def __init__(self, x, y):
+        #read-only views so the caller's arrays are left writeable
+        x = np.ascontiguousarray(x).view()
+        y = np.ascontiguousarray(y).view()
+        if x.ndim != 1 or x.shape != y.shape:
+            raise ValueError("x and y must be 1d and of the same length")
+            
+        profile = segment_profile(x, y)
+        
+        self.x = x
+        self.y = y
+        self.profile = profile
+        self.slopes = _segment_slopes(profile.dx, profile.dy)
+        
+        n = len(profile.dx)
+        self.is_ramp = np.zeros(n, dtype=bool)
+        self.is_ramp[profile.ramps] = True
+        self.is_constant = np.zeros(n, dtype=bool)
+        self.is_constant[profile.constants] = True
+        self.is_step = np.zeros(n, dtype=bool)
+        self.is_step[profile.steps] = True
+        
+        self._cumint = None
+        
+        for a in (x, y, self.slopes, self.is_ramp, self.is_constant, 
+                  self.is_step, profile.dx, profile.dy, profile.repeats, 
+                  profile.ramps, profile.constants, profile.steps, 
+                  profile.degenerate):
+            a.flags.writeable = False
+            
+    @property
+    def dx(self):
+        """difference between consecutive x values"""
+        return self.profile.dx
+        
+    @property
+    def dy(self):
+        """difference between consecutive y values"""
+        return self.profile.dy
+            
+    def __len__(self):
+        return len(self.x)
+        
+    def has_steps(self):
+        """True if any two consecutive x values are equal"""
+        return self.profile.n_steps > 0
+        
+    def strictly_increasing(self):
+        """Checks all x[i+1] > x[i]"""
+        return self.profile.strictly_increasing
+        
+    def strictly_decreasing(self):
+        """Checks all x[i+1] < x[i]"""
+        return self.profile.strictly_decreasing
+        
+    def non_increasing(self):
+        """Checks all x[i+1] <= x[i]"""
+        return self.profile.non_increasing
+        
+    def non_decreasing(self):
+        """Checks all x[i+1] >= x[i]"""
+        return self.profile.non_decreasing
+        
+    def start_index_of_ramps(self):
+        """start indecies of all ramp segments (read-only)"""
+        return self.profile.ramps
+        
+    def start_index_of_constants(self):
+        """start indecies of all constant segments (read-only)"""
+        return self.profile.constants
+        
+    def start_index_of_steps(self):
+        """start indecies of all step segments (read-only)"""
+        return self.profile.steps
+        
+    def ramps_constants_steps(self):
+        """start indecies of all ramp, constant and step segments
+        
+        Unlike the module level `ramps_constants_steps`, zero length 
+        segments are not reported as both a constant and a step.
+        
+        Returns
+        -------
+        ramps, constants, steps : ndarray
+            read-only start indecies of each type of segment
+            
+        """
+        return self.profile.ramps, self.profile.constants, self.profile.steps
+        
+    def ramps_constants_steps_after(self, xi):
+        """ramp, constant and step segments that start after each xi
+        
+        See the module level `ramps_constants_steps_after` for the layout 
+        of the results.  The cached start indecies are used so, like 
+        `ramps_constants_steps`, zero length segments are not reported.  
+        x must be non-decreasing.
+        
+        Parameters
+        ----------
+        xi : array_like
+            x values of interest
+            
+        Returns
+        -------
+        ramps, constants, steps : tuple of two ndarray
+            ``(start, ptr)`` for each kind of segment
+            
+        """
+        
+        if not self.non_decreasing():
+            raise ValueError("x data is not non-decreasing, therefore cannot find segments after xi")
+        return tuple((start, np.searchsorted(self.x[start], xi, side='right')) 
+                     for start in self.ramps_constants_steps())
+        
+    def evaluate(self, xi, at_step='right'):
+        """evaluate the function at many points, respecting steps
+        
+        Uses the cached slopes; see the module level `evaluate` for 
+        details.
+        
+        Parameters
+        ----------
+        xi : array_like
+            x values at which to evaluate the function
+        at_step : ['right', 'left', 'mean'], optional
+            value to return when xi coincides with a step (default='right')
+            
+        Returns
+        -------
+        yi : ndarray
+            y values at `xi`
+            
+        """
+        
+        x, y, slopes = self._non_decreasing('evaluate')
+        return _evaluate(x, y, slopes, xi, at_step)
+        
+    def first_crossing(self, levels):
+        """first x at which the function reaches each of many y levels
+        
+        See the module level `first_crossing`.
+        
+        Parameters
+        ----------
+        levels : array_like
+            y values to find
+            
+        Returns
+        -------
+        xc : ndarray of float
+            x at which each level is first reached, nan if it never is
+            
+        """
+        return first_crossing(self.x, self.y, levels)
+        
+    def all_crossings(self, levels):
+        """every x at which the function crosses each of many y levels
+        
+        See the module level `all_crossings`.
+        
+        Parameters
+        ----------
+        levels : 1d array_like
+            y values to find
+            
+        Returns
+        -------
+        xc, offsets : 1d ndarray
+            crossings of `levels[i]` are ``xc[offsets[i]:offsets[i+1]]``
+            
+        """
+        return all_crossings(self.x, self.y, levels)
+        
+    def _non_decreasing(self, what):
+        """x, y and slopes as non-decreasing (possibly reversed) views"""
+        if self.non_decreasing():
+            return self.x, self.y, self.slopes
+        if self.non_increasing():
+            return self.x[::-1], self.y[::-1], self.slopes[::-1]
+        raise ValueError("x data is neither non-increasing, nor non-decreasing, therefore cannot %s" % what)
+        
+    def _cumulative_integral(self):
+        """cached integral index, accumulated in at least float64"""
+        if self._cumint is None:
+            x, y, slopes = self._non_decreasing('integrate')
+            self._cumint = _cumulative_integral(x, y, np.diff(x))
+            self._cumint.flags.writeable = False
+        return self._cumint
+        
+    def cumulative_integral(self):
+        """cumulative integral at each x value (read-only)
+        
+        Built on first use and cached.  For non-increasing data the values 
+        are for the reversed, i.e. non-decreasing, data.  See the module 
+        level `cumulative_integral`.
+        
+        """
+        
+        cumint = self._cumulative_integral()
+        dtype = _float_dtype(self.x, self.y)
+        if cumint.dtype == dtype:
+            return cumint
+        out = cumint.astype(dtype)
+        out.flags.writeable = False
+        return out
+        
+    def integrate(self, a, b):
+        """definite integrals over many [a, b] windows
+        
+        Uses the cached `cumulative_integral`; see the module level 
+        `integrate` for details.
+        
+        Parameters
+        ----------
+        a, b : array_like
+            lower and upper limits of integration
+            
+        Returns
+        -------
+        out : ndarray
+            integral of y from a to b
+            
+        """
+        
+        cumint = self._cumulative_integral()
+        x, y, slopes = self._non_decreasing('integrate')
+        return _integral(x, y, slopes, cumint, a, b)
+                
+    def average(self, a, b):
+        """average value over many [a, b] windows
+        
+        Uses the cached `cumulative_integral`; see the module level 
+        `average` for details.
+        
+        Parameters
+        ----------
+        a, b : array_like
+            ends of the windows
+            
+        Returns
+        -------
+        out : ndarray
+            average of y between a and b
+            
+        """
+        
+        cumint = self._cumulative_integral()
+        x, y, slopes = self._non_decreasing('average')
+        return _average(x, y, slopes, cumint, a, b)
+        
+    def superpose(self, t, step_response, ramp_response=None, chunksize=None):
+        """superpose unit responses to the ramps and steps of the function
+        
+        See the module level `superpose` for details.
+        
+        Parameters
+        ----------
+        t : array_like
+            times at which to find the response
+        step_response : callable
+            vectorised unit step response U(tau)
+        ramp_response : callable, optional
+            vectorised unit ramp response V(tau)
+        chunksize : int, optional
+            process `t` in blocks of this many values
+            
+        Returns
+        -------
+        out : ndarray
+            response at each `t`
+            
+        """
+        return superpose(self.x, self.y, t, step_response, ramp_response, 
+                         chunksize)
+        
+    def simplify(self, atol=0, rtol=0):
+        """simplified copy of the function, see module level `simplify`
+        
+        Parameters
+        ----------
+        atol, rtol : float, optional
+            absolute and relative tolerance in y (default = 0)
+            
+        Returns
+        -------
+        out : PiecewiseLinear1D
+            the simplified function
+            
+        """
+        return PiecewiseLinear1D(*simplify(self.x, self.y, atol, rtol))
+        
+    def segment_coefficients(self):
+        """slope, intercept and kind of every segment, see `SegmentTable`"""
+        x, y, slopes = self._non_decreasing('make segment table')
+        return segment_coefficients(x, y)
+        
+    def compose(self, g):
+        """composition self(g(x)), see the module level `compose`
+        
+        Parameters
+        ----------
+        g : PiecewiseLinear1D
+            inner function
+            
+        Returns
+        -------
+        out : PiecewiseLinear1D
+            the composition
+            
+        """
+        return PiecewiseLinear1D(*compose(self.x, self.y, g.x, g.y))
+        
+    def _combine(self, other, f, scalar_op=None):
+        """apply `f` to self and other
+        
+        A number is applied to y with `scalar_op`, which is only valid for 
+        ops that act on each y value alone (add, subtract).  Without 
+        `scalar_op` a number is treated as a constant function over the 
+        range of x, so that `f` adds any crossings (minimum, maximum).
+        
+        """
+        if isinstance(other, PiecewiseLinear1D):
+            return PiecewiseLinear1D(*f(self.x, self.y, other.x, other.y))
+        if np.ndim(other) != 0:
+            return NotImplemented
+        if scalar_op is not None:
+            return PiecewiseLinear1D(self.x, scalar_op(self.y, other))
+        return PiecewiseLinear1D(*f(self.x, self.y, self.x[[0, -1]], 
+                                    np.full(2, other)))
+        
+    def __add__(self, other):
+        return self._combine(other, add, np.add)
+        
+    __radd__ = __add__
+    
+    def __sub__(self, other):
+        return self._combine(other, subtract, np.subtract)
+        
+    def __rsub__(self, other):
+        return -self + other
+        
+    def __mul__(self, factor):
+        if np.ndim(factor) != 0 or isinstance(factor, PiecewiseLinear1D):
+            return NotImplemented
+        return PiecewiseLinear1D(*scale(self.x, self.y, factor))
+        
+    __rmul__ = __mul__
+    
+    def __neg__(self):
+        return PiecewiseLinear1D(self.x, -self.y)
+        
+    def minimum(self, other):
+        """pointwise minimum with another PiecewiseLinear1D or a number, see module level `minimum`"""
+        return self._combine(other, minimum)
+        
+    def maximum(self, other):
+        """pointwise maximum with another PiecewiseLinear1D or a number, see module level `maximum`"""
+        return self._combine(other, maximum)
+        
+    
+class _GrowableArray(object):
+    """1d array with amortised O(1) appends
+    
+    Values are stored in a buffer that doubles in size when full, so 
+    appending n values costs O(n) in total.
+    
+    """
+    
+    __slots__ = ('_data', '_n')
+    
+    def __init__(self, dtype, capacity=16):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._n = 0
+        
+    def __len__(self):
+        return self._n
+        
+    def _reserve(self, n):
+        """make room for n values in total"""
+        if n > len(self._data):
+            data = np.empty(max(n, 2 * len(self._data)), dtype=self._data.dtype)
+            data[:self._n] = self._data[:self._n]
+            self._data = data
+            
+    def append(self, value):
+        self._reserve(self._n + 1)
+        self._data[self._n] = value
+        self._n += 1
+        
+    def extend(self, values):
+        n = self._n + len(values)
+        self._reserve(n)
+        self._data[self._n:n] = values
+        self._n = n
+        
+    def last(self):
+        return self._data[self._n - 1]
+        
+    @property
+    def values(self):
+        """read-only view of the values; invalidated by the next append"""
+        v = self._data[:self._n]
+        v.flags.writeable = False
+        return v
+        
+        
+class AppendablePiecewiseLinear1D(object):
+    """piecewise linear x, y data that grows one point (or block) at a time
+    
+    For data that arrives continuously, e.g. a load history being 
+    recorded.  The monotonicity counts, the start indecies of the ramp, 
+    constant and step segments, the slopes and the cumulative integral are 
+    updated from the new segments only, so `append` is amortised O(1) and 
+    `extend` O(number of new points) rather than a pass over the whole 
+    history.  The data is held in buffers that double in size when full.
+    
+    Parameters
+    ----------
+    x, y : array_like, optional
+        initial x and y coordinates
+    dtype : numpy dtype, optional
+        dtype of the stored x and y values (default=np.float64)
+        
+    Attributes
+    ----------
+    n_increasing, n_decreasing, n_steps : int
+        number of segments with dx>0, dx<0 and dx==0
+        
+    Notes
+    -----
+    The arrays returned by the methods are read-only views of the 
+    buffers, valid until the next `append` or `extend`.  Use `freeze` for 
+    a `PiecewiseLinear1D` copy with the full set of methods.
+    
+    `cumulative_integral` is always in the order the points were added.  
+    Unlike `PiecewiseLinear1D`, which reverses non-increasing data, 
+    `evaluate` and `integrate` need x to be non-decreasing and raise a 
+    ValueError otherwise; `freeze` the data to evaluate or integrate a 
+    non-increasing history.
+    
+    Examples
+    --------
+    >>> f = AppendablePiecewiseLinear1D()
+    >>> f.extend([0, 1, 1], [0, 2, 5])
+    >>> f.append(3, 5)
+    >>> f.start_index_of_steps()
+    array([1])
+    >>> f.cumulative_integral()
+    array([ 0.,  1.,  1., 11.])
+    
+    """
+    
+    __slots__ = ('_x', '_y', '_slopes', '_cumint', 
+                 '_ramps', '_constants', '_steps', 
+                 'n_increasing', 'n_decreasing', 'n_steps')
+                 
+    def __init__(self, x=None, y=None, dtype=np.float64):
+        self._x = _GrowableArray(dtype)
+        self._y = _GrowableArray(dtype)
+        self._slopes = _GrowableArray(dtype)
+        #accumulated in at least float64, see `_sum_dtype`
+        self._cumint = _GrowableArray(np.promote_types(dtype, np.float64))
+        self._ramps = _GrowableArray(np.intp)
+        self._constants = _GrowableArray(np.intp)
+        self._steps = _GrowableArray(np.intp)
+        self.n_increasing = 0
+        self.n_decreasing = 0
+        self.n_steps = 0
+        if x is not None:
+            self.extend(x, y)
+            
+    def __len__(self):
+        return len(self._x)
+        
+    @property
+    def x(self):
+        """x coordinates (read-only view)"""
+        return self._x.values
+        
+    @property
+    def y(self):
+        """y coordinates (read-only view)"""
+        return self._y.values
+        
+    @property
+    def slopes(self):
+        """dy/dx for each segment, zero for steps (read-only view)"""
+        return self._slopes.values
+        
+    def append(self, x, y):
+        """add one point to the end of the data
+        
+        Parameters
+        ----------
+        x, y : float
+            coordinates of the new point
+            
+        """
+        
+        n = len(self._x)
+        if n == 0:
+            self._cumint.append(0)
+        else:
+            x0 = self._x.last()
+            y0 = self._y.last()
+            dx = x - x0
+            dy = y - y0
+            i = n - 1
+            if dx > 0:
+                self.n_increasing += 1
+            elif dx < 0:
+                self.n_decreasing += 1
+            else:
+                self.n_steps += 1
+            if dx == 0:
+                self._slopes.append(0)
+                if dy != 0:
+                    self._steps.append(i)
+            else:
+                self._slopes.append(dy / dx)
+                if dy == 0:
+                    self._constants.append(i)
+                else:
+                    self._ramps.append(i)
+            self._cumint.append(self._cumint.last() + 0.5 * (y0 + y) * dx)
+        self._x.append(x)
+        self._y.append(y)
+        
+    def extend(self, x, y):
+        """add many points to the end of the data
+        
+        Parameters
+        ----------
+        x, y : 1d array_like
+            coordinates of the new points
+            
+        """
+        
+        dtype = self._x.values.dtype
+        x = np.asarray(x, dtype=dtype)
+        y = np.asarray(y, dtype=dtype)
+        if x.ndim != 1 or x.shape != y.shape:
+            raise ValueError("x and y must be 1d and of the same length")
+        if len(x) == 0:
+            return
+            
+        n = len(self._x)
+        if n == 0:
+            xx, yy = x, y
+            cumint0 = 0
+        else:
+            #include the segment joining the old data to the new
+            xx = np.concatenate(([self._x.last()], x))
+            yy = np.concatenate(([self._y.last()], y))
+            cumint0 = self._cumint.last()
+        dx = np.diff(xx)
+        dy = np.diff(yy)
+        self.n_increasing += int(np.count_nonzero(dx > 0))
+        self.n_decreasing += int(np.count_nonzero(dx < 0))
+        self.n_steps += int(np.count_nonzero(dx == 0))
+        
+        start = max(n - 1, 0)
+        zero_dy = dy == 0
+        nonzero_dx = dx != 0
+        self._ramps.extend(np.flatnonzero(nonzero_dx & ~zero_dy) + start)
+        self._constants.extend(np.flatnonzero(nonzero_dx & zero_dy) + start)
+        self._steps.extend(np.flatnonzero(~nonzero_dx & ~zero_dy) + start)
+        self._slopes.extend(_segment_slopes(dx, dy))
+        
+        cumint = _cumulative_integral(xx, yy, dx)
+        cumint += cumint0
+        self._cumint.extend(cumint if n == 0 else cumint[1:])
+        self._x.extend(x)
+        self._y.extend(y)
+        
+    def has_steps(self):
+        """True if any two consecutive x values are equal"""
+        return self.n_steps > 0
+        
+    def strictly_increasing(self):
+        """Checks all x[i+1] > x[i]"""
+        return self.n_increasing == len(self._slopes)
+        
+    def strictly_decreasing(self):
+        """Checks all x[i+1] < x[i]"""
+        return self.n_decreasing == len(self._slopes)
+        
+    def non_increasing(self):
+        """Checks all x[i+1] <= x[i]"""
+        return self.n_increasing == 0
+        
+    def non_decreasing(self):
+        """Checks all x[i+1] >= x[i]"""
+        return self.n_decreasing == 0
+        
+    def start_index_of_ramps(self):
+        """start indecies of all ramp segments (read-only view)"""
+        return self._ramps.values
+        
+    def start_index_of_constants(self):
+        """start indecies of all constant segments (read-only view)"""
+        return self._constants.values
+        
+    def start_index_of_steps(self):
+        """start indecies of all step segments (read-only view)"""
+        return self._steps.values
+        
+    def ramps_constants_steps(self):
+        """start indecies of all ramp, constant and step segments
+        
+        As `PiecewiseLinear1D.ramps_constants_steps`, zero length segments 
+        are not reported.
+        
+        Returns
+        -------
+        ramps, constants, steps : ndarray
+            read-only views of the start indecies of each type of segment
+            
+        """
+        return (self._ramps.values, self._constants.values, 
+                self._steps.values)
+                
+    def cumulative_integral(self):
+        """integral of y from x[0] to each x value (read-only view)
+        
+        Unlike `PiecewiseLinear1D.cumulative_integral` this is always in 
+        the order the points were added, so is negative where x decreases.
+        
+        """
+        cumint = self._cumint.values
+        if cumint.dtype == self.x.dtype:
+            return cumint
+        out = cumint.astype(self.x.dtype)
+        out.flags.writeable = False
+        return out
+        
+    def _checked_non_decreasing(self, what):
+        if not self.non_decreasing():
+            raise ValueError("x data is not non-decreasing, therefore cannot %s" % what)
+            
+    def evaluate(self, xi, at_step='right'):
+        """evaluate the function at many points, respecting steps
+        
+        See the module level `evaluate`.  x must be non-decreasing.
+        
+        Parameters
+        ----------
+        xi : array_like
+            x values at which to evaluate the function
+        at_step : ['right', 'left', 'mean'], optional
+            value to return when xi coincides with a step (default='right')
+            
+        Returns
+        -------
+        yi : ndarray
+            y values at `xi`
+            
+        """
+        
+        self._checked_non_decreasing('evaluate')
+        return _evaluate(self.x, self.y, self.slopes, xi, at_step)
+        
+    def integrate(self, a, b):
+        """definite integrals over many [a, b] windows
+        
+        See the module level `integrate`.  x must be non-decreasing.
+        
+        Parameters
+        ----------
+        a, b : array_like
+            lower and upper limits of integration
+            
+        Returns
+        -------
+        out : ndarray
+            integral of y from a to b
+            
+        """
+        
+        self._checked_non_decreasing('integrate')
+        x, y, slopes, cumint = self.x, self.y, self.slopes, self._cumint.values
+        return _integral(x, y, slopes, cumint, a, b)
+                
+    def freeze(self):
+        """copy of the current data as a `PiecewiseLinear1D`"""
+        return PiecewiseLinear1D(self.x.copy(), self.y.copy())
+        
+        
 if __name__ == '__main__':
     #print(strictly_increasing([0,  0.5,  1,  1.5,  2]))
     #print(non_increasing_and_non_decreasing_parts([0,  0.5,  1,  1.5,  2]))
@@ -0,0 +1,449 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+batch versions of the piecewise_linear_1d functions for many functions at once
+
+Many functions are held in a ragged (CSR-like) layout: the values of all 
+the functions end to end in one 1d array plus an ``offsets`` array of 
+length n + 1 such that function i is ``values[offsets[i]:offsets[i + 1]]``.  
+Every function here handles all the functions in one vectorised pass, with 
+no Python loop over functions, and returns ragged results in the same 
+layout.
+
+"""
+from __future__ import print_function, division
+
+import numpy as np
+
+from piecewisefns.piecewise_linear_1d import _segment_slopes
+from piecewisefns.piecewise_linear_1d import _float_dtype
+
+
+def to_ragged(arrays, dtype=None):
+    """concatenate a sequence of 1d arrays into ragged layout
+    
+    Parameters
+    ----------
+    arrays : sequence of 1d array_like
+        the values of each function
+    dtype : numpy dtype, optional
+        dtype of the values (default is the common type of the arrays)
+        
+    Returns
+    -------
+    values : 1d ndarray
+        all the values end to end
+    offsets : 1d ndarray of int64
+        array i is ``values[offsets[i]:offsets[i + 1]]``
+        
+    """
+    
+    arrays = [np.asarray(a) for a in arrays]
+    for a in arrays:
+        if a.ndim != 1:
+            raise ValueError("arrays must be 1d")
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([len(a) for a in arrays], out=offsets[1:])
+    if dtype is None:
+        #unique dtypes only; result_type takes a limited number of args
+        dtypes = set(a.dtype for a in arrays)
+        dtype = np.result_type(*dtypes) if dtypes else np.float64
+    values = np.empty(offsets[-1], dtype=dtype)
+    for a, i, j in zip(arrays, offsets[:-1], offsets[1:]):
+        values[i:j] = a
+    return values, offsets
+    
+def from_ragged(values, offsets):
+    """split ragged values into a list of views, one per function"""
+    return [values[i:j] for i, j in zip(offsets[:-1], offsets[1:])]
+    
+def _segment_bounds(offsets):
+    """start and end (exclusive) of each function's segments in np.diff of 
+    the ragged values"""
+    #trailing empty functions start at len(values), one past the last segment
+    start = np.minimum(offsets[:-1], max(offsets[-1] - 1, 0))
+    return start, np.maximum(offsets[1:] - 1, start)
+    
+def _within(n_points, offsets):
+    """mask of the segments of np.diff(values) that lie within a function, 
+    i.e. not joining the last point of one function to the next"""
+    within = np.ones(max(n_points - 1, 0), dtype=bool)
+    joins = offsets[1:-1] - 1
+    within[joins[(joins >= 0) & (joins < len(within))]] = False
+    return within
+    
+def _count(mask, offsets):
+    """number of True segments of mask in each function"""
+    cs = np.zeros(len(mask) + 1, dtype=np.int64)
+    np.cumsum(mask, out=cs[1:])
+    start, end = _segment_bounds(offsets)
+    return cs[end] - cs[start]
+    
+def _ragged_index(mask, offsets):
+    """indecies of the True segments of mask, local to each function, and 
+    the offsets of each function's indecies"""
+    index = np.flatnonzero(mask)
+    counts = _count(mask, offsets)
+    index_offsets = np.zeros(len(offsets), dtype=np.int64)
+    np.cumsum(counts, out=index_offsets[1:])
+    index -= np.repeat(offsets[:-1], counts)
+    return index, index_offsets
+    
+def _check(values, offsets):
+    values = np.asarray(values)
+    offsets = np.asarray(offsets)
+    if values.ndim != 1 or offsets.ndim != 1 or len(offsets) < 1 or \
+            offsets[0] != 0 or offsets[-1] != len(values):
+        raise ValueError("offsets must run from 0 to the length of the 1d values")
+    return values, offsets
+    
+def _all_segments(x, offsets, f):
+    """True for each function if f(x[i], x[i+1]) holds for all its segments
+    
+    Consecutive values are compared directly rather than through the sign 
+    of np.diff, which overflows for unsigned integers, to match 
+    `piecewise_linear_1d`.
+    
+    """
+    x, offsets = _check(x, offsets)
+    return _count(~f(x[:-1], x[1:]) & _within(len(x), offsets), offsets) == 0
+    
+def has_steps(x, offsets):
+    """has_steps for every function, as a bool array"""
+    x, offsets = _check(x, offsets)
+    return _count((x[:-1] == x[1:]) & _within(len(x), offsets), offsets) > 0
+    
+def strictly_increasing(x, offsets):
+    """strictly_increasing for every function, as a bool array"""
+    return _all_segments(x, offsets, lambda a, b: b > a)
+    
+def strictly_decreasing(x, offsets):
+    """strictly_decreasing for every function, as a bool array"""
+    return _all_segments(x, offsets, lambda a, b: b < a)
+    
+def non_increasing(x, offsets):
+    """non_increasing for every function, as a bool array"""
+    return _all_segments(x, offsets, lambda a, b: b <= a)
+    
+def non_decreasing(x, offsets):
+    """non_decreasing for every function, as a bool array"""
+    return _all_segments(x, offsets, lambda a, b: b >= a)
+    
+def ramps_constants_steps(x, y, offsets):
+    """start_index_of_ramps, _constants and _steps for every function
+    
+    All three are found from one diff of the ragged x and y values.  Zero 
+    length segments (dx==0, dy==0) are not reported, as in the 
+    `start_index_of_*` functions.
+    
+    Parameters
+    ----------
+    x, y : 1d array_like
+        ragged x and y values
+    offsets : 1d array_like of int
+        function i is ``x[offsets[i]:offsets[i + 1]]``
+        
+    Returns
+    -------
+    ramps, constants, steps : tuple of two ndarray
+        ``(index, index_offsets)`` for each kind of segment where 
+        ``index[index_offsets[i]:index_offsets[i + 1]]`` are the start 
+        indecies (local to the function) of that kind of segment in 
+        function i.
+        
+    """
+    
+    x, offsets = _check(x, offsets)
+    y, offsets = _check(y, offsets)
+    dx = np.diff(x)
+    dy = np.diff(y)
+    within = _within(len(x), offsets)
+    nonzero_dx = (dx != 0) & within
+    zero_dy = dy == 0
+    return (_ragged_index(nonzero_dx & ~zero_dy, offsets), 
+            _ragged_index(nonzero_dx & zero_dy, offsets), 
+            _ragged_index((dx == 0) & ~zero_dy & within, offsets))
+            
+def start_index_of_ramps(x, y, offsets):
+    """start_index_of_ramps for every function, see `ramps_constants_steps`
+    
+    Returns
+    -------
+    index, index_offsets : 1d ndarray of int
+        the ramps of function i are ``index[index_offsets[i]:index_offsets[i + 1]]``
+        
+    """
+    return ramps_constants_steps(x, y, offsets)[0]
+    
+def start_index_of_constants(x, y, offsets):
+    """start_index_of_constants for every function, laid out as for `start_index_of_ramps`"""
+    return ramps_constants_steps(x, y, offsets)[1]
+    
+def start_index_of_steps(x, y, offsets):
+    """start_index_of_steps for every function, laid out as for `start_index_of_ramps`"""
+    return ramps_constants_steps(x, y, offsets)[2]
+    
+def searchsorted(x, offsets, group, q, side='left'):
+    """binary search of each query within its own function
+    
+    A vectorised bisection: every query takes one step per iteration so 
+    there are only about log2(longest function) passes over the queries.
+    
+    Parameters
+    ----------
+    x : 1d array_like
+        ragged values, sorted within each function
+    offsets : 1d array_like of int
+        function i is ``x[offsets[i]:offsets[i + 1]]``
+    group : 1d array_like of int
+        function each query belongs to
+    q : 1d array_like
+        query values
+    side : ['left', 'right'], optional
+        as for `np.searchsorted`
+        
+    Returns
+    -------
+    index : 1d ndarray of int
+        global index into x, between ``offsets[group]`` and 
+        ``offsets[group + 1]``, where each q would be inserted
+        
+    """
+    
+    x = np.asarray(x)
+    q = np.asarray(q)
+    group = np.asarray(group)
+    lo = np.asarray(offsets)[group].astype(np.int64)
+    hi = np.asarray(offsets)[group + 1].astype(np.int64)
+    if len(x) == 0:
+        return lo
+    last = len(x) - 1
+    while True:
+        active = lo < hi
+        if not np.any(active):
+            return lo
+        mid = (lo + hi) // 2
+        v = x[np.minimum(mid, last)]
+        if side == 'left':
+            go_right = v < q
+        else:
+            go_right = v <= q
+        go_right &= active
+        lo = np.where(go_right, mid + 1, lo)
+        hi = np.where(active & ~go_right, mid, hi)
+        
+def evaluate(x, y, offsets, xi, xi_offsets, at_step='right'):
+    """evaluate every function at its own query points, respecting steps
+    
+    The batch version of `piecewise_linear_1d.evaluate`.
+    
+    Parameters
+    ----------
+    x, y : 1d array_like
+        ragged x and y values.  x must be non-decreasing within each 
+        function that has query points.
+    offsets : 1d array_like of int
+        function i is ``x[offsets[i]:offsets[i + 1]]``
+    xi : 1d array_like
+        ragged query points
+    xi_offsets : 1d array_like of int
+        the query points of function i are ``xi[xi_offsets[i]:xi_offsets[i + 1]]``
+    at_step : ['right', 'left', 'mean'], optional
+        value to return when xi coincides with a step (default='right'), 
+        see `piecewise_linear_1d.evaluate`
+        
+    Returns
+    -------
+    yi : 1d ndarray
+        values at xi, in the same ragged layout as xi.  Queries of 
+        functions with no points give nan.
+        
+    """
+    
+    if at_step == 'mean':
+        out = evaluate(x, y, offsets, xi, xi_offsets, 'left')
+        out += evaluate(x, y, offsets, xi, xi_offsets, 'right')
+        out *= 0.5
+        return out
+    if not at_step in ('left', 'right'):
+        raise ValueError("at_step must be 'left', 'right' or 'mean', "
+                         "not %r" % (at_step,))
+                         
+    x, offsets = _check(x, offsets)
+    y, offsets = _check(y, offsets)
+    xi, xi_offsets = _check(xi, xi_offsets)
+    if len(xi_offsets) != len(offsets):
+        raise ValueError("xi_offsets and offsets must have the same length")
+    if not np.all(non_decreasing(x, offsets)[np.diff(xi_offsets) > 0]):
+        raise ValueError("x data of every function with query points must be non-decreasing")
+        
+    slopes = _segment_slopes(np.diff(x), np.diff(y))
+    #queries take the dtype of the functions, so float32 data stays float32
+    dtype = _float_dtype(slopes, y)
+    xi = xi.astype(dtype, copy=False)
+    group = np.repeat(np.arange(len(offsets) - 1), np.diff(xi_offsets))
+    first = offsets[group]
+    last = offsets[group + 1] - 1
+    out = np.empty(len(xi), dtype=dtype)
+    out[last < first] = np.nan
+    
+    #single point functions
+    ok = last == first
+    out[ok] = y[first[ok]]
+    
+    ok = last > first
+    q = xi[ok]
+    first = first[ok]
+    last = last[ok]
+    #as in piecewise_linear_1d._evaluate segment k always has non-zero length
+    k = searchsorted(x, offsets, group[ok], q, side=at_step)
+    k -= 1
+    np.clip(k, first, last - 1, out=k)
+    if at_step == 'right':
+        v = y[k] + slopes[k] * (q - x[k])
+        v[q < x[first]] = y[first[q < x[first]]]
+        v[q >= x[last]] = y[last[q >= x[last]]]
+    else:
+        v = y[k + 1] + slopes[k] * (q - x[k + 1])
+        v[q <= x[first]] = y[first[q <= x[first]]]
+        v[q > x[last]] = y[last[q > x[last]]]
+    out[ok] = v
+    return out
+    
+def union_grid(x, offsets):
+    """sorted union of the x values of all functions, with steps repeated
+    
+    Each distinct x value appears once, or twice if any function has a 
+    step there, so that `resample` can give both the left and right limit.
+    
+    Parameters
+    ----------
+    x : 1d array_like
+        ragged x values, non-decreasing within each function
+    offsets : 1d array_like of int
+        function i is ``x[offsets[i]:offsets[i + 1]]``
+        
+    Returns
+    -------
+    grid : 1d ndarray
+        non-decreasing grid
+        
+    """
+    
+    x, offsets = _check(x, offsets)
+    if not np.all(non_decreasing(x, offsets)):
+        raise ValueError("x data of every function must be non-decreasing")
+    steps = (np.diff(x) == 0) & _within(len(x), offsets)
+    return np.sort(np.concatenate((np.unique(x), np.unique(x[:-1][steps]))))
+    
+def resample(x, y, offsets, grid=None, dtype=np.float64, out=None, 
+             at_step='right', chunksize=2**20):
+    """values of every function on a common grid, as a dense matrix
+    
+    Row i of the result is function i on `grid`.  Where a grid value is 
+    repeated the first column holds the left limit and the others the 
+    right limit, so steps on the grid are reproduced exactly and each row 
+    with `grid` is itself piecewise linear x, y data.  The rows are 
+    filled with `evaluate` in blocks of about `chunksize` values to bound 
+    the temporary memory.
+    
+    Parameters
+    ----------
+    x, y : 1d array_like
+        ragged x and y values.  x must be non-decreasing within each 
+        function.
+    offsets : 1d array_like of int
+        function i is ``x[offsets[i]:offsets[i + 1]]``
+    grid : 1d array_like, optional
+        non-decreasing grid to resample onto.  Default is 
+        ``union_grid(x, offsets)``, all the breakpoints of all the 
+        functions, on which resampling is exact.
+    dtype : [np.float64, np.float32], optional
+        dtype of the result if `out` is not given (default=np.float64)
+    out : ndarray, optional
+        preallocated (n_functions, len(grid)) array for the result
+    at_step : ['right', 'left', 'mean'], optional
+        value at grid values that are not repeated but coincide with a 
+        step in a function (default='right'), see `evaluate`
+    chunksize : int, optional
+        approximate number of values evaluated per block (default=2**20)
+        
+    Returns
+    -------
+    grid : 1d ndarray
+        the grid
+    out : 2d ndarray
+        values of each function (rows) at each grid value (columns).  Rows 
+        of functions with no points are nan.
+        
+    Examples
+    --------
+    >>> x, offsets = to_ragged([[0.0, 1, 1, 2], [0.0, 2]])
+    >>> y, offsets = to_ragged([[0.0, 0, 1, 1], [0.0, 2]])
+    >>> grid, out = resample(x, y, offsets)
+    >>> grid
+    array([0., 1., 1., 2.])
+    >>> out
+    array([[0., 0., 1., 1.],
+           [0., 1., 1., 2.]])
+    
+    """
+    
+    x, offsets = _check(x, offsets)
+    y, offsets = _check(y, offsets)
+    if grid is None:
+        grid = union_grid(x, offsets)
+    else:
+        grid = np.asarray(grid)
+        if grid.ndim != 1 or np.any(np.diff(grid) < 0):
+            raise ValueError("grid must be 1d and non-decreasing")
+    n = len(offsets) - 1
+    m = len(grid)
+    if out is None:
+        out = np.empty((n, m), dtype=dtype)
+    elif out.shape != (n, m):
+        raise ValueError("out must have shape %r, not %r" % ((n, m), out.shape))
+    if n == 0 or m == 0:
+        return grid, out
+        
+    #first of each run of repeated grid values takes the left limit, the 
+    #rest the right limit
+    repeated = np.zeros(m, dtype=bool)
+    repeated[1:] = grid[1:] == grid[:-1]
+    first = np.zeros(m, dtype=bool)
+    first[:-1] = repeated[1:]
+    first &= ~repeated
+    left = np.flatnonzero(first)
+    right = np.flatnonzero(repeated)
+    
+    rows = max(chunksize // m, 1)
+    for r0 in range(0, n, rows):
+        r1 = min(r0 + rows, n)
+        nb = r1 - r0
+        a, b = offsets[r0], offsets[r1]
+        xb = x[a:b]
+        yb = y[a:b]
+        ob = offsets[r0:r1 + 1] - a
+        block = out[r0:r1]
+        block[...] = evaluate(xb, yb, ob, np.tile(grid, nb), 
+                              np.arange(nb + 1) * m, at_step).reshape(nb, m)
+        for cols, side in ((left, 'left'), (right, 'right')):
+            if len(cols):
+                block[:, cols] = evaluate(
+                    xb, yb, ob, np.tile(grid[cols], nb), 
+                    np.arange(nb + 1) * len(cols), side).reshape(nb, len(cols))
+    return grid, out
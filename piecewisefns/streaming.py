@@ -0,0 +1,247 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+chunked (out of core) versions of the piecewise_linear_1d analysis functions
+
+Each function takes its data as a `source`: an iterator of 1d chunks, an 
+ndarray (including a memory-mapped one) or the filename of a ``.npy`` 
+file, which is opened with ``mmap_mode='r'``.  Only one chunk (plus the 
+last value of the previous chunk) is in memory at a time and the results 
+are exactly those of the in-memory functions of the same name in 
+`piecewisefns.piecewise_linear_1d`.
+
+"""
+from __future__ import print_function, division
+
+import numpy as np
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+#: default number of values per chunk when slicing arrays and files
+CHUNKSIZE = 2**16
+
+
+def chunks(source, chunksize=CHUNKSIZE):
+    """iterate over a data source in 1d chunks
+    
+    Parameters
+    ----------
+    source : str, ndarray or iterable
+        filename of a ``.npy`` file (opened memory-mapped), a 1d array 
+        (sliced into views) or an iterable of 1d array_like chunks (used 
+        as is; scalars are treated as chunks of length one).
+    chunksize : int, optional
+        number of values per chunk when slicing a file or array
+        
+    Yields
+    ------
+    chunk : 1d ndarray
+        
+    """
+    
+    if isinstance(source, string_types):
+        source = np.load(source, mmap_mode='r')
+    if isinstance(source, np.ndarray):
+        for i in range(0, len(source), chunksize):
+            yield source[i:i + chunksize]
+        return
+    for chunk in source:
+        yield np.atleast_1d(chunk)
+        
+def _diffs(source, chunksize):
+    """iterate over the differences of consecutive values in a source
+    
+    Yields ``(offset, d)`` where ``d[i]`` is the difference for segment 
+    ``offset + i``.  The last value of each chunk is carried over so the 
+    segments that straddle chunks are included.
+    
+    """
+    
+    prev = None
+    offset = 0
+    for chunk in chunks(source, chunksize):
+        if len(chunk) == 0:
+            continue
+        if prev is None:
+            d = np.diff(chunk)
+        else:
+            d = np.empty(len(chunk), dtype=np.result_type(chunk, prev))
+            d[0] = chunk[0] - prev
+            np.subtract(chunk[1:], chunk[:-1], out=d[1:])
+        yield offset, d
+        offset += len(d)
+        prev = chunk[-1]
+        
+def _pairs(source, chunksize):
+    """iterate over consecutive values of a source as ``(a, b)`` arrays
+    
+    ``b[i]`` is the value following ``a[i]``.  As in `_diffs` the last 
+    value of each chunk is carried over.  The predicates compare the pairs 
+    directly, rather than the sign of a difference that could overflow 
+    (e.g. for unsigned integers), to match `piecewise_linear_1d`.
+    
+    """
+    
+    prev = None
+    for chunk in chunks(source, chunksize):
+        if len(chunk) == 0:
+            continue
+        if prev is None:
+            yield chunk[:-1], chunk[1:]
+        else:
+            a = np.empty(len(chunk), dtype=np.result_type(chunk, prev))
+            a[0] = prev
+            a[1:] = chunk[:-1]
+            yield a, chunk
+        prev = chunk[-1]
+        
+def _pair_diffs(x, y, chunksize):
+    """as for `_diffs` but for x and y together, yields (offset, dx, dy)
+    
+    x and y must be chunked the same way.
+    
+    """
+    
+    ys = _diffs(y, chunksize)
+    for offset, dx in _diffs(x, chunksize):
+        try:
+            yoffset, dy = next(ys)
+        except StopIteration:
+            raise ValueError("x and y sources have different lengths")
+        if yoffset != offset or len(dy) != len(dx):
+            raise ValueError("x and y sources must have chunks of the same length")
+        yield offset, dx, dy
+    for _ in ys:
+        raise ValueError("x and y sources have different lengths")
+        
+def has_steps(x, chunksize=CHUNKSIZE):
+    """True if any two consecutive x values are equal; stops at the first"""
+    return any(np.any(a == b) for a, b in _pairs(x, chunksize))
+    
+def strictly_increasing(x, chunksize=CHUNKSIZE):
+    """Checks all x[i+1] > x[i]; stops at the first failure"""
+    return all(np.all(b > a) for a, b in _pairs(x, chunksize))
+    
+def strictly_decreasing(x, chunksize=CHUNKSIZE):
+    """Checks all x[i+1] < x[i]; stops at the first failure"""
+    return all(np.all(b < a) for a, b in _pairs(x, chunksize))
+    
+def non_increasing(x, chunksize=CHUNKSIZE):
+    """Checks all x[i+1] <= x[i]; stops at the first failure"""
+    return all(np.all(b <= a) for a, b in _pairs(x, chunksize))
+    
+def non_decreasing(x, chunksize=CHUNKSIZE):
+    """Checks all x[i+1] >= x[i]; stops at the first failure"""
+    return all(np.all(b >= a) for a, b in _pairs(x, chunksize))
+    
+def non_increasing_and_non_decreasing_runs(x, chunksize=CHUNKSIZE):
+    """chunked version of `piecewise_linear_1d.non_increasing_and_non_decreasing_runs`
+    
+    The sign of the current run is carried between chunks.
+    
+    Parameters
+    ----------
+    x : source
+        see `chunks`
+    chunksize : int, optional
+        number of values per chunk when slicing a file or array
+        
+    Returns
+    -------
+    start, stop : 1d ndarray of int
+        ``x[start[i]:stop[i]]`` is the i-th run including its end point
+        
+    """
+    
+    starts = [np.zeros(1, dtype=np.intp)]
+    sign = 0
+    n = 0
+    for offset, d in _diffs(x, chunksize):
+        n = offset + len(d) + 1
+        nonzero = np.flatnonzero(d)
+        if len(nonzero) == 0:
+            continue
+        signs = np.sign(d[nonzero])
+        previous = np.concatenate(([sign], signs[:-1]))
+        new = (signs != previous) & (previous != 0)
+        starts.append(offset + nonzero[new])
+        sign = signs[-1]
+        
+    if n < 2:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    start = np.concatenate(starts).astype(np.intp)
+    stop = np.empty_like(start)
+    stop[:-1] = start[1:] + 1
+    stop[-1] = n
+    return start, stop
+    
+def non_increasing_and_non_decreasing_parts(x, include_end_point=False, chunksize=CHUNKSIZE):
+    """chunked version of `piecewise_linear_1d.non_increasing_and_non_decreasing_parts`"""
+    
+    start, stop = non_increasing_and_non_decreasing_runs(x, chunksize)
+    if not include_end_point:
+        stop = stop - 1
+    return [list(range(i, j)) for i, j in zip(start.tolist(), stop.tolist())]
+    
+def _segment_indices(x, y, chunksize, *kinds):
+    """start indecies of each kind of segment, gathered chunk by chunk
+    
+    `kinds` are functions of (dx, dy) returning a segment mask.
+    
+    """
+    
+    found = [[np.zeros(0, dtype=np.intp)] for _ in kinds]
+    for offset, dx, dy in _pair_diffs(x, y, chunksize):
+        for f, index in zip(kinds, found):
+            index.append(offset + np.flatnonzero(f(dx, dy)))
+    return tuple(np.concatenate(index) for index in found)
+    
+def _ramps(dx, dy):
+    return (dx != 0) & (dy != 0)
+    
+def _constants(dx, dy):
+    return (dx != 0) & (dy == 0)
+    
+def _steps(dx, dy):
+    return (dx == 0) & (dy != 0)
+    
+def start_index_of_ramps(x, y, chunksize=CHUNKSIZE):
+    """chunked version of `piecewise_linear_1d.start_index_of_ramps`"""
+    return _segment_indices(x, y, chunksize, _ramps)[0]
+    
+def start_index_of_constants(x, y, chunksize=CHUNKSIZE):
+    """chunked version of `piecewise_linear_1d.start_index_of_constants`"""
+    return _segment_indices(x, y, chunksize, _constants)[0]
+    
+def start_index_of_steps(x, y, chunksize=CHUNKSIZE):
+    """chunked version of `piecewise_linear_1d.start_index_of_steps`"""
+    return _segment_indices(x, y, chunksize, _steps)[0]
+    
+def ramps_constants_steps(x, y, chunksize=CHUNKSIZE):
+    """chunked version of `piecewise_linear_1d.ramps_constants_steps`
+    
+    As in the in-memory version, zero length segments (dx==0, dy==0) are 
+    reported as both constants and steps.  All three are found in one 
+    pass over the data.
+    
+    """
+    return _segment_indices(x, y, chunksize, _ramps, 
+                            lambda dx, dy: dy == 0, 
+                            lambda dx, dy: dx == 0)
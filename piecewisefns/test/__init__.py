@@ -18,7 +18,12 @@
 This is the testing sub-package for the `piecewisefns` package.
 
 The sub-package contains the following modules:
-    - don't know yet
-    - don't know yet
+    - test_piecewise_linear_1d
+    - test_streaming
+    - test_packed
+    - test_ragged
+    - test_cache
+    - test_instrument
+    - test_parallel
     
 """
\ No newline at end of file
@@ -0,0 +1,132 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+tests for the content keyed analysis cache
+
+"""
+from __future__ import division, print_function
+
+from nose.tools.trivial import assert_raises
+from nose.tools.trivial import ok_
+from nose.tools.trivial import assert_equal
+from nose.tools.trivial import assert_false
+
+import numpy as np
+
+from piecewisefns import piecewise_linear_1d as pwl
+from piecewisefns.cache import AnalysisCache
+from piecewisefns.cache import array_digest
+
+
+class test_cache(object):
+    """load histories with steps, ramps and constants"""
+    def __init__(self):
+        self.x = np.array([0, 0, 10, 10, 20, 30, 30, 40], dtype=float)
+        self.y = np.array([0, 5, 5, 8, 12, 12, 3, 3], dtype=float)
+        self.x2 = np.array([0, 1, 2, 2, 3], dtype=float)
+        self.y2 = np.array([0, 1, 1, 2, 2], dtype=float)
+        
+    def test_array_digest(self):
+        assert_equal(array_digest(self.x), array_digest(self.x.copy()))
+        assert_equal(array_digest(self.x[::2]), array_digest(self.x[::2].copy()))
+        ok_(array_digest(self.x) != array_digest(self.x.astype(np.float32)))
+        ok_(array_digest(self.x) != array_digest(self.x.reshape(2, 4)))
+        ok_(array_digest(self.x, self.y) != array_digest(self.y, self.x))
+        
+    def test_results(self):
+        cache = AnalysisCache()
+        for name in ['ramps_constants_steps', 'start_index_of_ramps', 
+                     'start_index_of_constants', 'start_index_of_steps']:
+            expected = getattr(pwl, name)(self.x, self.y)
+            for i in range(2):
+                result = getattr(cache, name)(self.x, self.y)
+                ok_(np.all(np.concatenate(result) == np.concatenate(expected))
+                    if isinstance(expected, tuple) else np.all(result == expected))
+        stats = cache.stats()
+        assert_equal(stats['hits'], 4)
+        assert_equal(stats['misses'], 4)
+        assert_equal(stats['size'], 4)
+        ok_(stats['nbytes'] > 0)
+        
+    def test_read_only(self):
+        cache = AnalysisCache()
+        result = cache.start_index_of_steps(self.x, self.y)
+        assert_false(result.flags.writeable)
+        
+    def test_content_key(self):
+        cache = AnalysisCache()
+        cache.start_index_of_steps(self.x, self.y)
+        cache.start_index_of_steps(self.x.copy(), self.y.copy())
+        assert_equal(cache.hits, 1)
+        y = self.y.copy()
+        y[-1] = 4
+        cache.start_index_of_steps(self.x, y)
+        assert_equal(cache.misses, 2)
+        
+    def test_maxsize(self):
+        cache = AnalysisCache(maxsize=2)
+        cache.start_index_of_steps(self.x, self.y)
+        cache.start_index_of_steps(self.x2, self.y2)
+        #touch the first so the second is least recently used
+        cache.start_index_of_steps(self.x, self.y)
+        cache.start_index_of_ramps(self.x, self.y)
+        assert_equal(len(cache), 2)
+        cache.start_index_of_steps(self.x, self.y)
+        assert_equal(cache.hits, 2)
+        cache.start_index_of_steps(self.x2, self.y2)
+        assert_equal(cache.misses, 4)
+        
+    def test_maxbytes(self):
+        cache = AnalysisCache(maxsize=None, maxbytes=0)
+        cache.start_index_of_steps(self.x, self.y)
+        assert_equal(len(cache), 0)
+        nbytes = cache.start_index_of_steps(self.x, self.y).nbytes
+        cache = AnalysisCache(maxsize=None, maxbytes=nbytes)
+        cache.start_index_of_steps(self.x, self.y)
+        cache.start_index_of_steps(self.x2, self.y2)
+        assert_equal(len(cache), 1)
+        ok_(cache.stats()['nbytes'] <= nbytes)
+        
+    def test_memoize(self):
+        cache = AnalysisCache()
+        calls = []
+        def f(x, scale=1):
+            calls.append(1)
+            return x * scale
+        g = cache.memoize(f)
+        ok_(np.all(g(self.x, scale=2) == self.x * 2))
+        ok_(np.all(g(self.x, scale=2) == self.x * 2))
+        ok_(np.all(g(self.x, scale=3) == self.x * 3))
+        assert_equal(len(calls), 2)
+        assert_equal(g.__name__, 'f')
+        
+        cache.clear()
+        assert_equal(cache.stats()['size'], 0)
+        assert_equal(cache.hits, 0)
+        
+    def test_same_name(self):
+        """test different functions with the same name do not share entries"""
+        cache = AnalysisCache()
+        ok_(np.all(cache.call(lambda v: v * 2, self.x) == self.x * 2))
+        ok_(np.all(cache.call(lambda v: v * 3, self.x) == self.x * 3))
+        def make(scale):
+            def f(v):
+                return v * scale
+            return f
+        ok_(np.all(cache.memoize(make(10))(self.x) == self.x * 10))
+        ok_(np.all(cache.memoize(make(20))(self.x) == self.x * 20))
+        assert_equal(cache.misses, 4)
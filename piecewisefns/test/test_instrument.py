@@ -0,0 +1,107 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+tests for the instrumentation hooks
+
+"""
+from __future__ import division, print_function
+
+from nose.tools.trivial import assert_raises
+from nose.tools.trivial import ok_
+from nose.tools.trivial import assert_equal
+from nose.tools.trivial import assert_false
+from nose import SkipTest
+
+import numpy as np
+
+from piecewisefns import instrument
+from piecewisefns import piecewise_linear_1d as pwl
+
+
+class test_instrument(object):
+    """each test leaves instrumentation disabled and empty"""
+    def __init__(self):
+        self.x = np.array([0, 0, 10, 10, 20, 30, 30, 40], dtype=float)
+        self.y = np.array([0, 5, 5, 8, 12, 12, 3, 3], dtype=float)
+        instrument.disable()
+        instrument.reset()
+        
+    def test_disabled_by_default(self):
+        assert_false(instrument.is_enabled())
+        pwl.ramps_constants_steps(self.x, self.y)
+        assert_equal(instrument.snapshot(), {})
+        
+    def test_counts(self):
+        instrument.enable()
+        try:
+            pwl.start_index_of_steps(self.x, self.y)
+            pwl.start_index_of_steps(self.x, self.y)
+            pwl.evaluate(self.x, self.y, np.linspace(0, 40, 5))
+            #keyword arguments are counted too
+            pwl.start_index_of_ramps(x=self.x, y=list(self.y))
+        finally:
+            instrument.disable()
+        pwl.start_index_of_steps(self.x, self.y)
+        
+        stats = instrument.snapshot()
+        assert_equal(stats['start_index_of_steps']['calls'], 2)
+        assert_equal(stats['start_index_of_steps']['items'], 32)
+        ok_(stats['start_index_of_steps']['seconds'] > 0)
+        assert_equal(stats['start_index_of_steps']['nbytes'], 0)
+        assert_equal(stats['evaluate']['items'], 21)
+        assert_equal(stats['start_index_of_ramps']['items'], 16)
+        #nested calls to instrumented functions are counted too
+        ok_(stats['segment_profile']['calls'] >= 2)
+        
+        stats['evaluate']['calls'] = 100
+        assert_equal(instrument.snapshot()['evaluate']['calls'], 1)
+        instrument.reset()
+        assert_equal(instrument.snapshot(), {})
+        
+    def test_exception(self):
+        instrument.enable()
+        try:
+            assert_raises(ValueError, pwl.evaluate, [0, 1, 0.5], [0, 1, 2], 0.5)
+        finally:
+            instrument.disable()
+        assert_equal(instrument.snapshot()['evaluate']['calls'], 1)
+        
+    def test_callback(self):
+        records = []
+        instrument.enable(callback=lambda name, r: records.append((name, r)))
+        try:
+            pwl.start_index_of_steps(self.x, self.y)
+        finally:
+            instrument.disable()
+        assert_equal([name for name, r in records], 
+                     ['segment_profile', 'start_index_of_steps'])
+        assert_equal(sorted(records[-1][1]), ['items', 'nbytes', 'seconds'])
+        
+    def test_track_memory(self):
+        if instrument.tracemalloc is None:
+            raise SkipTest("tracemalloc not available")
+        x = np.arange(10**5, dtype=float)
+        instrument.enable(track_memory=True)
+        try:
+            pwl.force_strictly_increasing(x, x)
+        finally:
+            instrument.disable()
+        stats = instrument.snapshot()
+        ok_(stats['force_strictly_increasing']['nbytes'] >= x.nbytes)
+        #only the outermost call measures memory
+        assert_equal(stats['segment_profile']['nbytes'], 0)
+        assert_false(instrument.tracemalloc.is_tracing())
@@ -0,0 +1,110 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+tests for the packed library format
+
+"""
+from __future__ import division, print_function
+
+from nose.tools.trivial import assert_raises
+from nose.tools.trivial import ok_
+from nose.tools.trivial import assert_equal
+
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from piecewisefns import piecewise_linear_1d as pwl
+from piecewisefns.packed import pack
+from piecewisefns.packed import save_packed
+from piecewisefns.packed import PackedLibrary
+
+
+class test_packed(object):
+    """a small library of functions including empty and one point ones"""
+    
+    def __init__(self):
+        np.random.seed(1)
+        self.xs = [[0,  0,  1,  1,  2], 
+                   [], 
+                   [0,  -0.5,  -1,  -1.5,  -2], 
+                   [3], 
+                   [0, 0.5, 1, 0.75, 1.5, 2], 
+                   [2, 2, 2]]
+        self.ys = [[0, 10, 10, 30, 30], 
+                   [], 
+                   [0,  10.0,  10,  30.0,  30], 
+                   [4], 
+                   [0, 1.2, 2, 2.25, 3.5, 3],
+                   [1, 1, 2]]
+        for i in range(20):
+            n = np.random.randint(0, 30)
+            self.xs.append(np.cumsum(np.random.randint(0, 3, n)))
+            self.ys.append(np.random.randint(0, 3, n))
+        #trailing empty functions start one past the last segment
+        self.xs.extend([[], []])
+        self.ys.extend([[], []])
+            
+    def test_pack(self):
+        """test pack and slicing"""
+        xy, offsets = pack(self.xs, self.ys)
+        assert_equal(xy.shape, (2, offsets[-1]))
+        lib = PackedLibrary(xy, offsets)
+        assert_equal(len(lib), len(self.xs))
+        for i in range(len(lib)):
+            x, y = lib[i]
+            ok_(np.all(x == self.xs[i]))
+            ok_(np.all(y == self.ys[i]))
+            ok_(len(x) == 0 or np.shares_memory(x, xy))
+        ok_(np.all(lib[-1][0] == self.xs[-1]))
+        assert_raises(IndexError, lib.__getitem__, len(lib))
+        assert_raises(ValueError, PackedLibrary, xy, offsets[:-3])
+        
+    def test_bulk(self):
+        """test bulk classification against the single function versions"""
+        lib = PackedLibrary(*pack(self.xs, self.ys))
+        for name in ['has_steps', 'strictly_increasing', 'strictly_decreasing', 
+                     'non_increasing', 'non_decreasing']:
+            expected = [getattr(pwl, name)(x) for x in self.xs]
+            ok_(np.all(getattr(lib, name)() == expected))
+        for name in ['start_index_of_ramps', 'start_index_of_constants', 
+                     'start_index_of_steps']:
+            index, index_offsets = getattr(lib, name)()
+            assert_equal(len(index_offsets), len(lib) + 1)
+            for i, (x, y) in enumerate(zip(self.xs, self.ys)):
+                ok_(np.all(index[index_offsets[i]:index_offsets[i + 1]] == 
+                           getattr(pwl, name)(x, y)))
+                           
+    def test_memmap(self):
+        """test save_packed and open as a memory map"""
+        path = tempfile.mkdtemp()
+        try:
+            save_packed(os.path.join(path, 'lib'), self.xs, self.ys, dtype=np.float64)
+            lib = PackedLibrary.open(os.path.join(path, 'lib'))
+            ok_(isinstance(lib.xy, np.memmap))
+            x, y = lib[4]
+            ok_(np.shares_memory(x, lib.xy))
+            ok_(np.all(y == self.ys[4]))
+            ok_(np.allclose(lib.function(0).evaluate([0.5, 1]), [10, 30]))
+            yi = lib.evaluate([0.5, 1, 0.5], [0, 2] + [3] * (len(lib) - 1), at_step='left')
+            ok_(np.allclose(yi[:2], [10, 10]))
+            ok_(np.isnan(yi[2]))
+            ok_(np.all(lib.has_steps() == [pwl.has_steps(x) for x in self.xs]))
+            del x, y, lib
+        finally:
+            shutil.rmtree(path)
@@ -0,0 +1,94 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+tests for the process pool batch functions
+
+"""
+from __future__ import division, print_function
+
+from nose.tools.trivial import assert_raises
+from nose.tools.trivial import ok_
+from nose.tools.trivial import assert_equal
+
+import numpy as np
+
+from piecewisefns import ragged
+from piecewisefns import parallel
+
+
+class test_parallel(object):
+    """random functions, including empty and one point ones at the ends, 
+    compared with the serial ragged functions"""
+    def __init__(self):
+        rng = np.random.RandomState(0)
+        xs = [np.sort(rng.randint(0, 20, rng.randint(2, 30))).astype(float) 
+              for i in range(50)]
+        xs[0] = np.zeros(0)
+        xs[1] = np.array([3.0])
+        xs[-1] = np.zeros(0)
+        xs[10] = xs[10][::-1]
+        ys = [rng.rand(len(a)) for a in xs]
+        xis = [rng.rand(rng.randint(0, 10)) * 20 for a in xs]
+        xis[10] = np.zeros(0)
+        self.x, self.offsets = ragged.to_ragged(xs)
+        self.y = ragged.to_ragged(ys)[0]
+        self.xi, self.xi_offsets = ragged.to_ragged(xis)
+        
+    def test_classification(self):
+        for name in ['has_steps', 'strictly_increasing', 'strictly_decreasing', 
+                     'non_increasing', 'non_decreasing']:
+            expected = getattr(ragged, name)(self.x, self.offsets)
+            for chunksize in [None, 1, 7]:
+                ok_(np.array_equal(getattr(parallel, name)(self.x, self.offsets, 
+                        workers=2, chunksize=chunksize), expected))
+                        
+    def test_evaluate(self):
+        for at_step in ['right', 'left', 'mean']:
+            expected = ragged.evaluate(self.x, self.y, self.offsets, self.xi, 
+                                       self.xi_offsets, at_step)
+            for chunksize in [None, 1, 7]:
+                yi = parallel.evaluate(self.x, self.y, self.offsets, self.xi, 
+                                       self.xi_offsets, at_step, workers=2, 
+                                       chunksize=chunksize)
+                assert_equal(yi.dtype, expected.dtype)
+                ok_(np.array_equal(yi, expected, equal_nan=True))
+                
+    def test_no_parent_attachments(self):
+        """test the parent process does not keep shared memory attached"""
+        for i in range(3):
+            parallel.has_steps(self.x, self.offsets, workers=2)
+            parallel.evaluate(self.x, self.y, self.offsets, self.xi, 
+                              self.xi_offsets, workers=2)
+        assert_equal(parallel._attached, {})
+        
+    def test_serial(self):
+        ok_(np.array_equal(parallel.evaluate(self.x, self.y, self.offsets, 
+                                             self.xi, self.xi_offsets, workers=1), 
+                           ragged.evaluate(self.x, self.y, self.offsets, 
+                                           self.xi, self.xi_offsets), 
+                           equal_nan=True))
+                           
+    def test_errors(self):
+        xi_offsets = self.xi_offsets.copy()
+        xi_offsets[11:] += 1
+        xi = np.concatenate((self.xi[:xi_offsets[10]], [1.0], 
+                             self.xi[xi_offsets[10]:]))
+        #function 10 is not non-decreasing and now has a query point
+        assert_raises(ValueError, parallel.evaluate, self.x, self.y, 
+                      self.offsets, xi, xi_offsets, workers=2)
+        assert_raises(ValueError, parallel.has_steps, self.x, self.offsets, 
+                      workers=0)
@@ -21,6 +21,7 @@ module for piecewise 1d linear relationships
 from __future__ import division, print_function
 
 from nose import with_setup
+from nose import SkipTest
 from nose.tools.trivial import assert_almost_equal
 from nose.tools.trivial import assert_raises
 from nose.tools.trivial import ok_
@@ -37,12 +38,37 @@ from piecewisefns.piecewise_linear_1d import non_increasing
 from piecewisefns.piecewise_linear_1d import is_initially_increasing
 from piecewisefns.piecewise_linear_1d import has_steps
 from piecewisefns.piecewise_linear_1d import non_increasing_and_non_decreasing_parts
+from piecewisefns.piecewise_linear_1d import non_increasing_and_non_decreasing_runs
 from piecewisefns.piecewise_linear_1d import force_strictly_increasing
 from piecewisefns.piecewise_linear_1d import force_non_decreasing
 from piecewisefns.piecewise_linear_1d import start_index_of_steps
 from piecewisefns.piecewise_linear_1d import start_index_of_ramps
 from piecewisefns.piecewise_linear_1d import start_index_of_constants
 from piecewisefns.piecewise_linear_1d import ramps_constants_steps
+from piecewisefns.piecewise_linear_1d import ramps_constants_steps_after
+from piecewisefns.piecewise_linear_1d import PiecewiseLinear1D
+from piecewisefns.piecewise_linear_1d import evaluate
+from piecewisefns.piecewise_linear_1d import segment_profile
+from piecewisefns.piecewise_linear_1d import cumulative_integral
+from piecewisefns.piecewise_linear_1d import integrate
+from piecewisefns.piecewise_linear_1d import average
+from piecewisefns.piecewise_linear_1d import add
+from piecewisefns.piecewise_linear_1d import subtract
+from piecewisefns.piecewise_linear_1d import scale
+from piecewisefns.piecewise_linear_1d import minimum
+from piecewisefns.piecewise_linear_1d import maximum
+from piecewisefns.piecewise_linear_1d import superpose
+from piecewisefns.piecewise_linear_1d import simplify
+from piecewisefns.piecewise_linear_1d import first_crossing
+from piecewisefns.piecewise_linear_1d import all_crossings
+from piecewisefns.piecewise_linear_1d import AppendablePiecewiseLinear1D
+from piecewisefns.piecewise_linear_1d import upper_envelope
+from piecewisefns.piecewise_linear_1d import lower_envelope
+from piecewisefns.piecewise_linear_1d import _remove_collinear
+from piecewisefns.piecewise_linear_1d import segment_coefficients
+from piecewisefns.piecewise_linear_1d import compose
+from piecewisefns.piecewise_linear_1d import _BLOCKSIZE
+from piecewisefns.piecewise_linear_1d import RAMP, CONSTANT, STEP
 
 class test_linear_piecewise(object):
     """Some piecewise distributions for testing"""
@@ -123,6 +149,47 @@ class test_linear_piecewise(object):
         assert_false(non_increasing(self.switch_back['x']))
         assert_false(non_increasing(self.switch_back_steps['x']))
         
+    def test_segment_profile(self):
+        """test segment_profile"""
+        p = segment_profile(**self.two_ramps_two_steps)
+        assert_equal(p.monotonicity, 'non_decreasing')
+        assert_equal(p.n_steps, 2)
+        assert_equal(p.first_change, 0)
+        ok_(np.all(p.ramps == [0, 3]))
+        ok_(np.all(p.constants == [2, 4]))
+        ok_(np.all(p.steps == [1, 5]))
+        assert_equal(len(p.degenerate), 0)
+        
+        assert_equal(segment_profile(self.two_ramps['x']).monotonicity, 'strictly_increasing')
+        assert_equal(segment_profile(self.two_ramps_reverse['x']).monotonicity, 'strictly_decreasing')
+        assert_equal(segment_profile(self.two_steps_reverse['x']).monotonicity, 'non_increasing')
+        assert_equal(segment_profile(self.switch_back['x']).monotonicity, 'neither')
+        ok_(segment_profile(self.two_ramps['x']).ramps is None)
+        
+        p = segment_profile([1, 1, 1, 2, 2, 3], [0, 0, 5, 5, 5, 6])
+        assert_equal(p.first_change, 2)
+        ok_(np.all(p.repeats == [0, 1, 3]))
+        ok_(np.all(p.steps == [1]))
+        ok_(np.all(p.degenerate == [0, 3]))
+        ok_(np.all(p.constants == [2]))
+        ok_(np.all(p.ramps == [4]))
+        assert_equal(segment_profile([2, 2, 2]).first_change, -1)
+        
+        #zero length segments are both steps and constants
+        ramps, constants, steps = ramps_constants_steps([1, 1, 1, 2, 2, 3], [0, 0, 5, 5, 5, 6])
+        ok_(np.all(ramps == [4]))
+        ok_(np.all(constants == [0, 2, 3]))
+        ok_(np.all(steps == [0, 1, 3]))
+        
+    def test_is_initially_increasing(self):
+        """test is_initially_increasing"""
+        ok_(is_initially_increasing(self.two_ramps['x']))
+        assert_false(is_initially_increasing(self.two_ramps_reverse['x']))
+        ok_(is_initially_increasing(self.two_steps['x']))
+        assert_false(is_initially_increasing(self.two_steps_reverse['x']))
+        assert_false(is_initially_increasing([1, 1, 0]))
+        assert_raises(ValueError, is_initially_increasing, [1, 1, 1])
+        
     def test_non_increasing_and_non_decreasing_parts(self):
         """test some non_increasing_and_non_decreasing_parts examples"""
         assert_equal(non_increasing_and_non_decreasing_parts(self.two_steps['x']), [range(len(self.two_steps['x'])-1)])
@@ -135,6 +202,28 @@ class test_linear_piecewise(object):
         assert_equal(non_increasing_and_non_decreasing_parts(self.switch_back['x'],include_end_point=True), [[0,1,2],[2,3],[3,4,5]])
         assert_equal(non_increasing_and_non_decreasing_parts(self.switch_back_steps['x'],include_end_point=True), [[0,1,2],[2,3,4],[4,5]])
         
+    def test_non_increasing_and_non_decreasing_runs(self):
+        """test some non_increasing_and_non_decreasing_runs examples"""
+        start, stop = non_increasing_and_non_decreasing_runs(self.two_steps['x'])
+        ok_(np.all(start == [0]))
+        ok_(np.all(stop == [5]))
+        start, stop = non_increasing_and_non_decreasing_runs(self.switch_back['x'])
+        ok_(np.all(start == [0, 2, 3]))
+        ok_(np.all(stop == [3, 4, 6]))
+        start, stop = non_increasing_and_non_decreasing_runs(self.switch_back_steps['x'])
+        ok_(np.all(start == [0, 2, 4]))
+        ok_(np.all(stop == [3, 5, 6]))
+        
+        #all zero sign changes
+        start, stop = non_increasing_and_non_decreasing_runs([3, 3, 3])
+        ok_(np.all(start == [0]))
+        ok_(np.all(stop == [3]))
+        assert_equal(non_increasing_and_non_decreasing_parts([3, 3, 3]), [[0, 1]])
+        
+        start, stop = non_increasing_and_non_decreasing_runs([3])
+        assert_equal(len(start), 0)
+        assert_equal(len(stop), 0)
+        
     def test_force_strictly_increasing(self):
         """test force_strictly_increasing"""
         x, y = force_strictly_increasing(self.two_ramps['x'], eps=0.01)                 
@@ -153,6 +242,77 @@ class test_linear_piecewise(object):
         ok_(np.allclose(x, np.array([-3, -2.99, -2.5, -1, -0.4, -0.38, 0])))
         ok_(np.allclose(y, np.array(self.two_ramps_two_steps['y'][::-1])))
     
+    def test_force_copy_semantics(self):
+        """test force_strictly_increasing and force_non_decreasing copy/inplace behaviour"""
+        x = np.array(self.two_ramps_two_steps['x'])
+        y = np.array(self.two_ramps_two_steps['y'])
+        x0 = x.copy()
+        xn, yn = force_strictly_increasing(x, y, eps=0.01)
+        ok_(np.all(x == x0))
+        ok_(yn is y)
+        
+        xn, yn = force_strictly_increasing(x, y, eps=0.01, inplace=True)
+        ok_(xn is x)
+        ok_(np.allclose(x, [0,  0.38,   0.4,  1,  2.5,  2.99,  3]))
+        
+        x = np.array(self.two_ramps_two_steps_reverse['x'])
+        y = np.array(self.two_ramps_two_steps_reverse['y'])
+        xn, yn = force_strictly_increasing(x, y, keep_end_points=False, eps=0.01, inplace=True)
+        ok_(np.shares_memory(xn, x))
+        ok_(np.shares_memory(yn, y))
+        ok_(np.allclose(x[::-1], [-3, -2.99, -2.5, -1, -0.4, -0.38, 0]))
+        
+        assert_raises(TypeError, force_strictly_increasing, self.two_steps['x'], inplace=True)
+        
+        x = np.array(self.two_ramps_two_steps_reverse['x'])
+        y = np.array(self.two_ramps_two_steps_reverse['y'])
+        xn, yn = force_non_decreasing(x, y)
+        ok_(np.shares_memory(xn, x))
+        ok_(np.shares_memory(yn, y))
+        xn, yn = force_non_decreasing(x)
+        ok_(yn is None)
+        
+        xn, yn = force_non_decreasing(x, y, inplace=True)
+        ok_(xn is x)
+        ok_(yn is y)
+        ok_(np.all(x == [-3, -3, -2.5, -1, -0.4, -0.4, 0]))
+        ok_(np.all(y == self.two_ramps_two_steps['y'][::-1]))
+        
+        x = np.arange(20001)[::-1]
+        force_non_decreasing(x, inplace=True)
+        ok_(np.all(x == np.arange(20001)))
+        
+    def test_force_allocations(self):
+        """test force_* with inplace=True never allocate a copy of x"""
+        try:
+            import tracemalloc
+        except ImportError:
+            raise SkipTest("tracemalloc not available")
+            
+        def peak(f, *args, **kwargs):
+            tracemalloc.start()
+            try:
+                f(*args, **kwargs)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            
+        n = 10**6
+        x = np.linspace(0, 1, n)
+        x[n // 2] = x[n // 2 + 1]
+        
+        #no more than the (temporary) diff of x and the copy if not inplace
+        ok_(peak(force_strictly_increasing, x) < 2.5 * x.nbytes)
+        #the copy shows up as one more x sized allocation
+        ok_(peak(force_strictly_increasing, x) - peak(force_strictly_increasing, x, inplace=True) > 0.9 * x.nbytes)
+        #no more than the (temporary) diff of x
+        ok_(peak(force_strictly_increasing, x, inplace=True) < 1.5 * x.nbytes)
+        
+        x = x[::-1].copy()
+        y = x.copy()
+        ok_(peak(force_non_decreasing, x, y, inplace=True) < 1.5 * x.nbytes)
+        ok_(np.all(np.diff(x) >= 0))
+        
     def test_force_non_decreasing(self):
         """test force_non_decreasing"""
         x, y = force_non_decreasing(self.two_ramps_two_steps['x'], self.two_ramps_two_steps['y'])                 
@@ -200,7 +360,524 @@ class test_linear_piecewise(object):
         ok_(np.allclose(start_index_of_constants(**self.two_steps),np.array([1,3])))
         ok_(np.allclose(start_index_of_constants(**self.two_ramps),np.array([1,3])))
         ok_(np.allclose(start_index_of_constants(**self.two_ramps_two_steps),np.array([2,4])))        
+
+    def test_PiecewiseLinear1D(self):
+        """test PiecewiseLinear1D cached lookups match the module functions"""
+        for a in [self.two_steps, self.two_steps_reverse, self.two_ramps, 
+                  self.two_ramps_reverse, self.two_ramps_two_steps, 
+                  self.two_ramps_two_steps_reverse, self.switch_back, 
+                  self.switch_back_steps]:
+            f = PiecewiseLinear1D(**a)
+            assert_equal(f.has_steps(), has_steps(a['x']))
+            assert_equal(f.strictly_increasing(), strictly_increasing(a['x']))
+            assert_equal(f.strictly_decreasing(), strictly_decreasing(a['x']))
+            assert_equal(f.non_increasing(), non_increasing(a['x']))
+            assert_equal(f.non_decreasing(), non_decreasing(a['x']))
+            ok_(np.all(f.start_index_of_ramps() == start_index_of_ramps(**a)))
+            ok_(np.all(f.start_index_of_constants() == start_index_of_constants(**a)))
+            ok_(np.all(f.start_index_of_steps() == start_index_of_steps(**a)))
+            
+        f = PiecewiseLinear1D(**self.two_ramps_two_steps)
+        ok_(np.allclose(f.slopes, [25, 0, 0, 20 / 3, 0, 0]))
+        ramps, constants, steps = f.ramps_constants_steps()
+        ok_(np.all(ramps==np.array([0,3])))
+        ok_(np.all(constants==np.array([2,4])))        
+        ok_(np.all(steps==np.array([1,5])))
+        assert_raises(ValueError, ramps.__setitem__, 0, 1)
+        
+        x = np.array([0, 1, 1, 2.0])
+        f = PiecewiseLinear1D(x, [0, 1, 2, 2])
+        ok_(np.shares_memory(f.x, x))
+        ok_(x.flags.writeable)
+        
+    def test_evaluate(self):
+        """test evaluate at and between steps"""
+        xi = [-1, 0, 0.2, 0.4, 1, 2.5, 2.75, 3, 3.5]
+        ok_(np.allclose(evaluate(xi=xi, at_step='right', **self.two_ramps_two_steps),
+                        [0, 0, 5, 20, 20, 30, 30, 40, 40]))
+        ok_(np.allclose(evaluate(xi=xi, at_step='left', **self.two_ramps_two_steps),
+                        [0, 0, 5, 10, 20, 30, 30, 30, 40]))
+        ok_(np.allclose(evaluate(xi=xi, at_step='mean', **self.two_ramps_two_steps),
+                        [0, 0, 5, 15, 20, 30, 30, 35, 40]))
+        ok_(np.allclose(evaluate(xi=[-0.2, -0.4, -3], at_step='left', **self.two_ramps_two_steps_reverse),
+                        [5, 20, 40]))
+        ok_(np.allclose(evaluate(xi=[0, 1, 2], **self.two_steps), [10, 30, 30]))
+        assert_equal(evaluate(xi=1, at_step='left', **self.two_steps), 10)
+        ok_(np.allclose(evaluate(xi=[[0.25], [1.75]], **self.two_ramps), [[5], [30]]))
+        
+        assert_raises(ValueError, evaluate, xi=0.5, **self.switch_back)
+        assert_raises(ValueError, evaluate, xi=0.5, at_step='middle', **self.two_ramps)
+        
+        x = np.sort(np.random.rand(50))
+        y = np.random.rand(50)
+        xi = np.linspace(-0.1, 1.1, 200)
+        ok_(np.allclose(evaluate(x, y, xi), np.interp(xi, x, y)))
+        ok_(np.allclose(PiecewiseLinear1D(x, y).evaluate(xi, at_step='left'), np.interp(xi, x, y)))
+        
+        f = PiecewiseLinear1D(**self.two_ramps_two_steps_reverse)
+        ok_(np.allclose(f.evaluate([-0.2, -0.4, -3], at_step='left'), [5, 20, 40]))
+        
+    def test_ramps_constants_steps_after(self):
+        """test ramps_constants_steps_after against a brute force mask"""
+        a = self.two_ramps_two_steps
+        xi = np.array([-1, 0, 0.2, 0.4, 1, 2.75, 3, 4])
+        result = ramps_constants_steps_after(xi=xi, **a)
+        x = np.array(a['x'])
+        for (start, ptr), expected in zip(result, ramps_constants_steps(**a)):
+            ok_(np.all(start == expected))
+            assert_equal(ptr.shape, xi.shape)
+            for j, v in enumerate(xi):
+                ok_(np.all(start[ptr[j]:] == expected[x[expected] > v]))
+        
+        (start, ptr), _, _ = ramps_constants_steps_after(xi=0.2, **a)
+        ok_(np.all(start[ptr:] == [3]))
+        
+        f = PiecewiseLinear1D(**a)
+        for r, expected in zip(f.ramps_constants_steps_after(xi), result):
+            ok_(np.all(r[0] == expected[0]))
+            ok_(np.all(r[1] == expected[1]))
+            
+        #start positions of non-increasing data are not sorted
+        a = self.two_ramps_two_steps_reverse
+        assert_raises(ValueError, ramps_constants_steps_after, xi=xi, **a)
+        assert_raises(ValueError, PiecewiseLinear1D(**a).ramps_constants_steps_after, xi)
+        assert_raises(ValueError, ramps_constants_steps_after, [4, 3, 2, 1, 0], 
+                      [0, 1, 1, 2, 3], xi)
+        
+    def test_integrate(self):
+        """test integrate and average against brute force segment by segment integration"""
+        
+        def brute(x, y, a, b):
+            #integrate each segment clipped to [a, b] plus constant ends
+            x = np.asarray(x, dtype=float)
+            y = np.asarray(y, dtype=float)
+            total = 0.0
+            total += y[0] * max(0, min(b, x[0]) - a)
+            total += y[-1] * max(0, b - max(a, x[-1]))
+            for i in range(len(x) - 1):
+                lo, hi = max(a, x[i]), min(b, x[i + 1])
+                if hi <= lo:
+                    continue
+                s = (y[i + 1] - y[i]) / (x[i + 1] - x[i])
+                total += (hi - lo) * (y[i] + s * (0.5 * (lo + hi) - x[i]))
+            return total
+            
+        a = np.array([-1, 0, 0.2, 0.4, 0.4, 1.2, 2.75, 3, 0])
+        b = np.array([0.1, 0.4, 0.3, 1, 3, 2.9, 3, 4, 5])
+        for d in [self.two_steps, self.two_ramps, self.two_ramps_two_steps]:
+            expected = [brute(d['x'], d['y'], a_, b_) for a_, b_ in zip(a, b)]
+            ok_(np.allclose(integrate(a=a, b=b, **d), expected))
+            ok_(np.allclose(integrate(a=b, b=a, **d), -np.array(expected)))
+            ok_(np.allclose(average(a=a, b=b, **d), np.array(expected) / (b - a)))
+            f = PiecewiseLinear1D(**d)
+            ok_(np.allclose(f.integrate(a, b), expected))
+            ok_(np.allclose(f.average(a, b), np.array(expected) / (b - a)))
+            
+        ok_(np.allclose(cumulative_integral(**self.two_ramps_two_steps), 
+                        [0, 2, 2, 14, 51.5, 66.5, 66.5]))
+        ok_(np.allclose(integrate(a=-2, b=-0.5, **self.two_ramps_two_steps_reverse), 
+                        integrate(a=0.5, b=2, **self.two_ramps_two_steps)))
+        assert_equal(average(a=1, b=1, **self.two_steps), 30)
+        ok_(np.allclose(average(a=[1, 0.5], b=1, **self.two_steps), [30, 10]))
+        
+        x = np.sort(np.random.rand(30))
+        y = np.random.rand(30)
+        a = np.random.rand(50)
+        b = np.random.rand(50)
+        expected = [brute(x, y, a_, b_) if a_ < b_ else -brute(x, y, b_, a_) 
+                    for a_, b_ in zip(a, b)]
+        ok_(np.allclose(integrate(x, y, a, b), expected))
+        
+    def test_arithmetic(self):
+        """test add, subtract, scale, minimum and maximum against pointwise evaluation"""
+        fns = [self.two_steps, self.two_ramps, self.two_ramps_two_steps, 
+               self.two_ramps_two_steps_reverse, 
+               {'x': [0.5, 1, 2, 2.2, 3.5], 'y': [25, -5, 40, 8, 12]}]
+        xi = np.concatenate((np.linspace(-3.5, 3.5, 141), 
+                             [-3, -2.5, -1, -0.4, 0, 0.4, 1, 2.5, 3]))
+        for f, op in [(add, np.add), (subtract, np.subtract), 
+                      (minimum, np.minimum), (maximum, np.maximum)]:
+            for a in fns:
+                for b in fns:
+                    x, y = f(a['x'], a['y'], b['x'], b['y'])
+                    ok_(non_decreasing(x))
+                    for side in ['left', 'right']:
+                        expected = op(evaluate(a['x'], a['y'], xi, side), 
+                                      evaluate(b['x'], b['y'], xi, side))
+                        ok_(np.allclose(evaluate(x, y, xi, side), expected))
+                        
+        x, y = add(self.two_steps['x'], self.two_steps['y'], self.two_ramps['x'], self.two_ramps['y'])
+        ok_(np.allclose(x, [0, 0, 0.5, 1, 1, 1.5, 2]))
+        ok_(np.allclose(y, [0, 10, 20, 20, 40, 60, 60]))
+        
+        #crossing points are added, collinear points are not kept
+        x, y = maximum([0, 2], [0, 2], [0, 1, 2], [2, 1, 0])
+        ok_(np.allclose(x, [0, 1, 2]))
+        ok_(np.allclose(y, [2, 1, 2]))
+        x, y = scale([0, 1, 2], [1, 2, 3], 0)
+        ok_(np.allclose(x, [0, 2]))
+        ok_(np.allclose(y, [0, 0]))
+        
+        f = PiecewiseLinear1D(**self.two_steps)
+        g = PiecewiseLinear1D(**self.two_ramps)
+        h = sum([f, g, f])
+        ok_(np.allclose(h.evaluate(xi), 2 * f.evaluate(xi) + g.evaluate(xi)))
+        h = 2 * f - g
+        ok_(np.allclose(h.evaluate(xi), 2 * f.evaluate(xi) - g.evaluate(xi)))
+        h = 1 - f
+        ok_(np.allclose(h.evaluate(xi), 1 - f.evaluate(xi)))
+        ok_(np.allclose(f.maximum(g).evaluate(xi), np.maximum(f.evaluate(xi), g.evaluate(xi))))
+        ok_(np.allclose(f.minimum(g).evaluate(xi), np.minimum(f.evaluate(xi), g.evaluate(xi))))
+        #a number crossing the middle of a ramp adds the crossing
+        f = PiecewiseLinear1D([0, 2], [0, 10])
+        ok_(np.allclose(f.minimum(3).evaluate([0, 0.3, 0.6, 1, 2]), [0, 1.5, 3, 3, 3]))
+        ok_(np.allclose(f.maximum(3).evaluate([0, 0.3, 0.6, 1, 2]), [3, 3, 3, 5, 10]))
+        for c in [-1, 0.5, 4]:
+            ok_(np.allclose(g.minimum(c).evaluate(xi), np.minimum(g.evaluate(xi), c)))
+            ok_(np.allclose(g.maximum(c).evaluate(xi), np.maximum(g.evaluate(xi), c)))
+        
+    def test_superpose(self):
+        """test superpose against the load itself and a segment by segment loop"""
+        t = np.linspace(-1, 4, 51)
+        for a in [self.two_steps, self.two_ramps, self.two_ramps_two_steps, 
+                  self.two_ramps_two_steps_reverse]:
+            #unit kernels give back the load history
+            ok_(np.allclose(superpose(t=t, step_response=np.ones_like, 
+                                      ramp_response=lambda tau: tau, **a), 
+                            np.where(t < min(a['x']), 0, evaluate(xi=t, **a))))
+                                      
+        U = lambda tau: 1 - np.exp(-tau)
+        V = lambda tau: tau - (1 - np.exp(-tau))
+        x = np.array([0, 0.5, 0.5, 1, 2.5, 3, 3, 3.5])
+        y = np.array([2, 10.0, 20.0, 20, 30.0, 30, 40, 35])
+        expected = np.zeros_like(t)
+        expected += y[0] * np.where(t >= x[0], U(np.maximum(t - x[0], 0)), 0)
+        for i in range(len(x) - 1):
+            dx, dy = x[i + 1] - x[i], y[i + 1] - y[i]
+            if dx == 0:
+                expected += dy * np.where(t >= x[i], U(np.maximum(t - x[i], 0)), 0)
+            else:
+                for xs, sgn in [(x[i], 1), (x[i + 1], -1)]:
+                    expected += sgn * dy / dx * np.where(t >= xs, V(np.maximum(t - xs, 0)), 0)
+        ok_(np.allclose(superpose(x, y, t, U, V), expected))
+        ok_(np.allclose(superpose(x, y, t, U, V, chunksize=7), expected))
+        ok_(np.allclose(PiecewiseLinear1D(x, y).superpose(t.reshape(3, 17), U, V), 
+                        expected.reshape(3, 17)))
+        
+        assert_raises(ValueError, superpose, x, y, t, U)
+        ok_(np.allclose(superpose(t=t, step_response=U, **self.two_steps),
+                        10 * U(np.maximum(t, 0)) * (t >= 0) + 20 * U(np.maximum(t - 1, 0)) * (t >= 1)))
+        
+    def test_simplify(self):
+        """test simplify keeps steps and plateaus and stays within tolerance"""
+        x, y = simplify([0, 1, 2, 2, 3, 4, 5, 5, 6], [0, 1, 2, 5, 5, 5, 5, 7, 8])
+        ok_(np.allclose(x, [0, 2, 2, 5, 5, 6]))
+        ok_(np.allclose(y, [0, 2, 5, 5, 7, 8]))
+        
+        x, y = simplify([0, 1, 2, 2, 2, 3], [0, 1, 2, 4, 4, 5])
+        ok_(np.allclose(x, [0, 2, 2, 3]))
+        ok_(np.allclose(y, [0, 2, 4, 5]))
+        
+        np.random.seed(3)
+        x = np.linspace(0, 10, 2001)
+        y = np.sin(x) + np.random.rand(len(x)) * 1e-3
+        x = np.concatenate((x[:500], x[500:501], x[500:1000], x[1000:1200], x[1200:]))
+        y = np.concatenate((y[:500], y[500:501] + 2, y[500:1000] + 2, np.zeros(200) + 0.5, y[1200:]))
+        
+        for atol, rtol in [(0.01, 0), (0, 0.01), (0.001, 0.005), (0.5, 0)]:
+            xs, ys = simplify(x, y, atol, rtol)
+            ok_(len(xs) < len(x) / 4)
+            ok_(non_decreasing(xs))
+            err = np.minimum(np.abs(evaluate(xs, ys, x, 'left') - y), 
+                             np.abs(evaluate(xs, ys, x, 'right') - y))
+            ok_(np.all(err <= atol + rtol * np.abs(y) + 1e-12))
+            #the step and the plateau are kept exactly
+            ok_(np.allclose(evaluate(xs, ys, x[500], 'left'), y[500], atol=atol + rtol))
+            ok_(np.allclose(evaluate(xs, ys, x[500], 'right'), y[501]))
+            ok_(np.allclose(evaluate(xs, ys, x[1001:1201]), 0.5))
+            ok_(np.any((xs == x[1001]) & (ys == 0.5)))
+            ok_(np.any((xs == x[1200]) & (ys == 0.5)))
+            
+        f = PiecewiseLinear1D(x, y).simplify(atol=0.01)
+        ok_(np.all(f.x == simplify(x, y, 0.01)[0]))
+        
+    def test_crossings(self):
+        """test first_crossing and all_crossings"""
+        x = [0, 1, 2, 2, 3, 4, 5, 6]
+        y = [0, 2, 0, 3, 3, 1, 1, 2]
+        levels = [1, 3, 0, -1, 1.5]
+        
+        ok_(np.allclose(first_crossing(x, y, levels), 
+                        [0.5, 2, 0, np.nan, 0.75], equal_nan=True))
+        ok_(np.allclose(first_crossing(x, y, [[1, 3]]), [[0.5, 2]]))
+        #first reached going down
+        ok_(np.allclose(first_crossing([0, 1, 2], [2, 0, 1], [1, 0.5]), [0.5, 0.75]))
+        #x non-increasing
+        ok_(np.allclose(first_crossing(x[::-1], y[::-1], levels), 
+                        [0.5, 2, 0, np.nan, 0.75], equal_nan=True))
+                        
+        xc, offsets = all_crossings(x, y, levels)
+        assert_equal(offsets.tolist(), [0, 4, 5, 7, 7, 12])
+        ok_(np.allclose(xc[offsets[0]:offsets[1]], [0.5, 1.5, 2, 4]))
+        ok_(np.allclose(xc[offsets[1]:offsets[2]], [2]))
+        #touching 0 at the trough x=2 is reported once
+        ok_(np.allclose(xc[offsets[2]:offsets[3]], [0, 2]))
+        ok_(np.allclose(xc[offsets[4]:offsets[5]], [0.75, 1.25, 2, 3.75, 5.5]))
+        
+        f = PiecewiseLinear1D(x, y)
+        ok_(np.allclose(f.first_crossing(levels), 
+                        first_crossing(x, y, levels), equal_nan=True))
+        ok_(np.allclose(f.all_crossings(levels)[0], xc))
+        
+        xc, offsets = all_crossings([0, 1], [5, 6], [1, 2])
+        assert_equal(len(xc), 0)
+        assert_equal(offsets.tolist(), [0, 0, 0])
+        
+        #single point agrees with first_crossing
+        ok_(np.allclose(first_crossing([0], [2], [2, 3]), [0, np.nan], equal_nan=True))
+        xc, offsets = all_crossings([0], [2], [2, 3])
+        assert_equal(xc.tolist(), [0])
+        assert_equal(offsets.tolist(), [0, 1, 1])
+        xc, offsets = all_crossings([], [], [2])
+        assert_equal(offsets.tolist(), [0, 0])
+        
+        #the first of all the crossings is the first crossing
+        np.random.seed(3)
+        x = np.cumsum(np.random.randint(0, 3, 300)).astype(float)
+        y = np.random.randint(0, 6, 300).astype(float)
+        levels = np.arange(-1, 7) * 0.75
+        xc, offsets = all_crossings(x, y, levels)
+        first = first_crossing(x, y, levels)
+        for i in range(len(levels)):
+            if np.isnan(first[i]):
+                assert_equal(offsets[i], offsets[i + 1])
+            else:
+                assert_equal(xc[offsets[i]], first[i])
+                ok_(np.all(np.diff(xc[offsets[i]:offsets[i + 1]]) >= 0))
+        
+    def test_AppendablePiecewiseLinear1D(self):
+        """test incremental updates match a PiecewiseLinear1D of all the data"""
+        np.random.seed(5)
+        x = np.cumsum(np.random.randint(0, 3, 200)).astype(float)
+        y = np.random.randint(0, 3, 200).astype(float)
+        
+        f = AppendablePiecewiseLinear1D()
+        assert_equal(len(f), 0)
+        ok_(f.non_decreasing())
+        f.append(x[0], y[0])
+        f.extend(x[1:50], y[1:50])
+        for a, b in zip(x[50:120], y[50:120]):
+            f.append(a, b)
+        f.extend(x[120:], y[120:])
+        g = PiecewiseLinear1D(x, y)
+        
+        assert_equal(len(f), len(g))
+        ok_(np.all(f.x == x) and np.all(f.y == y))
+        ok_(np.allclose(f.slopes, g.slopes))
+        for name in ['has_steps', 'strictly_increasing', 'strictly_decreasing', 
+                     'non_increasing', 'non_decreasing', 'start_index_of_ramps', 
+                     'start_index_of_constants', 'start_index_of_steps']:
+            ok_(np.all(getattr(f, name)() == getattr(g, name)()))
+        ok_(np.allclose(f.cumulative_integral(), g.cumulative_integral()))
+        xi = np.linspace(-1, x[-1] + 1, 50)
+        ok_(np.allclose(f.evaluate(xi, 'left'), g.evaluate(xi, 'left')))
+        ok_(np.allclose(f.integrate(xi[:-1], xi[1:]), g.integrate(xi[:-1], xi[1:])))
+        ok_(np.all(f.freeze().x == x))
+        assert_false(f.x.flags.writeable)
+        
+        f.append(x[-1] - 1, 0)
+        ok_(f.non_decreasing() == False and f.non_increasing() == False)
+        assert_raises(ValueError, f.evaluate, 0)
+        
+        f = AppendablePiecewiseLinear1D([3, 2, 2, 1], [0, 1, 2, 2])
+        ok_(f.non_increasing() and f.has_steps())
+        assert_equal(f.ramps_constants_steps()[2].tolist(), [1])
+        ok_(np.allclose(f.cumulative_integral(), [0, -0.5, -0.5, -2.5]))
+        assert_raises(ValueError, f.extend, [1, 2], [1])
+        #non-increasing histories are evaluated through freeze
+        assert_raises(ValueError, f.evaluate, 1.5)
+        assert_raises(ValueError, f.integrate, 1, 3)
+        ok_(np.allclose(f.freeze().evaluate([1.5, 2.5]), [2, 0.5]))
+        ok_(np.allclose(f.freeze().integrate(1, 3), 2.5))
+        
+    def test_envelope(self):
+        """test upper_envelope and lower_envelope against evaluate"""
+        np.random.seed(7)
+        xs = []
+        ys = []
+        for i in range(13):
+            n = np.random.randint(1, 15)
+            xs.append(np.cumsum(np.random.randint(0, 3, n)).astype(float))
+            ys.append(np.random.rand(n))
+        xs[3] = xs[3][::-1]
+        ys[3] = ys[3][::-1]
+        xi = np.concatenate((np.linspace(-1, 30, 500), np.arange(30.)))
+        for f, op in [(upper_envelope, np.max), (lower_envelope, np.min)]:
+            x, y = f(xs, ys)
+            ok_(non_decreasing(x))
+            for side in ['left', 'right']:
+                expected = op([evaluate(a, b, xi, side) for a, b in zip(xs, ys)], 
+                              axis=0)
+                ok_(np.allclose(evaluate(x, y, xi, side), expected))
+            #no redundant points
+            assert_equal(len(_remove_collinear(x, y)[0]), len(x))
+            
+        x, y = upper_envelope(xs[3:4], ys[3:4])
+        ok_(np.allclose(evaluate(x, y, xi), evaluate(xs[3], ys[3], xi)))
+        assert_raises(ValueError, upper_envelope, [], [])
+        
+    def test_segment_coefficients(self):
+        """test SegmentTable coefficients, kinds, lookup and evaluation"""
+        x = [0, 0, 10, 10, 20, 30, 30, 40, 40]
+        y = [0, 5, 5, 8, 12, 12, 3, 3, 3]
+        t = segment_coefficients(x, y)
+        assert_equal(len(t), 8)
+        ramps, constants, steps = ramps_constants_steps(x, y)
+        assert_equal(np.flatnonzero(t.kind == RAMP).tolist(), list(ramps))
+        assert_equal(np.flatnonzero(t.kind == CONSTANT).tolist(), [1, 4, 6])
+        assert_equal(np.flatnonzero(t.kind == STEP).tolist(), [0, 2, 5, 7])
+        ok_(np.allclose(t.slope, [0, 0, 0, 0.4, 0, 0, 0, 0]))
+        ok_(np.allclose(t.intercept, [0, 5, 5, 4, 12, 12, 3, 3]))
+        for a in (t.x_start, t.x_end, t.slope, t.intercept, t.kind):
+            assert_false(a.flags.writeable)
+            ok_(a.flags.c_contiguous)
+            
+        assert_equal(t.lookup([-1, 0, 5, 10, 30, 50]).tolist(), [1, 1, 1, 3, 6, 6])
+        assert_equal(t.lookup([0, 10, 30], side='left').tolist(), [1, 1, 4])
+        xi = np.linspace(-5, 45, 101)
+        for at_step in ['left', 'right', 'mean']:
+            ok_(np.allclose(t.evaluate(xi, at_step), evaluate(x, y, xi, at_step)))
+            
+        t = PiecewiseLinear1D(x[::-1], y[::-1]).segment_coefficients()
+        ok_(np.allclose(t.evaluate(xi), evaluate(x, y, xi)))
+        assert_raises(ValueError, segment_coefficients([1, 1], [0, 2]).lookup, 1)
+        
+    def test_compose(self):
+        """test compose against evaluating f at g"""
+        #f steps from 0 to 1 at x=1
+        f = ([0, 1, 1, 2], [0, 0, 1, 1])
+        #decreasing g: approaches the step from above
+        x, y = compose(f[0], f[1], [0, 2], [2, 0])
+        ok_(np.allclose(x, [0, 1, 1, 2]))
+        ok_(np.allclose(y, [1, 1, 0, 0]))
+        #g with a step over f's step, then a plateau at the step
+        x, y = compose(f[0], f[1], [0, 1, 1, 2, 3], [0.5, 0.5, 1.5, 1, 1])
+        ok_(np.allclose(x, [0, 1, 1, 3]))
+        ok_(np.allclose(y, [0, 0, 1, 1]))
+        #time shift and scaling
+        x, y = compose([0, 1, 1, 3], [0, 1, 2, 2], [0, 2, 10], [0, 0, 4])
+        ok_(np.allclose(x, [0, 2, 4, 4, 10]))
+        ok_(np.allclose(y, [0, 0, 1, 2, 2]))
+        
+        np.random.seed(11)
+        xf = np.cumsum(np.random.randint(0, 3, 30)).astype(float)
+        yf = np.random.rand(30)
+        xg = np.cumsum(np.random.randint(0, 3, 20)).astype(float)
+        yg = np.random.rand(20) * 60 - 5
+        x, y = compose(xf, yf, xg, yg)
+        ok_(non_decreasing(x))
+        q = np.random.rand(500) * 45 - 2
+        for side in ['left', 'right']:
+            ok_(np.allclose(evaluate(x, y, q, side), 
+                            evaluate(xf, yf, evaluate(xg, yg, q, side))))
+        h = PiecewiseLinear1D(xf, yf).compose(PiecewiseLinear1D(xg, yg))
+        ok_(np.all(h.x == x))
+        
+        x, y = compose(xf, yf, [3], [4])
+        ok_(np.allclose(y, evaluate(xf, yf, 4)))
+        
+    def test_block_predicates(self):
+        """test the block scanning predicates at and around block edges"""
+        n = 3 * _BLOCKSIZE + 5
+        for i in [0, 1, _BLOCKSIZE - 1, _BLOCKSIZE, _BLOCKSIZE + 1, n - 2]:
+            x = np.arange(n, dtype=float)
+            ok_(strictly_increasing(x) and non_decreasing(x))
+            assert_false(has_steps(x))
+            x[i + 1] = x[i]
+            assert_false(strictly_increasing(x))
+            ok_(non_decreasing(x))
+            ok_(has_steps(x))
+            x[i + 1] = x[i] - 1
+            assert_false(non_decreasing(x))
+            
+            y = np.zeros(n)
+            y[i + 1:] = -1
+            assert_equal(is_initially_increasing(y), False)
+            ok_(non_increasing(y))
+            assert_false(strictly_decreasing(y))
+            assert_equal(is_initially_increasing(-y), True)
+            
+        assert_raises(ValueError, is_initially_increasing, np.zeros(n))
+        ok_(strictly_increasing([1]) and strictly_decreasing([]))
+        
+    def test_dtype_policy(self):
+        """test float32 data stays float32 and integer data becomes float64"""
+        x = np.array([0, 1, 1, 3, 4], dtype=np.float32)
+        y = np.array([0, 2, 5, 5, 1], dtype=np.float32)
+        xi = np.linspace(-1, 5, 13)
+        f = PiecewiseLinear1D(x, y)
+        for out in [evaluate(x, y, xi), f.evaluate(xi, 'mean'), 
+                    cumulative_integral(x, y), integrate(x, y, 0, xi), 
+                    average(x, y, 0, xi), f.slopes, 
+                    first_crossing(x, y, [1, 3]), all_crossings(x, y, [1, 3])[0], 
+                    segment_coefficients(x, y).evaluate(xi)]:
+            assert_equal(out.dtype, np.float32)
+        for xy in [add(x, y, x, y), maximum(x, y, x + 0.5, y), scale(x, y, 2.5), 
+                   simplify(x, y, 0.1), compose(x, y, x, y / 2), 
+                   upper_envelope([x, x], [y, y])]:
+            assert_equal([a.dtype for a in xy], [np.float32, np.float32])
+        ok_(np.allclose(evaluate(x, y, xi), evaluate(x.astype(float), y, xi)))
+        
+        #the integral index of a long float32 trace is accumulated in float64
+        x = np.linspace(0, 1000, 2 * 10**6).astype(np.float32)
+        y = np.full_like(x, 0.1)
+        ok_(np.allclose(integrate(x, y, 990, 991), 0.1, rtol=1e-4))
+        ok_(np.allclose(average(x, y, [10, 990], [11, 991]), 0.1, rtol=1e-4))
+        ok_(np.allclose(PiecewiseLinear1D(x, y).integrate(990, 991), 0.1, rtol=1e-4))
+        
+        assert_equal(evaluate([0, 1, 2], [0, 1, 4], [0.5]).dtype, np.float64)
+        assert_equal(cumulative_integral([0, 1, 2], [0, 1, 4]).dtype, np.float64)
+        
+    def test_force_strictly_increasing_ulp(self):
+        """test the default step separation works for any dtype and magnitude"""
+        for dtype in [np.float32, np.float64]:
+            for scale in [1, 1e-20, 1e8, -1, -1e8]:
+                x = np.array([0, 1, 1, 1, 2, 3, 3], dtype=dtype) * dtype(abs(scale))
+                if scale < 0:
+                    #negative x, still non-decreasing
+                    x = x - dtype(4 * abs(scale))
+                y = np.arange(7, dtype=dtype)
+                for keep_end_points in [True, False]:
+                    xn, yn = force_strictly_increasing(x, y, keep_end_points)
+                    assert_equal(xn.dtype, dtype)
+                    ok_(strictly_increasing(xn))
+                    ok_(np.allclose(xn, x, rtol=1e-5, atol=0))
+                    #reversed (non-increasing) data
+                    xr, yr = force_strictly_increasing(x[::-1], y[::-1], 
+                                                       keep_end_points)
+                    ok_(strictly_increasing(xr))
+                    ok_(np.allclose(xr, x, rtol=1e-5, atol=0))
+                    if keep_end_points:
+                        assert_equal(xn[[0, 3, 4, 6]].tolist(), x[[0, 3, 4, 6]].tolist())
+                    else:
+                        assert_equal(xn[[0, 1, 4, 5]].tolist(), x[[0, 1, 4, 5]].tolist())
+                        
+        for x in [[-3., -3., -1.], np.array([-2, -2, 0], dtype=np.float32), 
+                  [0, -1, -1, -2]]:
+            for keep_end_points in [True, False]:
+                ok_(strictly_increasing(force_strictly_increasing(x, 
+                                            keep_end_points=keep_end_points)[0]))
+                                            
+        #a fixed eps does nothing to float32 near 1
+        x = np.array([0, 1, 1], dtype=np.float32)
+        assert_false(strictly_increasing(force_strictly_increasing(x, eps=1e-15)[0]))
         
+        xn, yn = force_strictly_increasing([0, 1, 1, 2])
+        assert_equal(xn.dtype, np.float64)
+        ok_(strictly_increasing(xn))
+        assert_raises(TypeError, force_strictly_increasing, 
+                      np.array([0, 1, 1, 2]), inplace=True)
+                      
 #class test_has_steps(sample_linear_piecewise):
 #    """test some has_steps examples"""
 #    def __init__(self):
@@ -0,0 +1,162 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+tests for the ragged batch functions
+
+"""
+from __future__ import division, print_function
+
+from nose.tools.trivial import assert_raises
+from nose.tools.trivial import ok_
+from nose.tools.trivial import assert_equal
+
+import numpy as np
+
+from piecewisefns import piecewise_linear_1d as pwl
+from piecewisefns import ragged
+from piecewisefns.ragged import to_ragged
+from piecewisefns.ragged import from_ragged
+
+
+class test_ragged(object):
+    """a batch of functions including empty and one point ones"""
+    
+    def __init__(self):
+        np.random.seed(2)
+        self.xs = [[0,  0,  1,  1,  2], 
+                   [], 
+                   [0,  -0.5,  -1,  -1.5,  -2], 
+                   [3], 
+                   [0, 0.5, 1, 0.75, 1.5, 2], 
+                   [0,  0.4,   0.4,  1,  2.5,  3,  3],
+                   [2, 2, 2]]
+        self.ys = [[0, 10, 10, 30, 30], 
+                   [], 
+                   [0,  10.0,  10,  30.0,  30], 
+                   [4], 
+                   [0, 1.2, 2, 2.25, 3.5, 3],
+                   [0,  10.0, 20.0, 20, 30.0, 30, 40],
+                   [1, 1, 2]]
+        for i in range(30):
+            n = np.random.randint(0, 40)
+            self.xs.append(np.cumsum(np.random.randint(0, 3, n)))
+            self.ys.append(np.random.randint(0, 3, n))
+        #trailing empty functions start one past the last segment
+        self.xs.extend([[], []])
+        self.ys.extend([[], []])
+        self.x, self.offsets = to_ragged(self.xs, dtype=float)
+        self.y, _ = to_ragged(self.ys, dtype=float)
+        
+    def test_to_ragged(self):
+        """test to_ragged and from_ragged round trip"""
+        for a, b in zip(from_ragged(self.x, self.offsets), self.xs):
+            ok_(np.all(a == b))
+        assert_equal(len(self.offsets), len(self.xs) + 1)
+        assert_raises(ValueError, ragged.has_steps, self.x, self.offsets[:-3])
+        
+    def test_predicates(self):
+        """test batch has_steps and monotonicity checks"""
+        for name in ['has_steps', 'strictly_increasing', 'strictly_decreasing', 
+                     'non_increasing', 'non_decreasing']:
+            expected = [getattr(pwl, name)(x) for x in self.xs]
+            ok_(np.all(getattr(ragged, name)(self.x, self.offsets) == expected))
+            #unsigned values where np.diff would wrap around
+            xs = [np.array(x, dtype=np.uint8) for x in 
+                  [[5, 3, 4], [1, 2, 2, 0], [], [3, 4]]]
+            x, offsets = to_ragged(xs)
+            ok_(np.all(getattr(ragged, name)(x, offsets) == 
+                       [getattr(pwl, name)(a) for a in xs]))
+            
+    def test_segments(self):
+        """test batch start_index_of_* functions"""
+        for name in ['start_index_of_ramps', 'start_index_of_constants', 
+                     'start_index_of_steps']:
+            index, index_offsets = getattr(ragged, name)(self.x, self.y, self.offsets)
+            for i, (x, y) in enumerate(zip(self.xs, self.ys)):
+                ok_(np.all(index[index_offsets[i]:index_offsets[i + 1]] == 
+                           getattr(pwl, name)(x, y)))
+                           
+    def test_searchsorted(self):
+        """test per function binary search"""
+        keep = [i for i, x in enumerate(self.xs) if pwl.non_decreasing(x)]
+        for side in ['left', 'right']:
+            for i in keep:
+                q = np.array([-1, 0, 0.5, 1, 2, 2.5, 3, 100])
+                index = ragged.searchsorted(self.x, self.offsets, np.repeat(i, len(q)), q, side)
+                ok_(np.all(index - self.offsets[i] == 
+                           np.searchsorted(np.asarray(self.xs[i], dtype=float), q, side)))
+        
+    def test_evaluate(self):
+        """test batch evaluate against the single function version"""
+        keep = [i for i, x in enumerate(self.xs) if pwl.non_decreasing(x)]
+        xs = [self.xs[i] for i in keep]
+        ys = [self.ys[i] for i in keep]
+        x, offsets = to_ragged(xs, dtype=float)
+        y, _ = to_ragged(ys, dtype=float)
+        queries = [np.concatenate((np.random.rand(np.random.randint(0, 20)) * 60 - 5, 
+                                   np.asarray(a, dtype=float))) for a in xs]
+        xi, xi_offsets = to_ragged(queries)
+        for at_step in ['left', 'right', 'mean']:
+            yi = ragged.evaluate(x, y, offsets, xi, xi_offsets, at_step)
+            for a, b, q, v in zip(xs, ys, queries, from_ragged(yi, xi_offsets)):
+                if len(a) == 0:
+                    ok_(np.all(np.isnan(v)))
+                else:
+                    ok_(np.allclose(v, pwl.evaluate(a, b, q, at_step)))
+                    
+        assert_raises(ValueError, ragged.evaluate, self.x, self.y, self.offsets, 
+                      xi, xi_offsets)
+        
+    def test_resample(self):
+        """test resampling onto the union grid and a given grid"""
+        keep = [i for i, x in enumerate(self.xs) if pwl.non_decreasing(x)]
+        xs = [self.xs[i] for i in keep]
+        ys = [self.ys[i] for i in keep]
+        x, offsets = to_ragged(xs, dtype=float)
+        y, _ = to_ragged(ys, dtype=float)
+        q = np.random.rand(50) * 60 - 5
+        
+        grid, out = ragged.resample(x, y, offsets, chunksize=100)
+        ok_(np.all(np.diff(grid) >= 0))
+        assert_equal(out.shape, (len(xs), len(grid)))
+        assert_equal(out.dtype, np.float64)
+        for a, b, row in zip(xs, ys, out):
+            if len(a) == 0:
+                ok_(np.all(np.isnan(row)))
+                continue
+            for side in ['left', 'right']:
+                for xi in (q, grid):
+                    ok_(np.allclose(pwl.evaluate(grid, row, xi, side), 
+                                    pwl.evaluate(a, b, xi, side)))
+                                    
+        out32 = np.zeros((len(xs), len(grid)), dtype=np.float32)
+        grid32, out32 = ragged.resample(x, y, offsets, out=out32)
+        ok_(np.allclose(out32, out, equal_nan=True))
+        assert_equal(ragged.resample(x, y, offsets, dtype=np.float32)[1].dtype, 
+                     np.float32)
+        
+        grid, out = ragged.resample(x, y, offsets, grid=[1, 1, 2.5])
+        for a, b, row in zip(xs, ys, out):
+            if len(a):
+                ok_(np.allclose(row, [pwl.evaluate(a, b, 1, 'left'), 
+                                      pwl.evaluate(a, b, 1, 'right'), 
+                                      pwl.evaluate(a, b, 2.5)]))
+                                      
+        assert_raises(ValueError, ragged.resample, x, y, offsets, grid=[2, 1])
+        assert_raises(ValueError, ragged.resample, x, y, offsets, 
+                      out=np.zeros((2, 2)))
+        assert_raises(ValueError, ragged.union_grid, self.x, self.offsets)
@@ -0,0 +1,114 @@
+# piecewisefns - classes and functions to manipulate piecewise functions
+# Copyright (C) 2013 Rohan T. Walker (rtrwalker@gmail.com)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/gpl.html.
+
+"""
+tests for the chunked analysis functions in streaming
+
+"""
+from __future__ import division, print_function
+
+from nose.tools.trivial import assert_raises
+from nose.tools.trivial import ok_
+from nose.tools.trivial import assert_equal
+
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from piecewisefns import piecewise_linear_1d as pwl
+from piecewisefns import streaming
+
+
+class test_streaming(object):
+    """compare streaming results with the in-memory functions"""
+    
+    def __init__(self):
+        np.random.seed(0)
+        x = np.repeat(np.cumsum(np.random.randint(0, 3, 200)), 
+                      np.random.randint(1, 3, 200))
+        y = np.random.randint(0, 3, len(x))
+        wiggle = np.concatenate((np.zeros(5), np.cumsum(np.random.randint(-1, 2, 300))))
+        self.data = [{'x': x, 'y': y}, 
+                     {'x': x[::-1], 'y': y}, 
+                     {'x': wiggle, 'y': wiggle ** 2}, 
+                     {'x': np.arange(10.0), 'y': np.ones(10)}, 
+                     {'x': np.zeros(7), 'y': np.arange(7)}]
+        
+    def test_predicates(self):
+        """test has_steps and the monotonicity checks"""
+        #unsigned values where np.diff would wrap around
+        uint = [{'x': np.array([5, 3, 4], dtype=np.uint8)}, 
+                {'x': np.array([1, 2, 2, 0, 7], dtype=np.uint32)}]
+        for d in self.data + uint:
+            for chunksize in [1, 2, 7, 1000]:
+                for name in ['has_steps', 'strictly_increasing', 'strictly_decreasing', 
+                             'non_increasing', 'non_decreasing']:
+                    assert_equal(getattr(streaming, name)(d['x'], chunksize=chunksize), 
+                                 getattr(pwl, name)(d['x']))
+                    
+    def test_runs(self):
+        """test non_increasing_and_non_decreasing_runs and _parts"""
+        for d in self.data:
+            start, stop = pwl.non_increasing_and_non_decreasing_runs(d['x'])
+            for chunksize in [1, 3, 1000]:
+                s, e = streaming.non_increasing_and_non_decreasing_runs(d['x'], chunksize=chunksize)
+                ok_(np.all(s == start))
+                ok_(np.all(e == stop))
+                assert_equal(streaming.non_increasing_and_non_decreasing_parts(d['x'], True, chunksize=chunksize), 
+                             pwl.non_increasing_and_non_decreasing_parts(d['x'], True))
+                             
+        s, e = streaming.non_increasing_and_non_decreasing_runs([5])
+        assert_equal(len(s), 0)
+        
+    def test_segment_indices(self):
+        """test start_index_of_* and ramps_constants_steps"""
+        for d in self.data:
+            for chunksize in [1, 4, 1000]:
+                for name in ['start_index_of_ramps', 'start_index_of_constants', 
+                             'start_index_of_steps']:
+                    ok_(np.all(getattr(streaming, name)(d['x'], d['y'], chunksize=chunksize) == 
+                               getattr(pwl, name)(d['x'], d['y'])))
+                for a, b in zip(streaming.ramps_constants_steps(d['x'], d['y'], chunksize=chunksize), 
+                                pwl.ramps_constants_steps(d['x'], d['y'])):
+                    ok_(np.all(a == b))
+                    
+    def test_sources(self):
+        """test iterators of chunks and memory-mapped .npy files"""
+        d = self.data[0]
+        
+        def pieces(a, sizes):
+            i = 0
+            for n in sizes:
+                yield list(a[i:i + n])
+                i += n
+                
+        sizes = [0, 1, 5, 0, 17, 100, 1000]
+        ok_(np.all(streaming.start_index_of_steps(pieces(d['x'], sizes), pieces(d['y'], sizes)) == 
+                   pwl.start_index_of_steps(d['x'], d['y'])))
+        assert_raises(ValueError, streaming.start_index_of_steps, 
+                      pieces(d['x'], sizes), pieces(d['y'], [3] * 1000))
+        
+        path = tempfile.mkdtemp()
+        try:
+            np.save(os.path.join(path, 'x.npy'), d['x'])
+            np.save(os.path.join(path, 'y.npy'), d['y'])
+            ok_(np.all(streaming.start_index_of_ramps(os.path.join(path, 'x.npy'), 
+                                                      os.path.join(path, 'y.npy'), chunksize=16) == 
+                       pwl.start_index_of_ramps(d['x'], d['y'])))
+            assert_equal(streaming.non_decreasing(os.path.join(path, 'x.npy'), chunksize=16), True)
+        finally:
+            shutil.rmtree(path)
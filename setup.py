@@ -38,7 +38,7 @@ setup(name='piecewisefns',
       author='Rohan Walker',
       author_email='rtrwalker@gmail.com',
       license='GNU General Public License v3 or later (GPLv3+)',
-      packages=find_packages(),
+      packages=find_packages(exclude=["benchmarks"]),
       data_files=[('', ['LICENSE.txt','README.rst'])],
       install_requires=[],
       zip_safe=False,